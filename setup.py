@@ -13,5 +13,9 @@ setup(
                             'networkx == 1.7',
                             'pygr == 0.8.2',
                             'bx-python == 0.7.1',
-                            ]
+                            'numpy >= 1.6',
+                            ],
+        extras_require = {
+                            'bam': ['pysam'],  # BAM/SAM input
+                            }
         )
@@ -20,17 +20,28 @@
 '''
 #!/usr/bin/env python
 
+import os
 import sys
+import array
+import shutil
+import tempfile
 import csv
+import heapq
 import argparse
+import itertools
+import multiprocessing
 
 from sys import stderr, stdout
+from operator import itemgetter
 
-import networkx as nx
+import numpy as np
 
 #from matplotlib import pyplot as plt
-from utils import pslparser, get_min_isoforms, split_strand
-from bx.intervals.intersection import Interval, IntervalTree
+from utils import pslparser, bedio, bamio, chainfile, fileio, fileindex
+from utils import gffio, regions
+from utils import get_min_isoforms, split_strand
+from utils.splice_graph import SpliceGraph
+from utils.regions import RegionIndex
 from pygr import seqdb
 
 
@@ -41,34 +52,537 @@ min_transcript_len = 300  # a minimum length for multiple exon transcript(bp)
 min_single_exon_len = 500  # a minimum length for a single exon(bp)
 max_isoforms = 20   # minimal isoforms will be searched
                     #if the number of isoforms exceed this number
+batch_size = 10000  # a number of PSL alignments parsed at a time
+min_range_size = 1 << 20  # a minimum size (bytes) of a file range
+                          # parsed by a worker process
+min_identity = 0  # a minimum identity of PSL alignments (%)
+min_coverage = 0  # a minimum query coverage of PSL alignments (%)
+min_junction_support = 1  # a minimum number of alignments of a junction
+min_junction_ratio = 0  # a minimum support of a junction relative to
+                        # the strongest junction of its exons
+max_memory = 0  # a memory budget (MB) of parsed alignments, 0 = no limit
 VERSION = '0.97'
 
 
-class ExonObj:
+class ExonObj(object):
+    '''An exon of an alignment.
+
+    Exons have no instance dictionary. An exon gets an id when it is
+    added to exon db (see add_exon), which keeps exons found in all
+    alignments in columns (see ExonTable).
+
+    '''
+    __slots__ = ('chrom', 'start', 'end', 'id')
+
     def __init__(self, chrom, start, end):
         self.chrom = chrom
         self.start = start
         self.end = end
-        self.terminal = None
-        self.next_exons = set()
-        self.introns = set()
-        self.single = False
-        self.remove = False
+        self.id = None  # assigned when added to exon db (see add_exon)
 
     def __str__(self):
         return '%s:%d-%d' % (self.chrom, self.start, self.end)
 
-    def get_size(self):
-        return self.end - self.start + 1
+
+class ChromTable(object):
+    '''Encodes chromosome names to small integer ids.
+
+    Names are kept once in this table; exons, introns and single
+    exons carry ids, which are decoded only for output (see get_bed)
+    and chain tables (see parse_input).
+
+    '''
+    def __init__(self):
+        self.ids = {}  # name -> id
+        self.names = []  # id -> name
+
+    def get_id(self, name):
+        '''Returns an id of a chromosome; a new id is assigned
+        to a chromosome found for the first time.
+
+        '''
+        try:
+            return self.ids[name]
+        except KeyError:
+            chrom_id = self.ids[name] = len(self.names)
+            self.names.append(name)
+            return chrom_id
+
+
+class GenomeDB(object):
+    '''Sequences of a genome indexed by chromosome ids
+    (see ChromTable), e.g. split_strand.get_splice_sites.
+
+    A sequence object of each chromosome is looked up by name once
+    and kept in a list.
+
+    '''
+    def __init__(self, seqdb, chrom_table):
+        self.seqdb = seqdb  # sequences indexed by names, i.e. pygr
+        self.chrom_table = chrom_table
+        self.seqs = []
+
+    def __getitem__(self, chrom_id):
+        if chrom_id >= len(self.seqs):
+            self.seqs.extend([None] * (chrom_id + 1 - len(self.seqs)))
+
+        seq = self.seqs[chrom_id]
+        if seq is None:
+            seq = self.seqdb[self.chrom_table.names[chrom_id]]
+            self.seqs[chrom_id] = seq
+        return seq
+
+
+chrom_table = ChromTable()  # chromosomes of all inputs
+
+
+class CoordTable(object):
+    '''Interns coordinates of each chromosome to integer ids.
+
+    Ids are unique across chromosomes and are used as keys of exon
+    and intron db and nodes of graphs, so coordinates are formatted
+    to strings only for output.
+
+    '''
+    def __init__(self):
+        self.chroms = {}  # (start, end) -> id of each chromosome
+        self.size = 0
+
+    def get_id(self, chrom, start, end):
+        '''Returns an id of coordinates; a new id is assigned
+        to coordinates found for the first time.
+
+        '''
+        try:
+            coords = self.chroms[chrom]
+        except KeyError:
+            coords = self.chroms[chrom] = {}
+
+        try:
+            return coords[start, end]
+        except KeyError:
+            coords[start, end] = self.size
+            self.size += 1
+            return self.size - 1
+
+    def find(self, chrom, start, end):
+        '''Returns an id of coordinates or None if they are not
+        in the table.
+
+        '''
+        try:
+            return self.chroms[chrom][start, end]
+        except KeyError:
+            return None
+
+
+class ExonTable(object):
+    '''Exons stored in columns indexed by exon ids.
+
+    Each exon has coordinates, a number of alignments with the exon
+    (support), a terminal flag and a tuple of ids of its introns.
+    A terminal flag is 1 (LEFT) or 2 (RIGHT) if the exon is the first
+    or the last exon of all alignments with it and 0 otherwise.
+    Introns of an exon are those of the first alignment with the exon
+    (see add_intron).
+
+    '''
+    LEFT, RIGHT = 1, 2
+
+    def __init__(self):
+        self.ids = CoordTable()
+        self.chroms = array.array('l')
+        self.starts = array.array('l')
+        self.ends = array.array('l')
+        self.terminals = array.array('b')
+        self.support = array.array('l')
+        self.introns = []
+
+    def __len__(self):
+        return len(self.starts)
+
+    def add(self, chrom, start, end, terminal=0, count=1):
+        '''Adds an exon found in count alignments and returns an id
+        of the exon. A terminal flag is cleared if the exon is found
+        with a different flag.
+
+        '''
+        exon_id = self.ids.get_id(chrom, start, end)
+        if exon_id == len(self.starts):  # a new exon
+            self.chroms.append(chrom)
+            self.starts.append(start)
+            self.ends.append(end)
+            self.terminals.append(terminal)
+            self.support.append(count)
+            self.introns.append(())
+        else:
+            self.support[exon_id] += count
+            if self.terminals[exon_id] != terminal:
+                self.terminals[exon_id] = 0
+
+        return exon_id
+
+    def add_intron(self, exon_id, intron_id):
+        introns = self.introns[exon_id]
+        if intron_id not in introns:
+            self.introns[exon_id] = introns + (intron_id,)
+
+    def get_size(self, exon_id):
+        return self.ends[exon_id] - self.starts[exon_id] + 1
+
+    def get_positions(self, exon_ids):
+        '''Returns numpy arrays of starts and ends of exons.'''
+
+        exon_ids = np.asarray(exon_ids, dtype=np.intp)
+        starts = np.frombuffer(self.starts, dtype=np.dtype('l'))
+        ends = np.frombuffer(self.ends, dtype=np.dtype('l'))
+        return starts[exon_ids], ends[exon_ids]
+
+
+class IntronTable(object):
+    '''Introns stored in columns indexed by intron ids.
+
+    Each intron has coordinates, a number of alignments with the intron
+    (support) and a flat tuple of ids of exons flanking it,
+    i.e. (exon1, exon2, exon1, exon2, ...) for each pair of exons found
+    in alignments.
+
+    Introns found in the same alignments are clustered in a disjoint-set
+    forest: each intron has a parent intron (itself for a root) and
+    a rank, a cluster is a tree and its root is the cluster id.
+    Clusters are merged by rank (see union_clusters) and paths to roots
+    are compressed (see find_cluster), so clustering all introns takes
+    nearly linear time. Introns of each cluster are only collected
+    when gene models are built (see get_clusters).
+
+    '''
+    def __init__(self):
+        self.ids = CoordTable()
+        self.chroms = array.array('l')
+        self.starts = array.array('l')
+        self.ends = array.array('l')
+        self.parents = array.array('l')
+        self.ranks = array.array('l')
+        self.support = array.array('l')
+        self.edges = []
+
+    def __len__(self):
+        return len(self.parents)
+
+    def add(self, chrom, start, end, exon1, exon2, count=1):
+        '''Adds an intron flanked by exons with ids exon1 and exon2
+        found in count alignments and returns an id of the intron.
+
+        '''
+        intron_id = self.ids.get_id(chrom, start, end)
+        if intron_id == len(self.parents):  # a new intron
+            self.chroms.append(chrom)
+            self.starts.append(start)
+            self.ends.append(end)
+            self.parents.append(intron_id)
+            self.ranks.append(0)
+            self.support.append(count)
+            self.edges.append((exon1, exon2))
+        else:
+            self.support[intron_id] += count
+            edges = self.edges[intron_id]
+            for i in range(0, len(edges), 2):
+                if edges[i] == exon1 and edges[i + 1] == exon2:
+                    break
+            else:
+                self.edges[intron_id] = edges + (exon1, exon2)
+
+        return intron_id
+
+    def get_edges(self, intron_id):
+        '''Returns pairs of exon ids flanking an intron.'''
+
+        edges = self.edges[intron_id]
+        return zip(edges[0::2], edges[1::2])
+
+    def get_support(self, chrom, start, end):
+        '''Returns a number of alignments with an intron or 0
+        if the intron is not found.
+
+        '''
+        intron_id = self.ids.find(chrom, start, end)
+        if intron_id is None:
+            return 0
+        return self.support[intron_id]
+
+    def find_cluster(self, intron_id):
+        '''Returns a cluster id (a root) of an intron and points
+        introns on the path to the root.
+
+        '''
+        parents = self.parents
+        root = intron_id
+        while parents[root] != root:
+            root = parents[root]
+
+        while intron_id != root:
+            parent = parents[intron_id]
+            parents[intron_id] = root
+            intron_id = parent
+
+        return root
+
+    def union_clusters(self, intron1, intron2):
+        '''Merges clusters of two introns and returns an id of
+        the merged cluster. A root with a lower rank is attached to
+        the other root.
+
+        '''
+        root1 = self.find_cluster(intron1)
+        root2 = self.find_cluster(intron2)
+        if root1 == root2:
+            return root1
+
+        ranks = self.ranks
+        if ranks[root1] < ranks[root2]:
+            root1, root2 = root2, root1
+        self.parents[root2] = root1
+        if ranks[root1] == ranks[root2]:
+            ranks[root1] += 1
+
+        return root1
+
+    def get_roots(self):
+        '''Returns a numpy array of cluster ids of all introns.
+
+        Every intron is pointed to its parent's parent until all introns
+        point to roots; the depth of trees is at most log2 of a number of
+        introns (see union_clusters).
+
+        '''
+        roots = np.frombuffer(self.parents, dtype=np.dtype('l'))
+        while True:
+            grandparents = roots[roots]
+            if np.array_equal(grandparents, roots):
+                return roots
+            roots = grandparents
+
+    def get_clusters(self):
+        '''Returns a dictionary of cluster ids and lists of introns
+        in the clusters, sorted by intron id.
+
+        '''
+        roots = self.get_roots()
+        order = np.argsort(roots, kind='mergesort')
+        ids, starts = np.unique(roots[order], return_index=True)
+        return dict(itertools.izip(ids.tolist(),
+                                    [intron_ids.tolist() for intron_ids
+                                        in np.split(order, starts[1:])]))
+
+
+class SingleExonDB(object):
+    '''Single exons of each chromosome stored in columns.
+
+    Exons are appended to arrays of start and end positions while
+    alignments are added. merge sorts exons of each chromosome and
+    merges overlapped exons into a structured array (MERGED_DTYPE)
+    sorted by start position; support of a merged exon is a number of
+    alignments of all exons in it. Merged exons do not overlap, so both
+    their starts and ends are sorted and exons overlapping a range
+    are found by binary search (see find).
+
+    '''
+    MERGED_DTYPE = np.dtype([('start', np.int64),
+                                ('end', np.int64),
+                                ('support', np.int64),
+                                ('remove', np.bool_)])
+
+    def __init__(self):
+        self.starts = {}
+        self.ends = {}
+        self.merged = {}  # merged exons of each chromosome
+
+    def add(self, exon):
+        try:
+            self.starts[exon.chrom].append(exon.start)
+        except KeyError:
+            self.starts[exon.chrom] = array.array('l', [exon.start])
+            self.ends[exon.chrom] = array.array('l', [exon.end])
+        else:
+            self.ends[exon.chrom].append(exon.end)
+
+    def merge(self, chain_db=None):
+        '''Merges overlapped exons of each chromosome and returns
+        a dictionary of merged exons.
+
+        chain_db = a number of alignments with each exon chain
+        (see count_chain). Each exon is added once for all alignments
+        with it, so the numbers are taken from chains of single exons.
+        An exon without a chain is counted once.
+
+        '''
+        chain_db = chain_db or {}
+        self.merged = {}
+        for chrom in self.starts:
+            starts = np.frombuffer(self.starts[chrom], dtype=np.dtype('l'))
+            ends = np.frombuffer(self.ends[chrom], dtype=np.dtype('l'))
+            counts = np.fromiter((chain_db.get((chrom, start, end), 1)
+                                    for start, end in itertools.izip(
+                                        self.starts[chrom],
+                                        self.ends[chrom])),
+                                    dtype=np.int64, count=len(starts))
+            order = np.argsort(starts, kind='mergesort')
+            starts, ends, counts = starts[order], ends[order], counts[order]
+
+            # An exon starts a new merged exon if it starts after
+            # all exons before it end.
+            first = np.ones(len(starts), dtype=bool)
+            first[1:] = starts[1:] > np.maximum.accumulate(ends)[:-1]
+            firsts = np.flatnonzero(first)
+
+            merged = np.zeros(len(firsts), dtype=self.MERGED_DTYPE)
+            merged['start'] = starts[firsts]
+            merged['end'] = np.maximum.reduceat(ends, firsts)
+            merged['support'] = np.add.reduceat(counts, firsts)
+            self.merged[chrom] = merged
+
+        return self.merged
+
+    def find(self, chrom, starts, ends):
+        '''Returns merged exons of a chromosome and index ranges
+        (lo, hi) of merged exons overlapping each range of starts
+        and ends; merged[lo[i]:hi[i]] overlap starts[i]-ends[i].
+
+        '''
+        merged = self.merged[chrom]
+        lo = np.searchsorted(merged['end'], starts, side='right')
+        hi = np.searchsorted(merged['start'], ends, side='left')
+        return merged, lo, hi
 
 
 class AlignmentDB(object):
     def __init__(self):
-        self.exon_db = {}  # store all exon objects
-        self.intron_db = {}  # store all intron objects
-        self.single_exons_db = {}  # store all single exon objects
-        self.single_exons_intervals = {}  # store intersecter objects for
-                                          # single exons
+        self.exon_db = ExonTable()  # store all exons
+        self.intron_db = IntronTable()  # store all introns
+        self.single_exons_db = SingleExonDB()  # store all single exons
+        self.chain_db = {}  # a number of alignments with each exon chain
+
+
+class ChainPartitions(object):
+    '''Chain tables (see parse_input) of each chromosome: unique exon
+    chains in order they are found and a number of alignments with
+    each chain.
+
+    When max_memory (bytes) is given and chains in memory are estimated
+    to use more, chains of all chromosomes are written to a segment
+    (a chain file, see utils/chainfile.py) in a temporary directory
+    and removed from memory. Input chain files are added as segments
+    too (see add_file), so their chains are not read into memory.
+    alignments returns exons of chains of a chromosome from all
+    segments and memory in order they were added.
+
+    '''
+    CHAIN_OVERHEAD = 120  # estimated bytes of an index entry and counts
+
+    def __init__(self, max_memory=0):
+        self.max_memory = max_memory
+        self.chroms = []  # in order they are found
+        self.chrom_set = set()
+        self.tables = {}  # chrom -> [chain index, counts]
+        self.size = 0  # estimated bytes of chains in memory
+        self.segments = []  # chain files and their region indexes
+        self.spilled = 0  # a number of segments written by spill
+        self.tmpdir = None
+
+    def add(self, chain, count=1):
+        try:
+            index, counts = self.tables[chain[0]]
+        except KeyError:
+            if chain[0] not in self.chrom_set:
+                self.chroms.append(chain[0])
+                self.chrom_set.add(chain[0])
+            index, counts = self.tables[chain[0]] = [{}, []]
+
+        try:
+            counts[index[chain]] += count
+        except KeyError:
+            index[chain] = len(counts)
+            counts.append(count)
+            self.size += (sys.getsizeof(chain) + 24 * (len(chain) - 1) +
+                            self.CHAIN_OVERHEAD)
+            if self.max_memory and self.size > self.max_memory:
+                self.spill()
+
+    def get_table(self, chrom):
+        '''Returns chains and counts of a chromosome in memory.'''
+
+        index, counts = self.tables[chrom]
+        chains = [None] * len(counts)
+        for chain, i in index.iteritems():
+            chains[i] = chain
+        return chains, counts
+
+    def spill(self):
+        '''Writes chains in memory to a new segment.'''
+
+        if self.tmpdir is None:
+            self.tmpdir = tempfile.mkdtemp(prefix='gimme.')
+
+        chains, counts = [], []
+        for chrom in self.chroms:
+            if chrom in self.tables:
+                table = self.get_table(chrom)
+                chains.extend(table[0])
+                counts.extend(table[1])
+
+        filename = os.path.join(self.tmpdir,
+                                'segment%d.gcf' % self.spilled)
+        chainfile.write(filename, chains, counts)
+        self.segments.append((chainfile.ChainFile(filename), None))
+        self.spilled += 1
+        self.tables = {}
+        self.size = 0
+
+    def add_file(self, chain_file, region_index=None):
+        '''Adds chains of a chain file (only those in regions if
+        region_index is given) after chains added before; chains in
+        memory are spilled first to keep the order.
+
+        '''
+        if self.tables:
+            self.spill()
+        self.segments.append((chain_file, region_index))
+        for chrom in chain_file.chroms:
+            if chrom not in self.chrom_set and (region_index is None or
+                                                chrom in region_index):
+                self.chroms.append(chrom)
+                self.chrom_set.add(chrom)
+
+    def alignments(self, chrom):
+        '''Returns exon objects of each chain of a chromosome and
+        its count in order chains were added.
+
+        Chains of segments are read from arrays of chain files, and
+        the same chain may be returned more than once. Adding them to
+        an AlignmentDB in order gives the same db as adding each chain
+        once with its counts added up (see count_chain).
+
+        '''
+        chrom_id = chrom_table.get_id(chrom)
+        for chain_file, region_index in self.segments:
+            for starts, ends, count in chain_file.exons(chrom, region_index):
+                yield ([ExonObj(chrom_id, start, end)
+                            for start, end in itertools.izip(starts, ends)],
+                        count)
+
+        if chrom in self.tables:
+            for chain, count in itertools.izip(*self.get_table(chrom)):
+                yield chain_to_exons(chain), count
+
+    def close(self):
+        '''Closes segments and removes spilled ones.'''
+
+        for chain_file, region_index in self.segments:
+            chain_file.close()
+        self.segments = []
+        if self.tmpdir is not None:
+            shutil.rmtree(self.tmpdir)
+            self.tmpdir = None
 
 
 def parse_bed(bed_file):
@@ -76,43 +590,182 @@ def parse_bed(bed_file):
     exon objects from a transcript.
 
     '''
-    reader = csv.reader(bed_file, dialect='excel-tab')
-    for row in reader:
-        exons = []
-        chrom = row[0]
-        chrom_start = int(row[1])
+    for bed in bedio.read(bed_file):
+        chrom = chrom_table.get_id(bed.chrom)
+        exons = [ExonObj(chrom, start, end) for start, end in bed.exons()]
 
-        exon_sizes = [int(s) for s in row[10].split(',')]
-        exon_starts = [chrom_start + int(s) for s in row[11].split(',')]
+        exons = delete_gap(exons, gap_size)
+        yield exons
 
-        for i in range(len(exon_starts)):
-            exon_start = exon_starts[i]
-            exon_end = exon_start + exon_sizes[i]
 
-            exon = ExonObj(chrom, exon_start, exon_end)
-            exons.append(exon)
+def parse_bam(bam_file, regions=None):
+    '''Reads spliced alignments from BAM/SAM format and creates
+    exon objects from each read.
 
-        exons = delete_gap(exons, gap_size)
-        yield exons
+    regions = a list of (chrom, start, end); only reads in the regions
+    are read (see bamio.read).
+
+    '''
+    try:
+        for chrom, blocks in bamio.read(bam_file, regions):
+            chrom = chrom_table.get_id(chrom)
+            exons = [ExonObj(chrom, start, end) for start, end in blocks]
 
+            exons = delete_gap(exons, gap_size)
+            yield exons
+    except (ImportError, IOError, OSError, ValueError) as e:
+        print >> stderr, 'ERROR: %s: %s' % (bam_file, e)
+        raise SystemExit
 
-def parse_psl(psl_file):
-    '''Reads alignments from PSL format and creates
+
+def parse_gff(lines, regions=None):
+    '''Reads transcripts from GTF/GFF3 format and creates
     exon objects from each transcript.
 
+    regions = a list of (chrom, start, end); only transcripts
+    in the regions are read (see gffio.read).
+
     '''
-    for pslobj in pslparser.read(psl_file):
-        exons = []
+    try:
+        for chrom, blocks in gffio.read(lines, regions):
+            chrom = chrom_table.get_id(chrom)
+            exons = [ExonObj(chrom, start, end) for start, end in blocks]
 
-        for i in range(len(pslobj.tStarts)):
-            exon_start = pslobj.tStarts[i]
-            exon_end = exon_start + pslobj.blockSizes[i]
+            exons = delete_gap(exons, gap_size)
+            yield exons
+    except ValueError as e:
+        print >> stderr, 'ERROR: %s' % e
+        raise SystemExit
 
-            exon = ExonObj(pslobj.tName, exon_start, exon_end)
-            exons.append(exon)
 
-        exons = delete_gap(exons, gap_size)
-        yield exons
+def parse_psl_batches(psl_file, batch_size=batch_size, filtered=None):
+    '''Reads alignments from PSL format in columnar batches and
+    returns groups of exon objects from each transcript.
+
+    Alignments below min_identity or min_coverage are dropped and
+    counted in filtered (see filter_batch). Gaps and large introns
+    are removed on arrays, so exon objects are created only for exons
+    in the final groups (see delete_gap and remove_large_intron).
+
+    '''
+    if filtered is None:
+        filtered = {'identity': 0, 'coverage': 0}
+
+    chrom_map = []  # ids of target names of batches (see ChromTable)
+    for batch in pslparser.read_batches(psl_file, batch_size):
+        chrom_map.extend([chrom_table.get_id(chrom)
+                            for chrom in batch.chroms[len(chrom_map):]])
+        chrom_ids, starts, sizes, offsets = filter_batch(batch, filtered,
+                                                        min_identity,
+                                                        min_coverage)
+        if not len(chrom_ids):
+            continue
+
+        starts, ends, offsets = delete_gap_batch(starts,
+                                                starts + sizes,
+                                                offsets,
+                                                gap_size)
+        groups = remove_large_intron_batch(starts, ends, offsets, max_intron)
+        group_offsets = np.searchsorted(groups, offsets).tolist()
+
+        starts = starts.tolist()
+        ends = ends.tolist()
+        groups = groups.tolist()
+        for i, chrom_id in enumerate(chrom_ids.tolist()):
+            chrom = chrom_map[chrom_id]
+            exon_groups = []
+            for j in range(group_offsets[i], group_offsets[i + 1]):
+                exon_groups.append([ExonObj(chrom, starts[k], ends[k])
+                                    for k in range(groups[j], groups[j + 1])])
+            yield exon_groups
+
+
+def filter_batch(batch, filtered, min_identity=0, min_coverage=0):
+    '''Removes alignments with low identity or low query coverage
+    from a batch of PSL alignments (see pslparser.read_batches).
+
+    Identity = (matches + repMatches) /
+                (matches + repMatches + misMatches) * 100
+
+    Coverage = (qEnd - qStart) / qSize * 100
+
+    Numbers of removed alignments are added to filtered['identity']
+    and filtered['coverage']. An alignment failing both criteria is
+    counted as low identity.
+
+    Returns chrom_ids, starts, sizes and offsets of the remaining
+    alignments.
+
+    '''
+    if min_identity <= 0 and min_coverage <= 0:
+        return batch.chrom_ids, batch.starts, batch.sizes, batch.offsets
+
+    keep = np.ones(len(batch.chrom_ids), dtype=bool)
+    if min_identity > 0:
+        aligned = batch.matches + batch.rep_matches
+        identity = 100.0 * aligned / \
+                    np.maximum(aligned + batch.mismatches, 1)
+        keep &= identity >= min_identity
+        filtered['identity'] += len(keep) - np.count_nonzero(keep)
+
+    if min_coverage > 0:
+        coverage = 100.0 * (batch.q_ends - batch.q_starts) / \
+                    np.maximum(batch.q_sizes, 1)
+        low_coverage = keep & (coverage < min_coverage)
+        filtered['coverage'] += np.count_nonzero(low_coverage)
+        keep &= ~low_coverage
+
+    if keep.all():
+        return batch.chrom_ids, batch.starts, batch.sizes, batch.offsets
+
+    counts = np.diff(batch.offsets)[keep]
+    offsets = np.zeros(len(counts) + 1, dtype=batch.offsets.dtype)
+    np.cumsum(counts, out=offsets[1:])
+    blocks = np.repeat(keep, np.diff(batch.offsets))
+
+    return (batch.chrom_ids[keep],
+            batch.starts[blocks],
+            batch.sizes[blocks],
+            offsets)
+
+
+def delete_gap_batch(starts, ends, offsets, gap_size=0):
+    '''Columnar version of delete_gap.
+
+    Blocks of alignment i are starts[offsets[i]:offsets[i + 1]].
+    Returns starts, ends and offsets of exons after gaps are filled.
+
+    '''
+    first = np.ones(len(starts), dtype=bool)
+    first[1:] = (starts[1:] - ends[:-1]) > gap_size
+    first[offsets[:-1]] = True  # never merge blocks across alignments
+
+    firsts = np.flatnonzero(first)
+    lasts = np.empty_like(firsts)
+    lasts[:-1] = firsts[1:] - 1
+    lasts[-1] = len(starts) - 1
+
+    new_offsets = np.empty_like(offsets)
+    new_offsets[:-1] = (np.cumsum(first) - 1)[offsets[:-1]]
+    new_offsets[-1] = len(firsts)
+
+    return starts[firsts], ends[lasts], new_offsets
+
+
+def remove_large_intron_batch(starts, ends, offsets, max_intron=1e6):
+    '''Columnar version of remove_large_intron.
+
+    Returns an index of the first exon of each group followed by
+    the total number of exons, i.e. exons of group j are
+    starts[groups[j]:groups[j + 1]].
+
+    '''
+    first = np.zeros(len(starts) + 1, dtype=bool)
+    if max_intron >= 0:
+        first[1:-1] = (starts[1:] - 1) - (ends[:-1] + 1) > max_intron
+    first[offsets] = True
+
+    return np.flatnonzero(first)
 
 
 def remove_large_intron(exons, max_intron=1e6):
@@ -150,15 +803,86 @@ def remove_large_intron(exons, max_intron=1e6):
     return all_exon_groups
 
 
-def add_intron(exons, align_db, clusters, cluster_no):
+def get_chain(exons):
+    '''Returns an exon chain, a chromosome id followed by start and
+    end positions of all exons.
+
+    '''
+    positions = [pos for exon in exons for pos in (exon.start, exon.end)]
+    return (exons[0].chrom,) + tuple(positions)
+
+
+def chain_to_exons(chain):
+    '''Returns exon objects from an exon chain of a chain table,
+    which has a chromosome name instead of an id (see parse_input).
+
+    '''
+    chrom = chrom_table.get_id(chain[0])
+    return [ExonObj(chrom, chain[i], chain[i + 1])
+                for i in range(1, len(chain), 2)]
+
+
+def count_chain(align_db, exons, count=1):
+    '''Counts alignments with the same exon chain and returns True
+    if a chain is found for the first time.
+
+    Identical alignments add nothing new to exon and intron db,
+    so only unique chains need to be added.
+
+    '''
+    chain = get_chain(exons)
+    try:
+        align_db.chain_db[chain] += count
+    except KeyError:
+        align_db.chain_db[chain] = count
+        return True
+    else:
+        return False
+
+
+def add_support(align_db, exons, count=1):
+    '''Adds count to support of exons and introns of an exon chain
+    that has been added before (see count_chain).
+
+    Support of single exons is taken from chain db when they are
+    merged (see SingleExonDB.merge). Exons and introns are only looked
+    up, so ones not in exon or intron db are skipped.
+
+    '''
+    if len(exons) < 2:
+        return
+
+    exon_db = align_db.exon_db
+    intron_db = align_db.intron_db
+    last_exon = None
+    for exon in exons:
+        exon_id = exon_db.ids.find(exon.chrom, exon.start, exon.end)
+        if exon_id is not None:
+            exon_db.support[exon_id] += count
+        if last_exon is not None:
+            intron_id = intron_db.ids.find(exon.chrom, last_exon.end + 1,
+                                            exon.start - 1)
+            if intron_id is not None:
+                intron_db.support[intron_id] += count
+        last_exon = exon
+
+
+def add_intron(exons, align_db, count=1):
     '''Get introns from a set of exons.
 
-    Intron object is created for each intron with all connected exons
-    as an attribute.
+    Each intron is added to the intron table with a pair of exons
+    flanking it and count alignments supporting it. Introns of the same
+    alignment are merged into one cluster.
+
+    Introns are added to exons first found in this alignment
+    (see add_exon), i.e. exons without introns in exon db.
     '''
 
+    exon_db = align_db.exon_db
+    intron_db = align_db.intron_db
     introns = []
-    existing_clusters = set()
+    new_exons = set([exon.id for exon in exons
+                        if not exon_db.introns[exon.id]])
 
     for i in range(len(exons)):
         curr_exon = exons[i]
@@ -167,180 +891,139 @@ def add_intron(exons, align_db, clusters, cluster_no):
         except IndexError:
             pass
         else:
-            intron_start = curr_exon.end + 1
-            intron_end = next_exon.start - 1
+            intron_id = intron_db.add(curr_exon.chrom,
+                                        curr_exon.end + 1,
+                                        next_exon.start - 1,
+                                        curr_exon.id,
+                                        next_exon.id,
+                                        count)
+            introns.append(intron_id)
 
-            curr_exon.next_exons.add(str(next_exon))
+            for exon_id in (curr_exon.id, next_exon.id):
+                if exon_id in new_exons:
+                    exon_db.add_intron(exon_id, intron_id)
 
-            intron_name = '%s:%d-%d' % (curr_exon.chrom,
-                                            intron_start,
-                                            intron_end)
-            intron = nx.DiGraph(name=intron_name, cluster=None)
+    for i in range(1, len(introns)):
+        intron_db.union_clusters(introns[i - 1], introns[i])
 
-            try:
-                intron_ = align_db.intron_db[intron.graph['name']]
-            except KeyError:
-                align_db.intron_db[intron.graph['name']] = intron
-                intron.add_edge(str(curr_exon), str(next_exon))
-                introns.append(intron)
 
-                curr_exon.introns.add(intron.graph['name'])
-                next_exon.introns.add(intron.graph['name'])
-            else:
-                intron_.add_edge(str(curr_exon), str(next_exon))
-                introns.append(intron_)
-                existing_clusters.add(intron_.graph['cluster'])
-
-                curr_exon.introns.add(intron_.graph['name'])
-                next_exon.introns.add(intron_.graph['name'])
-
-    if introns:
-        cluster_no += 1  # create new cluster index
-        if not existing_clusters:
-            cluster = nx.DiGraph()
-            if len(introns) > 1:
-                cluster.add_path([i.graph['name'] for i in introns])
-                for intron in introns:
-                    intron.graph['cluster'] = cluster_no
-            else:
-                cluster.add_node(introns[0].graph['name'])
-                introns[0].graph['cluster'] = cluster_no
-        else:
-            cluster = nx.DiGraph(exons=set())
-            for cl in existing_clusters:
-                cluster.add_edges_from(clusters[cl].edges())
-                clusters.pop(cl)
+def find_runs(values):
+    '''Returns index ranges (lo, hi) of runs of two or more equal
+    values in a sorted numpy array.
 
-            for intron in cluster.nodes():
-                align_db.intron_db[intron].graph['cluster'] = cluster_no
-
-            if len(introns) > 1:
-                cluster.add_path([i.graph['name'] for i in introns])
+    '''
+    bounds = np.flatnonzero(values[1:] != values[:-1]) + 1
+    bounds = np.concatenate(([0], bounds, [len(values)]))
+    runs = np.flatnonzero(np.diff(bounds) > 1)
+    return zip(bounds[runs].tolist(), bounds[runs + 1].tolist())
 
-                for intron in introns:
-                    intron.graph['cluster'] = cluster_no
-            else:
-                cluster.add_node(introns[0].graph['name'])
-                introns[0].graph['cluster'] = cluster_no
 
-        clusters[cluster_no] = cluster
+def get_terminals(g):
+    '''Returns terminal flags (see ExonTable) of exons of a splice
+    graph; exons only with outgoing edges are left terminals and exons
+    only with incoming edges are right terminals.
 
-    return cluster_no
+    '''
+    terminals = dict.fromkeys(g.nodes(), 0)
+    terminals.update(dict.fromkeys(g.sources(), ExonTable.LEFT))
+    terminals.update(dict.fromkeys(g.sinks(), ExonTable.RIGHT))
+    return terminals
 
 
-def collapse_exon(g, align_db):
+def collapse_exon(g, align_db, terminals=None):
     '''Merge overlapped exons together.
 
     An exon gets extended when they are merged with a larger exon.
 
     A smaller exon is then removed from the graph.
 
-    '''
-
-    exons = [align_db.exon_db[e] for e in g.nodes()]
-    sorted_exons = sorted(exons, key=lambda x: (x.end, x.start))
-    chromosome = exons[0].chrom
+    Exons are sorted by their ends and starts in exon db columns, and
+    only runs of exons with the same end (then start) are walked.
+    terminals = terminal flags of exons by their ids, those of
+    exon db by default (see ExonTable).
 
-    i = 0
-    curr_exon = sorted_exons[i]
-    while i <= len(sorted_exons):
-        try:
-            next_exon = sorted_exons[i + 1]
-        except IndexError:
-            pass
-        else:
-            if curr_exon.end == next_exon.end:
-                if next_exon.terminal == 1:  # left terminal
-                    g.add_edges_from([(str(curr_exon), n)\
-                            for n in g.successors(str(next_exon))])
-                    g.remove_node(str(next_exon))
-                    if curr_exon.terminal == 2:
-                        curr_exon.terminal = None
-                else:
-                    if (curr_exon.terminal == 1 and
-                            next_exon.start - curr_exon.start <= min_utr):
-                        g.add_edges_from([(str(next_exon), n) for n in
-                                            g.successors(str(curr_exon))])
-                        g.remove_node(str(curr_exon))
-                    curr_exon = next_exon
-            else:
-                curr_exon = next_exon
-        i += 1
-
-    i = 0
-    exons = [align_db.exon_db[e] for e in g.nodes()]
-    sorted_exons = sorted(exons, key=lambda x: (x.start, x.end))
-    curr_exon = sorted_exons[0]
-    while i <= len(sorted_exons):
-        try:
-            next_exon = sorted_exons[i + 1]
-        except IndexError:
-            pass
-        else:
-            if curr_exon.start == next_exon.start:
-                if curr_exon.terminal == 2:
-                    g.add_edges_from([(n, str(next_exon))\
-                            for n in g.predecessors(str(curr_exon))])
-                    g.remove_node(str(curr_exon))
-                    curr_exon = next_exon
-                else:
-                    if next_exon.terminal == 2:
-                        if next_exon.end - curr_exon.end <= min_utr:
-                            g.add_edges_from([(n, str(curr_exon))\
-                                    for n in g.predecessors(str(next_exon))])
-                            g.remove_node(str(next_exon))
-                        else:
-                            curr_exon = next_exon
-                    else:
-                        curr_exon = next_exon
+    '''
+    exon_db = align_db.exon_db
+    if terminals is None:
+        terminals = exon_db.terminals
+
+    nodes = np.array(g.nodes())
+    starts, ends = exon_db.get_positions(nodes)
+    order = np.lexsort((starts, ends))
+    runs = find_runs(ends[order])
+    nodes, starts, ends = [column[order].tolist()
+                            for column in (nodes, starts, ends)]
+    for lo, hi in runs:
+        curr_exon = nodes[lo]
+        curr_start = starts[lo]
+        for i in range(lo + 1, hi):
+            next_exon = nodes[i]
+            if terminals[next_exon] == ExonTable.LEFT:
+                g.add_edges_from([(curr_exon, n)
+                                    for n in g.successors(next_exon)])
+                g.remove_node(next_exon)
+                if terminals[curr_exon] == ExonTable.RIGHT:
+                    terminals[curr_exon] = 0
             else:
+                if (terminals[curr_exon] == ExonTable.LEFT and
+                        starts[i] - curr_start <= min_utr):
+                    g.add_edges_from([(next_exon, n)
+                                        for n in g.successors(curr_exon)])
+                    g.remove_node(curr_exon)
                 curr_exon = next_exon
-        i += 1
-    try:
-        '''If there are single exons in this chromosome,
-        remove or extend them according to how they overlap with
-        exons in the cluster.
-
-        '''
-        singles = align_db.single_exons_intervals[chromosome]
-    except KeyError:
-        pass
-    else:
-        for node in g.nodes():
-            exon = align_db.exon_db[node]
-            remove_redundant_exon(exon, singles, set())
+                curr_start = starts[i]
+
+    nodes = np.array(g.nodes())
+    starts, ends = exon_db.get_positions(nodes)
+    order = np.lexsort((ends, starts))
+    runs = find_runs(starts[order])
+    nodes, starts, ends = [column[order].tolist()
+                            for column in (nodes, starts, ends)]
+    for lo, hi in runs:
+        curr_exon = nodes[lo]
+        curr_end = ends[lo]
+        for i in range(lo + 1, hi):
+            next_exon = nodes[i]
+            if terminals[curr_exon] == ExonTable.RIGHT:
+                g.add_edges_from([(n, next_exon)
+                                    for n in g.predecessors(curr_exon)])
+                g.remove_node(curr_exon)
+            elif (terminals[next_exon] == ExonTable.RIGHT and
+                    ends[i] - curr_end <= min_utr):
+                g.add_edges_from([(n, curr_exon)
+                                    for n in g.predecessors(next_exon)])
+                g.remove_node(next_exon)
+                continue
+            curr_exon = next_exon
+            curr_end = ends[i]
+
+
+def remove_redundant_exons(g, align_db):
+    '''Marks merged single exons overlapping exons of a splice graph
+    as removed if they are a subset of an exon or extend it by less
+    than min_utr in total (see SingleExonDB).
 
+    '''
+    exon_db = align_db.exon_db
+    nodes = g.nodes()
+    chrom = exon_db.chroms[nodes[0]]
+    if chrom not in align_db.single_exons_db.merged:
+        return
 
-def remove_redundant_exon(exon, singles, unmergables):
-    '''Recursively remove exons that are subset of a given exon.'''
-
-    overlaps = [o for o in singles.find(exon.start, exon.end) \
-                                if not o.value['exon'].remove and \
-                                str(o.value['exon']) not in unmergables]
-    if not overlaps:
+    starts, ends = exon_db.get_positions(nodes)
+    merged, lo, hi = align_db.single_exons_db.find(chrom, starts, ends)
+    counts = np.maximum(hi - lo, 0)
+    if not counts.any():
         return
-    for o in overlaps:
-        if o.start >= exon.start and o.end <= exon.end:
-            o.value['exon'].remove = True  # mark the exon as removed
-        elif o.start >= exon.start and o.end > exon.end:
-            if o.end - exon.end < min_utr:
-                o.value['exon'].remove = True
-            else:
-                unmergables.add(str(o.value['exon']))
-        elif o.start < exon.start and o.end <= exon.end:
-            if exon.start - o.start < min_utr:
-                o.value['exon'].remove = True
-            else:
-                unmergables.add(str(o.value['exon']))
-        elif o.start < exon.start and o.end > exon.end:
-            if (exon.start - o.start) + (o.end - exon.end) < min_utr:
-                o.value['exon'].remove = True
-            else:
-                unmergables.add(str(o.value['exon']))
-        else:
-            unmergables.add(str(o.value['exon']))
 
-    remove_redundant_exon(exon, singles, unmergables)
+    # pairs of exons and merged single exons overlapping them
+    exons = np.repeat(np.arange(len(nodes)), counts)
+    singles = (np.repeat(lo, counts) + np.arange(counts.sum()) -
+                np.repeat(np.cumsum(counts) - counts, counts))
+    overhang = (np.maximum(starts[exons] - merged['start'][singles], 0) +
+                np.maximum(merged['end'][singles] - ends[exons], 0))
+    redundant = (overhang == 0) | (overhang < min_utr)
+    merged['remove'][singles[redundant]] = True
 
 
 def delete_gap(exons, gap_size=0):
@@ -374,139 +1057,223 @@ def delete_gap(exons, gap_size=0):
     return new_exons
 
 
-def add_exon(align_db, exons):
-    '''1.Change a terminal attribute of a leftmost exon
-    and a rightmost exon to 1 and 2 respectively.
+def add_exon(align_db, exons, count=1):
+    '''Add exons to the exon database (db) and count alignments
+    supporting each exon.
+
+    A leftmost exon and a rightmost exon are left and right terminals
+    respectively (see ExonTable).
+
+    '''
+    last = len(exons) - 1
+    for i, exon in enumerate(exons):
+        if i == 0:
+            terminal = ExonTable.LEFT
+        elif i == last:
+            terminal = ExonTable.RIGHT
+        else:
+            terminal = 0
+        exon.id = align_db.exon_db.add(exon.chrom, exon.start, exon.end,
+                                        terminal, count)
+
 
-    A terminal attribute has a value 'None' by default.
+def merge_cluster(align_db):
+    '''Connect introns from the same gene together and returns loci,
+    lists of intron ids of each gene in order of their first introns.
 
-    2.Add exons to the exon database (db).
+    Clusters of introns of each exon are merged in the intron db
+    (see IntronTable.union_clusters), so clusters sharing exons end up
+    in the same locus; a cluster of an intron is then its locus.
+    Only loci with introns of exons in the exon db are returned, since
+    exons keep introns of the first alignment with them (see add_intron).
 
     '''
-    exons[0].terminal = 1  # left end
-    exons[-1].terminal = 2  # right end
+    intron_db = align_db.intron_db
+    exon_introns = []
+    for introns in align_db.exon_db.introns:
+        if introns:
+            exon_introns.append(introns[0])
+        for i in range(1, len(introns)):
+            intron_db.union_clusters(introns[0], introns[i])
 
-    for exon in exons:
-        try:
-            exon_ = align_db.exon_db[str(exon)]
-        except KeyError:
-            align_db.exon_db[str(exon)] = exon
-        else:
-            if ((exon.terminal and exon_.terminal) and
-                        exon.terminal != exon_.terminal):
-                exon.terminal = None
+    roots = intron_db.get_roots()
+    found = set(roots[exon_introns].tolist())
+    return sorted([introns for root, introns
+                    in intron_db.get_clusters().iteritems() if root in found])
 
-            if not exon.terminal and exon_.terminal:
-                exon_.terminal = None
 
+def get_junction_support(align_db, exon1, exon2):
+    '''Returns a number of alignments with an intron between exons
+    with ids exon1 and exon2.
 
-def merge_cluster(align_db):
-    '''Connect introns from the same gene together.'''
-
-    big_cluster = nx.Graph()
-    paths = []
-    for exon in align_db.exon_db.itervalues():
-        pth = []
-        for intron in exon.introns:
-            cluster = align_db.intron_db[intron].graph['cluster']
-            pth.append(cluster)
-            # exon.clusters.add(cluster)
-        paths.append(pth)
-
-    for pth in paths:
-        if len(pth) > 2:
-            big_cluster.add_path(pth)
-        elif len(pth) == 2:
-            big_cluster.add_edges_from([pth])
-        elif len(pth) == 1:
-            big_cluster.add_nodes_from(pth)
-        else:
-            pass
+    Exons merged by collapse_exon keep their splice sites, so an edge
+    of a splice graph always has the intron of an alignment.
 
-    return big_cluster
+    '''
+    exon_db = align_db.exon_db
+    return align_db.intron_db.get_support(exon_db.chroms[exon1],
+                                            exon_db.ends[exon1] + 1,
+                                            exon_db.starts[exon2] - 1)
 
 
-def print_bed(align_db, transcript, strand, gene_id, tran_id):
-    '''Print a splice graph in BED format.'''
+def get_transcript_score(align_db, transcript):
+    '''Returns a BED score of a transcript, a number of alignments
+    with its weakest junction (up to 1000).
 
-    exons = [align_db.exon_db[e] for e in transcript]
+    '''
+    if len(transcript) > 1:
+        support = min([get_junction_support(align_db, exon1, exon2)
+                        for exon1, exon2 in zip(transcript[:-1],
+                                                transcript[1:])])
+    else:
+        support = align_db.exon_db.support[transcript[0]]
+    return min(support, 1000)
 
-    chrom_start = exons[0].start
-    chrom_end = exons[-1].end
-    chrom = exons[0].chrom
 
-    block_starts = ','.join([str(exon.start - chrom_start) for exon in exons])
-    block_sizes = ','.join([str(exon.end - exon.start) for exon in exons])
+def prune_edges(g, align_db, min_support=1, min_ratio=0):
+    '''Removes edges of a splice graph with junctions supported by
+    fewer than min_support alignments or by less than min_ratio of
+    the strongest junction from the same exon or to the same exon,
+    then removes exons left without edges.
 
-    name = '%s:%d.%d' % (chrom, gene_id, tran_id)
-    score = 1000
-    item_RGB = '0,0,0'
-    thick_start = chrom_start
-    thick_end = chrom_end
-    block_count = len(exons)
+    Returns a number of removed edges.
+
+    '''
+    if min_support <= 1 and min_ratio <= 0:
+        return 0  # every junction is found in an alignment
+
+    support = dict((edge, get_junction_support(align_db, *edge))
+                    for edge in g.edges())
+    max_out = {}
+    max_in = {}
+    for (exon1, exon2), count in support.iteritems():
+        max_out[exon1] = max(max_out.get(exon1, 0), count)
+        max_in[exon2] = max(max_in.get(exon2, 0), count)
+
+    weak_edges = [edge for edge, count in support.iteritems()
+                    if count < min_support or
+                        count < min_ratio * max(max_out[edge[0]],
+                                                max_in[edge[1]])]
+    g.remove_edges_from(weak_edges)
+    g.remove_nodes_from([node for node in g.nodes() if not g.degree(node)])
+
+    return len(weak_edges)
 
-    writer = csv.writer(stdout, dialect='excel-tab')
-    writer.writerow((chrom,
-                    chrom_start,
-                    chrom_end,
-                    name,
-                    score,
-                    strand,
-                    thick_start,
-                    thick_end,
-                    item_RGB,
-                    block_count,
-                    block_sizes,
-                    block_starts))
-
-
-def print_bed_single(exon, gene_id, tran_id):
-    '''Print a splice graph in BED format.'''
-
-    chrom_start = exon.start
-    chrom_end = exon.end
-    chrom = exon.chrom
-
-    block_starts = ','.join([str(exon.start - chrom_start)])
-    block_sizes = ','.join([str(exon.end - exon.start)])
-
-    name = '%s:%d.%d' % (chrom, gene_id, tran_id)
-    score = 1000
-    item_RGB = '0,0,0'
-    thick_start = chrom_start
-    thick_end = chrom_end
-    strand = '+'
-    block_count = 1
+
+def get_bed(align_db, transcript, strand):
+    '''Returns a transcript as a BED row without a name, thick
+    positions and a color (see print_genes).
+
+    '''
+    exon_db = align_db.exon_db
+    starts = [exon_db.starts[e] for e in transcript]
+    ends = [exon_db.ends[e] for e in transcript]
+
+    chrom_start = starts[0]
+    chrom_end = ends[-1]
+    chrom = chrom_table.names[exon_db.chroms[transcript[0]]]
+
+    block_starts = ','.join([str(start - chrom_start) for start in starts])
+    block_sizes = ','.join([str(end - start)
+                            for start, end in zip(starts, ends)])
+
+    score = get_transcript_score(align_db, transcript)
+
+    return (chrom, chrom_start, chrom_end, score, strand,
+            len(transcript), block_sizes, block_starts)
+
+
+def get_bed_single(exon, score=1000):
+    '''Returns a single exon as a BED row (see get_bed).
+
+    score = a number of alignments of the exon (up to 1000).
+
+    '''
+    chrom = chrom_table.names[exon.chrom]
+    block_sizes = str(exon.end - exon.start)
+
+    return (chrom, exon.start, exon.end, min(score, 1000), '+',
+            1, block_sizes, '0')
+
+
+def get_bed_key(row):
+    '''Returns chrom, start, end, strand and blocks of a BED row
+    (see get_bed) to sort rows by position.
+
+    '''
+    return row[:3] + row[4:]
+
+
+def get_gene_key(gene):
+    '''Returns chrom, start and end of a gene, a list of BED rows
+    sorted by get_bed_key, and keys of its rows to break ties.
+
+    '''
+    chrom, chrom_start = gene[0][:2]
+    chrom_end = max([row[2] for row in gene])
+    return (chrom, chrom_start, chrom_end), [get_bed_key(row) for row in gene]
+
+
+def print_genes(genes, gene_id=0):
+    '''Prints genes, lists of BED rows of transcripts (see get_bed),
+    in BED format sorted by chromosome name and position, i.e. sort
+    -k1,1 -k2,2n.
+
+    A gene is named by its locus, chrom:start-end (BED coordinates
+    of its transcripts), and its transcripts chrom:start-end.isoform
+    numbered by position, so names do not depend on other genes or
+    an order genes are built in. Genes with the same locus are named
+    chrom:start-end_2 and so on in order of their transcripts (see
+    get_gene_key). Transcripts of overlapping genes can be interleaved
+    (see bedio.read_genes).
+
+    gene_id = a number of genes printed before. Returns gene_id plus
+    a number of genes printed.
+
+    '''
+    genes = [sorted(gene, key=get_bed_key) for gene in genes]
+    genes.sort(key=get_gene_key)
+
+    rows = []
+    loci = {}
+    for gene in genes:
+        locus = '%s:%d-%d' % get_gene_key(gene)[0]
+        loci[locus] = loci.get(locus, 0) + 1
+        if loci[locus] > 1:
+            locus += '_%d' % loci[locus]
+
+        for tran_id, row in enumerate(gene, start=1):
+            chrom, chrom_start, chrom_end, score, strand = row[:5]
+            name = '%s.%d' % (locus, tran_id)
+            rows.append((chrom, chrom_start, chrom_end, name, score, strand,
+                            chrom_start, chrom_end, '0,0,0') + row[5:])
+    rows.sort(key=itemgetter(0, 1, 2, 5, 9, 10, 11))  # see get_bed_key
 
     writer = csv.writer(stdout, dialect='excel-tab')
-    writer.writerow((chrom,
-                    chrom_start,
-                    chrom_end,
-                    name,
-                    score,
-                    strand,
-                    thick_start,
-                    thick_end,
-                    item_RGB,
-                    block_count,
-                    block_sizes,
-                    block_starts))
+    writer.writerows(rows)
+
+    return gene_id + len(genes)
 
 
 def build_gene_model(genome,
                         align_db,
-                        clusters,
-                        big_cluster,
+                        loci,
                         find_max,
                         min_transcript_len=0,
                         max_isoforms=1e6,
+                        gene_id=0,
                     ):
 
-    '''Build and print out gene models.'''
+    '''Build gene models of loci (see merge_cluster).
 
-    visited_clusters = set()
+    Returns genes, lists of BED rows of transcripts (see get_bed),
+    and a number of excluded transcripts. gene_id = a number of genes
+    built before, for the progress report only.
+
+    '''
+
+    genes = []
     transcripts_num = 0
-    gene_id = 0
     excluded = 0
     two_exon_trns = set()
 
@@ -515,14 +1282,14 @@ def build_gene_model(genome,
         fail the criteria.
 
         '''
-        transcript_length = sum([align_db.exon_db[e].get_size() \
-                                                for e in transcript])
+        transcript_length = sum([align_db.exon_db.get_size(e)
+                                    for e in transcript])
 
         if transcript_length <= min_transcript_len:
             return False  # fail
         else:
             if len(transcript) == 2:
-                trns = ','.join(transcript)
+                trns = tuple(transcript)
                 if trns in two_exon_trns:
                     return False  # fail
                 else:
@@ -531,248 +1298,780 @@ def build_gene_model(genome,
             else:
                 return True
 
-    def exon_to_exonobj(exon):
-        '''Returns an exon objects from a given exon coordinate.'''
-        chrom, coord = exon.split(':')
-        start, end = coord.split('-')
-        return ExonObj(chrom, int(start), int(end))
-
-    for cl_num, cl in enumerate(big_cluster.nodes(), start=1):
-        if cl not in visited_clusters:
-            g = nx.DiGraph()
-            for intron in clusters[cl].nodes():
-                g.add_edges_from(align_db.intron_db[intron].edges())
-
-            visited_clusters.add(cl)
-
-            for neighbor in nx.dfs_tree(big_cluster, cl):
-                neighbor_cluster = clusters[neighbor]
-                for intron in neighbor_cluster.nodes():
-                    g.add_edges_from(align_db.intron_db[intron].edges())
-
-                visited_clusters.add(neighbor)
-            # # nx.draw_spring(nx.algorithms.dfs_tree(g))
-            # nx.draw_spring(g)
-            # plt.show()
-            # for node in g.nodes():
-            #     print node, g[node]
-            # raise SystemExit
-            collapse_exon(g, align_db)
-            for g in split_strand.split(g, genome):
-                if g.nodes():
-                    subalign_db = AlignmentDB()
-                    for edge in g.edges():
-                        exon1 = exon_to_exonobj(edge[0])
-                        exon2 = exon_to_exonobj(edge[1])
-                        add_exon(subalign_db, [exon1, exon2])
-                    collapse_exon(g, subalign_db)
-
-                    trans_id = 0
-                    gene_id += 1
-                    strand = g.graph['strand']
-                    for node in g.nodes():
-                        if not g.predecessors(node):
-                            g.add_edge('Start', node)
-                        if not g.successors(node):
-                            g.add_edge(node, 'End')
-
-                    max_paths = [path for path in \
-                                    nx.all_simple_paths(g, 'Start', 'End')]
-
-                    if find_max:
-                        '''Report all maximum isoforms.'''
-
-                        for transcript in max_paths:
-                            transcript = transcript[1:-1]
-                            if check_criteria(transcript, two_exon_trns):
-                                transcripts_num += 1
-                                trans_id += 1
-                                print_bed(align_db,
-                                            transcript,
-                                            strand,
-                                            gene_id,
-                                            trans_id)
-                            else:
-                                excluded += 1
+    def get_exon_position(exon_id):
+        '''Returns a position of an exon.'''
+        return align_db.exon_db.starts[exon_id], align_db.exon_db.ends[exon_id]
+
+    for locus in loci:
+        g = SpliceGraph()
+        for intron in locus:
+            g.add_edges_from(align_db.intron_db.get_edges(intron))
+
+        collapse_exon(g, align_db)
+        remove_redundant_exons(g, align_db)
+        for g in split_strand.split(g, genome, align_db.exon_db):
+            if g.nodes():
+                collapse_exon(g, align_db, get_terminals(g))
+                prune_edges(g, align_db, min_junction_support,
+                            min_junction_ratio)
+                if not g.nodes():
+                    continue
+
+                strand = g.strand
+
+                if find_max:
+                    '''Report all maximum isoforms.'''
+                    transcripts = g.paths()
+                elif g.count_paths() > max_isoforms:
+                    '''Report minimal isoforms if maximum isoforms
+                    exceeds max_isoforms.
+
+                    '''
+                    digraph, nodes = g.to_digraph(get_exon_position)
+                    transcripts = [[nodes[i] for i in path] for path in
+                                    get_min_isoforms.get_min_paths(digraph,
+                                                                    False)]
+                else:
+                    transcripts = g.paths()
+
+                gene = []
+                for transcript in transcripts:
+                    if check_criteria(transcript, two_exon_trns):
+                        gene.append(get_bed(align_db, transcript, strand))
                     else:
-                        '''Report minimal isoforms if maximum isoforms exceeds
-                        max_isoforms.
-
-                        '''
-                        if len(max_paths) > max_isoforms:
-                            for transcript in \
-                                    get_min_isoforms.get_min_paths(g, False):
-                                if check_criteria(transcript, two_exon_trns):
-                                    transcripts_num += 1
-                                    trans_id += 1
-                                    print_bed(align_db,
-                                                transcript,
-                                                strand,
-                                                gene_id,
-                                                trans_id)
-                                else:
-                                    excluded += 1
-                        else:
-                            for transcript in max_paths:
-                                transcript = transcript[1:-1]
-                                if check_criteria(transcript, two_exon_trns):
-                                    transcripts_num += 1
-                                    trans_id += 1
-                                    print_bed(align_db,
-                                                transcript,
-                                                strand,
-                                                gene_id,
-                                                trans_id)
-                                else:
-                                    excluded += 1
+                        excluded += 1
+
+                if gene:
+                    genes.append(gene)
+                    transcripts_num += len(gene)
 
         print >> stderr, '\r  |--Multi-exon\t\t%d genes, %d isoforms ' % \
-                                            (gene_id, transcripts_num),
+                                    (gene_id + len(genes), transcripts_num),
 
-    return gene_id, transcripts_num, excluded
+    return genes, excluded
 
 
 def merge_exon(align_db):
     '''Return merged exons from exons overlapped to each other.'''
 
-    exons = {}
-    for chrom in align_db.single_exons_db:
-        exons[chrom] = []
-        for exn in align_db.single_exons_db[chrom]:
-            if not exn.remove:
-                exons[chrom].append(exn)
-        exons[chrom] = sorted(exons[chrom], key=lambda x: x.start)
-
-    new_exons = {}
-
-    for chrom in exons:
-        i = 0
-        new_exons[chrom] = []
-        curr_exon = exons[chrom][i]
-        while i < len(exons[chrom]):
-            try:
-                next_exon = exons[chrom][i + 1]
-            except IndexError:
-                new_exons[chrom].append(curr_exon)
-                break
-            else:
-                if next_exon.start <= curr_exon.end:
-                    if next_exon.end > curr_exon.end:
-                        next_exon.start = curr_exon.start
-                        curr_exon = next_exon
-                else:
-                    new_exons[chrom].append(curr_exon)
-                    curr_exon = next_exon
-            i += 1
+    return align_db.single_exons_db.merge(align_db.chain_db)
 
-    return new_exons
 
+def detect_format(first_line):
+    '''Returns a file format detected from the first line
+    of input file, or None if a format is unknown.
+
+    Comment and header lines starting with # are skipped before
+    the first line is taken (see fileio.peek_line).
+
+    '''
+    if first_line.startswith(bamio.BAM_MAGIC):
+        return 'BAM'
+    elif bamio.is_sam(first_line):
+        return 'SAM'
+    elif gffio.is_gff(first_line):
+        return 'GFF'
+
+    cols = first_line.split()
+
+    try:
+        if len(cols) == 21:
+            if int(cols[11]) <= int(cols[12]) and cols[8] in ['+', '.', '-']:
+                return 'PSL'
+        elif len(cols) == 12:
+            if int(cols[1]) <= int(cols[2]) and cols[5] in ['+', '.', '-']:
+                return 'BED'
+    except ValueError:
+        pass
+    return None
 
-def detect_format(input_file):
-    '''Returns a file format detected from input file.'''
 
-    fp = open(input_file)
-    cols = fp.readline().split()
-    fp.close()
+def read_alignments(input_file, filtered, regions=None, byte_range=None):
+    '''Detects a format of an input file and returns groups of exon
+    objects from each alignment (see remove_large_intron).
 
-    if len(cols) == 21:
-        if int(cols[11]) <= int(cols[12]) and cols[8] in ['+', '.', '-']:
-            return 'PSL'
-    elif len(cols) == 12:
-        if int(cols[1]) <= int(cols[2]) and cols[5] in ['+', '.', '-']:
-            return 'BED'
+    byte_range = (start, end) of lines to be read from a plain
+    PSL/BED file (see fileio.split_file).
+
+    '''
+    if chainfile.is_chain_file(input_file):
+        print >> stderr, 'ERROR: %s is a chain file, ' % input_file + \
+                'it cannot be read with --stream.'
+        raise SystemExit
+
+    if byte_range:
+        fobj = fileio.open_range(input_file, *byte_range)
     else:
-        return None
+        fobj = fileio.open_file(input_file)
+    first_line, lines = fileio.peek_line(fobj, '#')
+    input_format = detect_format(first_line)
 
+    if regions and input_format in ('PSL', 'BED'):
+        if fileindex.can_index(input_file):
+            fobj.close()  # reopened with an index
+            try:
+                lines = fileindex.fetch(input_file, input_format, regions)
+            except ValueError as e:
+                print >> stderr, 'ERROR: %s' % e
+                raise SystemExit
+        else:
+            lines = fileindex.fetch_scan(lines,
+                                        fileindex.COLUMNS[input_format],
+                                        regions)
+
+    '''====Parse alignments and build exon objects===='''
+    if input_format in ('BAM', 'SAM'):
+        if input_file == '-':
+            print >> stderr, 'ERROR: BAM/SAM cannot be read ' + \
+                    'from standard input.'
+            raise SystemExit
+        fobj.close()  # reopened by pysam
+        alignments = (remove_large_intron(exons, max_intron)
+                        for exons in parse_bam(input_file, regions))
+    elif input_format == 'PSL':
+        alignments = parse_psl_batches(lines, batch_size, filtered)
+    elif input_format == 'BED':
+        alignments = (remove_large_intron(exons, max_intron)
+                        for exons in parse_bed(lines))
+    elif input_format == 'GFF':
+        alignments = (remove_large_intron(exons, max_intron)
+                        for exons in parse_gff(lines, regions))
+    else:
+        print >> stderr, 'ERROR: Unrecognized input format.'
+        raise SystemExit
 
-def main(input_files):
-    print >> stderr, 'Gimme : Alignment-based assembler'
-    print >> stderr, 'Version : %s' % (VERSION)
-    print >> stderr, 'Source code : https://github.com/ged-lab/gimme.git\n'
-    print >> stderr, 'Building a sequence DB...'
-    genome = seqdb.SequenceFileDB(args.reference)
+    if regions:
+        alignments = select_groups(alignments, RegionIndex(regions))
 
-    if args.debug:
-        print >> stderr, 'DEBBUG MODE\t' + \
-                'Use this mode for debugging only!\n'
+    return alignments
 
-    print >> stderr, '[Run...]'
 
-    cluster_no = 0
-    clusters = {}
-    align_db = AlignmentDB()
+def select_groups(alignments, region_index):
+    '''Returns groups of exons of each alignment from the start of
+    the first exon to the end of the last exon overlapping regions,
+    the same as chains of chain files (see chainfile.ChainFile.exons).
+    Alignments without such groups are skipped.
 
-    '''======Detect input format======'''
+    '''
+    for groups in alignments:
+        groups = [group for group in groups
+                    if region_index.overlaps(chrom_table.names[group[0].chrom],
+                                                group[0].start,
+                                                group[-1].end)]
+        if groups:
+            yield groups
+
+
+def add_alignment(align_db, groups, count=1):
+    '''Adds groups of exons from an alignment to exon, intron and
+    single exon db.
+
+    count = a number of alignments with the same groups of exons.
+
+    '''
+    for group in groups:
+        if not count_chain(align_db, group, count):
+            # the same chain has been added
+            add_support(align_db, group, count)
+            continue
+
+        if len(group) > 1:
+            add_exon(align_db, group, count)  # add exons to exon db
+            add_intron(group, align_db, count)
+        else:
+            # add a lone exon to single exon db
+            align_db.single_exons_db.add(group[0])
+
+
+def index_single_exons(align_db):
+    '''Merges overlapped single exons, which are then searched
+    by position (see SingleExonDB). Returns merged exons of each
+    chromosome.
+
+    '''
+    return merge_exon(align_db)
+
+
+def get_single_exon_genes(merged_single_exons):
+    '''Returns single exons that are long enough and not removed
+    (see remove_redundant_exons) as single-exon genes (see print_genes)
+    and a number of excluded exons.
+
+    '''
+    genes = []
+    excluded = 0
+    for chrom in merged_single_exons:
+        merged = merged_single_exons[chrom]
+        sizes = merged['end'] - merged['start'] + 1  # see ExonTable.get_size
+        selected = merged[(sizes > min_single_exon_len) & ~merged['remove']]
+        excluded += len(merged) - len(selected)
+
+        for start, end, support in itertools.izip(
+                                            selected['start'].tolist(),
+                                            selected['end'].tolist(),
+                                            selected['support'].tolist()):
+            genes.append([get_bed_single(ExonObj(chrom, start, end),
+                                            support)])
+            print >> stderr, '\r  |--Single-exon\t%d genes' % len(genes),
+
+    return genes, excluded
+
+
+def parse_input(input_file, regions=None, byte_range=None):
+    '''Reads an input file (or a byte range of it) and returns
+    a chain table: unique exon chains in order they are found,
+    a number of alignments with each chain, a number of alignments
+    and numbers of filtered alignments.
+
+    Adding the chains to an AlignmentDB in order gives the same exon
+    and intron db and clusters as adding all alignments
+    (see count_chain), so chain tables from inputs parsed in parallel
+    are merged by adding them in order of inputs and byte ranges.
+    Chains have chromosome names, since chromosome ids of worker
+    processes are not known to the main process.
+
+    '''
+    if chainfile.is_chain_file(input_file):
+        chains, counts, n, filtered = read_chain_file(input_file, regions)
+        return list(chains), list(counts), n, filtered
+
+    filtered = {'identity': 0, 'coverage': 0}
+    chain_index = {}
+    chains = []
+    counts = []
+
+    n = 0
+    for n, groups in enumerate(read_alignments(input_file,
+                                                filtered,
+                                                regions,
+                                                byte_range), start=1):
+        for group in groups:
+            chain = get_chain(group)
+            try:
+                counts[chain_index[chain]] += 1
+            except KeyError:
+                chain_index[chain] = len(chains)
+                chains.append((chrom_table.names[chain[0]],) + chain[1:])
+                counts.append(1)
+
+    return chains, counts, n, filtered
+
+
+def split_input(input_file, processes, regions=None):
+    '''Returns byte ranges of an input file to be parsed by worker
+    processes, or [None] if a file cannot be split.
+
+    Only plain PSL/BED files larger than min_range_size are split,
+    unless alignments in regions are read (see fileindex.fetch).
+
+    '''
+    if (processes <= 1 or input_file == '-' or regions or
+            fileio.is_compressed(input_file) or
+            chainfile.is_chain_file(input_file)):
+        return [None]
+
+    with open(input_file) as fp:
+        if detect_format(fileio.peek_line(fp, '#')[0]) not in ('PSL', 'BED'):
+            return [None]
+
+    size = os.path.getsize(input_file)
+    n = min(processes, size // min_range_size)
+    if n <= 1:
+        return [None]
+    return fileio.split_file(input_file, n)
+
+
+def parse_inputs(input_files, processes=1, regions=None):
+    '''Returns an input file and a chain table of each part of
+    input files in order (see parse_input and split_input).
+
+    Parts are parsed in worker processes if processes > 1, except
+    standard input (-), which only the main process can read.
+
+    '''
+    tasks = []
     for input_file in input_files:
-        input_format = detect_format(input_file)
-        if input_format == 'PSL':
-            parse = parse_psl
-        elif input_format == 'BED':
-            parse = parse_bed
+        for byte_range in split_input(input_file, processes, regions):
+            tasks.append((input_file, regions, byte_range))
+
+    file_tasks = [task for task in tasks if task[0] != '-']
+    if processes <= 1 or len(file_tasks) <= 1:
+        for task in tasks:
+            yield task[0], parse_input(*task)
+        return
+
+    pool = multiprocessing.Pool(min(processes, len(file_tasks)))
+    tables = pool.imap(parse_input_worker, file_tasks)
+    for task in tasks:
+        if task[0] == '-':
+            table = parse_input(*task)
         else:
-            print >> stderr, 'ERROR: Unrecognized input format. ' + \
-                    'Use utils/gff2bed.py to convert GFF to BED.'
+            table = tables.next()
+            if table is None:
+                pool.terminate()
+                raise SystemExit  # an error is reported by the worker
+        yield task[0], table
+
+    pool.close()
+    pool.join()
+
+
+def open_chain_file(input_file):
+    '''Returns a memory-mapped chain file (see utils/chainfile.py).
+
+    Chains are built with gap_size, max_intron, min_identity and
+    min_coverage given to gimme.py convert, so these parameters
+    cannot be changed.
+
+    '''
+    chain_file = chainfile.ChainFile(input_file)
+    info = chain_file.info
+
+    for name, value in (('gap_size', gap_size),
+                        ('max_intron', max_intron),
+                        ('min_identity', min_identity),
+                        ('min_coverage', min_coverage)):
+        if info[name] != value:
+            print >> stderr, 'ERROR: %s was converted with --%s %s, ' \
+                    'convert it again to use %s.' % (input_file, name,
+                                                        info[name], value)
             raise SystemExit
 
-        '''====Parse alignments and build exon objects===='''
-        print >> stderr, 'Input\t\t\t%s' % input_file
-        for n, exons in enumerate(parse(open(input_file)), start=1):
-            for group in remove_large_intron(exons, max_intron):
-                if len(group) > 1:
-                    add_exon(align_db, group)  # add exons to exon db
-                    cluster_no = add_intron(group, align_db,
-                                                clusters, cluster_no)
-                else:
-                    exon = group[0]  # add a lone exon to single exon db
-                    if exon.chrom not in align_db.single_exons_db:
-                        align_db.single_exons_db[exon.chrom] = [exon]
-                    else:
-                        align_db.single_exons_db[exon.chrom].append(exon)
+    return chain_file
 
-            if n % 100 == 0:
-                print >> stderr, '\r  |--Parsing\t\t%d alignments' % n,
-        print >> stderr, '\r  |--Parsing\t\t%d alignments' % n
 
-    '''====Merge overlapped single exons===='''
-    merged_single_exons = merge_exon(align_db)
+def read_chain_file(input_file, regions=None):
+    '''Returns a chain table from a chain file (see parse_input);
+    chains and counts are iterators over the memory-mapped file.
 
-    '''====Build intervals from single exons.===='''
-    for chrom in merged_single_exons:
-        align_db.single_exons_intervals[chrom] = IntervalTree()
-        for exon in merged_single_exons[chrom]:
-            interval = Interval(exon.start, exon.end, value={'exon': exon})
-            align_db.single_exons_intervals[chrom].insert_interval(interval)
+    Only chains overlapping regions are returned, the same as groups
+    of exons of other inputs (see select_groups).
+
+    '''
+    chain_file = open_chain_file(input_file)
+    region_index = RegionIndex(regions) if regions else None
+
+    pairs = itertools.tee(chain_file.chains(region_index=region_index))
+    return (itertools.imap(itemgetter(0), pairs[0]),
+            itertools.imap(itemgetter(1), pairs[1]),
+            chain_file.info['alignments'],
+            chain_file.info['filtered'])
+
+
+def convert(input_files, output_file, processes=1):
+    '''Writes unique exon chains from all input files to
+    a chain file (see utils/chainfile.py).
+
+    '''
+    filtered = {'identity': 0, 'coverage': 0}
+    chain_index = {}
+    chains = []
+    counts = []
+    n = 0
+
+    last_file = None
+    for input_file, table in parse_inputs(input_files, processes):
+        if input_file != last_file:
+            print >> stderr, 'Input\t\t\t%s' % input_file
+            last_file = input_file
+
+        table_chains, table_counts, table_n, table_filtered = table
+        n += table_n
+        for key in filtered:
+            filtered[key] += table_filtered[key]
+
+        for chain, count in itertools.izip(table_chains, table_counts):
+            try:
+                counts[chain_index[chain]] += count
+            except KeyError:
+                chain_index[chain] = len(chains)
+                chains.append(chain)
+                counts.append(count)
+
+    info = {'version': VERSION,
+            'alignments': n,
+            'filtered': filtered,
+            'gap_size': gap_size,
+            'max_intron': max_intron,
+            'min_identity': min_identity,
+            'min_coverage': min_coverage}
+    chainfile.write(output_file, chains, counts, info)
+
+    print >> stderr, '  |--Parsing\t\t%d alignments' % n
+    print >> stderr, '  |--Unique chains\t%d' % len(chains)
+    print >> stderr, 'Output\t\t\t%s' % output_file
+
+
+def parse_input_worker(task):
+    '''Runs parse_input in a worker process; returns None if
+    an input cannot be read.
+
+    '''
+    try:
+        return parse_input(*task)
+    except SystemExit:
+        return None
+
+
+def build_genes(genome, align_db, gene_id=0):
+    '''Builds and prints multi-exon and single-exon gene models
+    of alignments in align_db sorted by position (see print_genes).
+    gene_id = a number of genes printed before.
+
+    Returns a number of genes printed so far, numbers of transcripts
+    and single-exon genes and a number of excluded transcripts.
+
+    '''
+    '''====Merge overlapped single exons and build intervals===='''
+    merged_single_exons = index_single_exons(align_db)
 
     '''====Connect introns from the same gene to each other===='''
-    big_cluster = merge_cluster(align_db)
+    loci = merge_cluster(align_db)
 
     '''====Build gene models===='''
-    print >> stderr, 'Constructing'
     return_items = build_gene_model(genome,
                                         align_db,
-                                        clusters,
-                                        big_cluster,
+                                        loci,
                                         args.max,
                                         min_transcript_len,
                                         max_isoforms,
+                                        gene_id,
                                     )
+    genes, excluded = return_items
+    transcripts_num = sum([len(gene) for gene in genes])
+
+    single_exon_genes, single_excluded = \
+                                get_single_exon_genes(merged_single_exons)
+    single_exon_gene_num = len(single_exon_genes)
+    transcripts_num += single_exon_gene_num
+    excluded += single_excluded
+
+    '''====Print genes by position===='''
+    gene_id = print_genes(genes + single_exon_genes, gene_id)
+
+    return gene_id, transcripts_num, single_exon_gene_num, excluded
+
+
+def assemble(genome, input_files, filtered):
+    '''Reads all alignments, then builds and prints gene models
+    of each chromosome.
+
+    Alignments are reduced to chain tables of each chromosome, which
+    are written to disk when they exceed max_memory (see
+    ChainPartitions), so only one chromosome is assembled in memory
+    at a time.
+
+    Returns the last gene id, numbers of transcripts and single-exon
+    genes and a number of excluded transcripts.
+
+    '''
+    partitions = ChainPartitions(max_memory << 20)
+    try:
+        parse_partitions(partitions, input_files, filtered)
+        return build_partitions(genome, partitions)
+    finally:
+        partitions.close()
+
+
+def parse_partitions(partitions, input_files, filtered):
+    '''Adds chains of alignments of all inputs to partitions.
+
+    Chain files are added to partitions as they are (see
+    ChainPartitions.add_file); other inputs are parsed, in worker
+    processes if -p is given.
+
+    '''
+    for is_chain_file, files in itertools.groupby(input_files,
+                                                chainfile.is_chain_file):
+        if is_chain_file:
+            for input_file in files:
+                add_chain_file(partitions, input_file, filtered)
+        elif args.processes > 1:
+            parse_tables(partitions, list(files), filtered)
+        else:
+            for input_file in files:
+                parse_alignments(partitions, input_file, filtered)
+
+    if partitions.spilled:
+        print >> stderr, '  |--Spilled\t\t%d segments' % partitions.spilled
 
-    print >> stderr, ''
-    gene_id, transcripts_num, excluded = return_items
 
+def add_chain_file(partitions, input_file, filtered):
+    '''Adds chains of a chain file in regions to partitions.'''
+
+    print >> stderr, 'Input\t\t\t%s' % input_file
+    chain_file = open_chain_file(input_file)
+    for key in filtered:
+        filtered[key] += chain_file.info['filtered'][key]
+
+    if args.region:
+        partitions.add_file(chain_file, RegionIndex(args.region))
+    else:
+        partitions.add_file(chain_file)
+    print >> stderr, '  |--Reading\t\t%d alignments' % \
+                                                chain_file.info['alignments']
+
+
+def parse_tables(partitions, input_files, filtered):
+    '''Parses inputs in worker processes and adds their chain tables
+    to partitions in order (see parse_inputs).
+
+    '''
+    last_file = None
+    for input_file, table in parse_inputs(input_files,
+                                            args.processes,
+                                            args.region):
+        if input_file != last_file:
+            if last_file is not None:
+                print >> stderr, '  |--Parsing\t\t%d alignments' % n
+            print >> stderr, 'Input\t\t\t%s' % input_file
+            last_file = input_file
+            n = 0
+
+        chains, counts, table_n, table_filtered = table
+        n += table_n
+        for key in filtered:
+            filtered[key] += table_filtered[key]
+
+        for chain, count in itertools.izip(chains, counts):
+            partitions.add(chain, count)
+    print >> stderr, '  |--Parsing\t\t%d alignments' % n
+
+
+def parse_alignments(partitions, input_file, filtered):
+    '''Parses an input and adds chains of its alignments
+    to partitions.
+
+    '''
+    alignments = read_alignments(input_file, filtered, args.region)
+
+    print >> stderr, 'Input\t\t\t%s' % input_file
+
+    n = 0  # all alignments may be filtered out
+    for n, groups in enumerate(alignments, start=1):
+        for group in groups:
+            chain = get_chain(group)
+            partitions.add((chrom_table.names[chain[0]],) + chain[1:])
+
+        if n % 100 == 0:
+            print >> stderr, '\r  |--Parsing\t\t%d alignments' % n,
+    print >> stderr, '\r  |--Parsing\t\t%d alignments' % n
+
+
+def build_partitions(genome, partitions):
+    '''Builds and prints gene models of each chromosome
+    from partitions (see build_genes).
+
+    Chromosomes are built in order of their names, so genes are
+    printed and numbered in the same order whatever order alignments
+    are read in.
+
+    '''
+    gene_id = 0
+    transcripts_num = 0
     single_exon_gene_num = 0
-    for chrom in merged_single_exons:
-        for exon in merged_single_exons[chrom]:
-            if (exon.get_size() > min_single_exon_len
-                                    and not exon.remove):
-                gene_id += 1
-                transcripts_num += 1
-                single_exon_gene_num += 1
-                print_bed_single(exon, gene_id, 1)
-                print >> stderr, '\r  |--Single-exon\t%d genes' % \
-                                                    single_exon_gene_num,
-            else:
-                excluded += 1
+    excluded = 0
+    unique_chains = 0
+
+    print >> stderr, 'Constructing'
+    for chrom in sorted(partitions.chroms):
+        align_db = AlignmentDB()
+        for exons, count in partitions.alignments(chrom):
+            add_alignment(align_db, [exons], count)
+        if not align_db.chain_db:
+            continue  # no chains of chain files in regions
+        unique_chains += len(align_db.chain_db)
+
+        return_items = build_genes(genome, align_db, gene_id)
+        gene_id = return_items[0]
+        transcripts_num += return_items[1]
+        single_exon_gene_num += return_items[2]
+        excluded += return_items[3]
+
+    print >> stderr, '\n  |--Unique chains\t%d' % unique_chains
+
+    return gene_id, transcripts_num, single_exon_gene_num, excluded
+
+
+def get_chrom_order(input_files):
+    '''Returns a rank of each chromosome in headers of BAM/SAM
+    input files, i.e. the order of coordinate-sorted files.
+    Chromosomes of the first file come first.
+
+    '''
+    chrom_order = {}
+    for input_file in input_files:
+        if input_file == '-' or chainfile.is_chain_file(input_file):
+            continue
+
+        fobj = fileio.open_file(input_file)
+        input_format = detect_format(fileio.peek_line(fobj, '#')[0])
+        fobj.close()
+        if input_format not in ('BAM', 'SAM'):
+            continue
+
+        try:
+            references = bamio.get_references(input_file)
+        except (ImportError, IOError, OSError, ValueError) as e:
+            print >> stderr, 'ERROR: %s: %s' % (input_file, e)
+            raise SystemExit
+        for chrom in references:
+            chrom_order.setdefault(chrom, len(chrom_order))
+    return chrom_order
+
+
+def merge_sorted_inputs(inputs, chrom_order=None):
+    '''Returns chrom, start, end and groups of exons of each alignment
+    from alignments of all inputs in order of chromosome and start.
+
+    inputs = a list of iterables of groups of exons sorted by
+    chromosome and start position. A single input can be sorted in any
+    chromosome order; alignments from more than one input are merged
+    by chromosome and start.
+
+    chrom_order = a rank of each chromosome (see get_chrom_order).
+    Chromosomes are ordered by their ranks and then by name, so inputs
+    without ranks are merged by chromosome name (i.e. sort -k1,1 -k2,2n
+    for BED).
+
+    '''
+    chrom_order = chrom_order or {}
+    no_rank = len(chrom_order)
+
+    def locate(alignments, input_no):
+        for n, groups in enumerate(alignments):
+            chrom = chrom_table.names[groups[0][0].chrom]
+            yield (chrom_order.get(chrom, no_rank), chrom,
+                    groups[0][0].start, input_no, n, groups[-1][-1].end,
+                    groups)
+
+    if len(inputs) == 1:
+        alignments = locate(inputs[0], 0)
+    else:
+        alignments = heapq.merge(*[locate(alns, input_no)
+                                    for input_no, alns in enumerate(inputs)])
+
+    for rank, chrom, start, input_no, n, end, groups in alignments:
+        yield chrom, start, end, groups
+
+
+def label_loci(alignments):
+    '''Returns a locus number and groups of exons of each alignment
+    from alignments sorted by chromosome and start position.
+
+    alignments = (chrom, start, end, groups) of each alignment.
+
+    A locus is closed when an alignment starts after the end of all
+    alignments in the locus, so no later alignment can overlap it.
+
+    '''
+    locus_no = 0
+    finished_chroms = set()
+    last_chrom, last_start, locus_end = None, 0, 0
+
+    for chrom, start, end, groups in alignments:
+        if chrom != last_chrom:
+            if chrom in finished_chroms:
+                print >> stderr, '\nERROR: Input is not sorted, ' + \
+                        '%s is found after other chromosomes.' % chrom
+                raise SystemExit
+            finished_chroms.add(chrom)
+            locus_no += 1
+            last_chrom, locus_end = chrom, end
+        elif start < last_start:
+            print >> stderr, '\nERROR: Input is not sorted, ' + \
+                    '%s:%d is found after %s:%d.' % (chrom, start,
+                                                    chrom, last_start)
+            raise SystemExit
+        elif start > locus_end:
+            locus_no += 1
+            locus_end = end
+        else:
+            locus_end = max(locus_end, end)
+
+        last_start = start
+        yield locus_no, groups
+
+
+def sweep_loci(alignments):
+    '''Returns an iterator over groups of exons of alignments
+    in each locus (see label_loci).
+
+    Alignments are read while a locus is iterated, so only
+    one locus is in memory at a time.
+
+    '''
+    for locus_no, locus in itertools.groupby(label_loci(alignments),
+                                                key=itemgetter(0)):
+        yield (groups for locus_no, groups in locus)
+
+
+def stream(genome, input_files, filtered):
+    '''Builds and prints gene models one locus at a time from
+    coordinate-sorted inputs.
+
+    Only alignments from the current locus are kept in memory.
+    Loci do not overlap, so genes are printed by position as in
+    assemble, with chromosomes in order of inputs.
+    Returns the same numbers as main for the summary report.
+
+    '''
+    inputs = []
+    for input_file in input_files:
+        inputs.append(read_alignments(input_file, filtered, args.region))
+        print >> stderr, 'Input\t\t\t%s' % input_file
+
+    gene_id = 0
+    transcripts_num = 0
+    single_exon_gene_num = 0
+    excluded = 0
+    n = 0
+    unique_chains = 0
+
+    chrom_order = get_chrom_order(input_files)
+    for locus in sweep_loci(merge_sorted_inputs(inputs, chrom_order)):
+        align_db = AlignmentDB()
+        for groups in locus:
+            add_alignment(align_db, groups)
+            n += 1
+
+        unique_chains += len(align_db.chain_db)
+
+        return_items = build_genes(genome, align_db, gene_id)
+        gene_id = return_items[0]
+        transcripts_num += return_items[1]
+        single_exon_gene_num += return_items[2]
+        excluded += return_items[3]
+
+    print >> stderr, '\n  |--Parsing\t\t%d alignments' % n
+    print >> stderr, '  |--Unique chains\t%d' % unique_chains
+
+    return gene_id, transcripts_num, single_exon_gene_num, excluded
+
+
+def main(input_files):
+    print >> stderr, 'Gimme : Alignment-based assembler'
+    print >> stderr, 'Version : %s' % (VERSION)
+    print >> stderr, 'Source code : https://github.com/ged-lab/gimme.git\n'
+    print >> stderr, 'Building a sequence DB...'
+    genome = GenomeDB(seqdb.SequenceFileDB(args.reference), chrom_table)
+
+    if args.debug:
+        print >> stderr, 'DEBBUG MODE\t' + \
+                'Use this mode for debugging only!\n'
+
+    print >> stderr, '[Run...]'
+
+    filtered = {'identity': 0, 'coverage': 0}
+
+    if args.stream:
+        return_items = stream(genome, input_files, filtered)
+        gene_id, transcripts_num, single_exon_gene_num, excluded = \
+                                                            return_items
+    else:
+        return_items = assemble(genome, input_files, filtered)
+        gene_id, transcripts_num, single_exon_gene_num, excluded = \
+                                                            return_items
 
     '''====Print out summary report to standard error===='''
     print >> stderr, '\n[Done]'
@@ -784,6 +2083,10 @@ def main(input_files):
             'Total single-exon gene = %d gene(s)' % single_exon_gene_num
     else:
         print >> stderr, 'No gene models built.',
+    if min_identity > 0 or min_coverage > 0:
+        print >> stderr, \
+            'Filtered PSL alignments = %d low identity / %d low coverage' % \
+                                (filtered['identity'], filtered['coverage'])
     if excluded > 0 and args.debug:
         print >> stderr, '(%d transcripts do not pass criteria.)' % excluded
     else:
@@ -791,7 +2094,13 @@ def main(input_files):
 
 
 if __name__ == '__main__':
-    parser = argparse.ArgumentParser(prog='gimme.py')
+    convert_mode = sys.argv[1:2] == ['convert']
+    if convert_mode:
+        parser = argparse.ArgumentParser(prog='gimme.py convert',
+                description='Write unique exon chains of alignments ' +
+                                'to a binary chain file.')
+    else:
+        parser = argparse.ArgumentParser(prog='gimme.py')
     parser.add_argument('--min_utr', type=int, metavar='int',
             default=min_utr,
             help='a cutoff size of alternative UTRs (bp)' +
@@ -814,21 +2123,61 @@ if __name__ == '__main__':
             metavar='int', default=min_single_exon_len,
             help='the minimum size of a transcript with a single exon (bp)' +
                     '(default: %(default)s)')
+    parser.add_argument('--min_identity', type=float, metavar='float',
+            default=min_identity,
+            help='the minimum identity of PSL alignments (%%)' +
+                    ' (default: %(default)s)')
+    parser.add_argument('--min_coverage', type=float, metavar='float',
+            default=min_coverage,
+            help='the minimum query coverage of PSL alignments (%%)' +
+                    ' (default: %(default)s)')
+    parser.add_argument('--min_junction_support', type=int, metavar='int',
+            default=min_junction_support,
+            help='the minimum number of alignments with a splice junction' +
+                    ' (default: %(default)s)')
+    parser.add_argument('--min_junction_ratio', type=float,
+            metavar='float', default=min_junction_ratio,
+            help='the minimum support of a splice junction relative to ' +
+                    'the strongest junction of its exons' +
+                    ' (default: %(default)s)')
+    parser.add_argument('-p', '--processes', type=int, metavar='int',
+            default=1,
+            help='a number of processes used to parse input files ' +
+                    '(default: %(default)s)')
+    parser.add_argument('--max_memory', type=int, metavar='int',
+            default=max_memory,
+            help='a memory budget (MB) of parsed alignments; alignments ' +
+                    'are written to temporary files when it is reached ' +
+                    '(default: %(default)s, no limit)')
+    parser.add_argument('--stream', action='store_true',
+            help='build gene models one locus at a time from input(s) ' +
+                    'sorted by chromosome and start position')
     parser.add_argument('-x', '--max', action='store_true',
             help='report all putative isoforms')
     parser.add_argument('--debug', action='store_true',
             help='reset parameters (for debugging purpose only)')
+    parser.add_argument('--region', type=regions.parse_region,
+            action='append', metavar='chr:start-end',
+            help='assemble only alignments in a region (1-based, ' +
+                    'can be used more than once); PSL/BED must be sorted')
     parser.add_argument('input', type=str, nargs='+',
-            help='input file(s) in PSL/BED format')
+            help='input file(s) in PSL/BED/BAM/SAM format ' +
+                    'or chain files from gimme.py convert, ' +
+                    'use - to read PSL/BED from standard input')
     parser.add_argument('-v', '--version', action='version',
             version='%(prog)s version ' + VERSION)
-    parser.add_argument('-r','--reference', type=str,
-            help='a reference genome in FASTA format')
 
-    args = parser.parse_args()
-    if not args.reference:
-        print >> sys.stderr, "A reference file is required."
-        sys.exit()
+    if convert_mode:
+        parser.add_argument('-o', '--output', type=str, required=True,
+                help='an output chain file')
+        args = parser.parse_args(sys.argv[2:])
+    else:
+        parser.add_argument('-r','--reference', type=str,
+                help='a reference genome in FASTA format')
+        args = parser.parse_args()
+        if not args.reference:
+            print >> sys.stderr, "A reference file is required."
+            sys.exit()
 
     if args.debug:
         '''Parameters are set to retain all splice junctions for
@@ -840,6 +2189,8 @@ if __name__ == '__main__':
         min_utr = 0
         min_transcript_len = 1
         min_single_exon_len = 1
+        min_junction_support = 1
+        min_junction_ratio = 0
         args.max = True
     else:
         if args.min_utr <= 0:
@@ -879,5 +2230,58 @@ if __name__ == '__main__':
             min_single_exon_len = args.min_single_exon_len
             print >> sys.stderr, 'User defined min_single_exon_len = %d' % \
                                                         min_single_exon_len
-    if args.input:
+
+        if args.min_junction_support <= 0:
+            raise ValueError('Invalid junction support (<=0)')
+        elif args.min_junction_support != min_junction_support:
+            min_junction_support = args.min_junction_support
+            print >> sys.stderr, 'User defined min_junction_support = %d' % \
+                                                        min_junction_support
+
+        if not 0 <= args.min_junction_ratio <= 1:
+            raise ValueError('Invalid junction ratio (<0 or >1)')
+        elif args.min_junction_ratio != min_junction_ratio:
+            min_junction_ratio = args.min_junction_ratio
+            print >> sys.stderr, 'User defined min_junction_ratio = %g' % \
+                                                        min_junction_ratio
+
+    if args.processes <= 0:
+        raise ValueError('Invalid number of processes (<=0)')
+
+    if args.max_memory < 0:
+        raise ValueError('Invalid memory size (<0)')
+    elif args.max_memory != max_memory:
+        max_memory = args.max_memory
+        print >> sys.stderr, 'User defined max_memory = %d' % max_memory
+
+    if convert_mode:
+        mode = 'gimme.py convert'
+        options = [('--region', args.region), ('--stream', args.stream),
+                    ('--max_memory', max_memory)]
+    elif args.stream:
+        mode = '--stream'
+        options = [('-p', args.processes > 1), ('--max_memory', max_memory)]
+    else:
+        options = []
+    ignored = [name for name, value in options if value]
+    if ignored:
+        print >> sys.stderr, 'ERROR: %s cannot be used with %s.' % \
+                (' and '.join(ignored), mode)
+        raise SystemExit
+
+    if not 0 <= args.min_identity <= 100:
+        raise ValueError('Invalid identity (<0 or >100)')
+    elif args.min_identity != min_identity:
+        min_identity = args.min_identity
+        print >> sys.stderr, 'User defined min_identity = %g' % min_identity
+
+    if not 0 <= args.min_coverage <= 100:
+        raise ValueError('Invalid coverage (<0 or >100)')
+    elif args.min_coverage != min_coverage:
+        min_coverage = args.min_coverage
+        print >> sys.stderr, 'User defined min_coverage = %g' % min_coverage
+
+    if convert_mode:
+        convert(args.input, args.output, args.processes)
+    elif args.input:
         main(args.input)
@@ -7,6 +7,9 @@ import sys
 import csv
 from bx.intervals.intersection import Interval, Intersecter
 
+import bedio
+import fileio
+
 
 class ExonObj(object):
     def __init__(self, seqId, start, end, cStart, cEnd, size):
@@ -27,34 +30,25 @@ def parseBed(filename):
 
     '''
 
-    with open(filename) as fp:
-        for row in csv.reader(fp, dialect='excel-tab'):
+    with fileio.open_file(filename) as fp:
+        for bed in bedio.read(fp):
             exons = []
-            seqId = row[3]
-            chromStart = int(row[1])
-
-            blockSizes = [int(i) for i in row[-2].split(',')]
-            chromStarts = [int(i) + chromStart
-                                for i in row[-1].split(',')]
-            chromEnds = [int(blockSizes[i]) + chromStarts[i]\
-                                for i in range(len(blockSizes))]
-            size = sum(blockSizes)
-
-            i = 0
-            start = i
-            while i in range(len(blockSizes)):
-                end = start + blockSizes[i]
+            seqId = bed.name
+            size = sum(bed.blockSizes)
+
+            start = 0
+            for chromStart, chromEnd in bed.exons():
+                end = start + (chromEnd - chromStart)
                 exons.append(ExonObj(seqId,
                                         start,
                                         end,
-                                        chromStarts[i],
-                                        chromEnds[i],
+                                        chromStart,
+                                        chromEnd,
                                         size),
                                         )
-                i += 1
                 start = end
 
-            yield row, exons
+            yield bed.rows, exons
 
 
 def parseCDS(filename):
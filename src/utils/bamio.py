@@ -0,0 +1,166 @@
+'''The script reads spliced alignments from BAM/SAM files using pysam.
+read method returns exons of each mapped read in the order of a file.
+
+Exons are runs of M, = and X operations in a CIGAR string separated
+by N (skipped region, i.e. intron). A deletion (D) does not split an
+exon, and insertions, clipped bases and padding do not move along
+the reference.
+
+'''
+
+import re
+
+from regions import merge_regions
+
+try:
+    import pysam
+except ImportError:
+    pysam = None
+
+BAM_MAGIC = 'BAM\x01'  # the first bytes of a decompressed BAM file
+
+CIGAR = re.compile(r'^(\*|([0-9]+[MIDNSHP=X])+)$')
+
+# CIGAR operations
+MATCH_OPS = (0, 7, 8)  # M, =, X
+DELETION = 2  # D
+SKIP = 3  # N
+
+
+def is_sam(first_line):
+    '''Returns True if a line is a header or an alignment
+    from a SAM file.
+
+    '''
+    if first_line.startswith(('@HD', '@SQ', '@RG', '@PG', '@CO')):
+        return True
+    cols = first_line.split('\t')
+    return (len(cols) >= 11 and cols[1].isdigit() and cols[3].isdigit()
+                and cols[4].isdigit() and CIGAR.match(cols[5]) is not None)
+
+
+def get_exons(cigar, pos):
+    '''Returns a list of (start, end) of exons from CIGAR operations
+    of a read mapped at pos (0-based).
+
+    '''
+    exons = []
+    start = None
+    for op, length in cigar:
+        if op in MATCH_OPS:
+            if start is None:
+                start = pos
+            pos += length
+        elif op == DELETION:
+            pos += length
+        elif op == SKIP:
+            if start is not None:
+                exons.append((start, pos))
+                start = None
+            pos += length
+
+    if start is not None:
+        exons.append((start, pos))
+    return exons
+
+
+def open_file(filename):
+    '''Returns a pysam file object of a BAM or SAM file.'''
+
+    if pysam is None:
+        raise ImportError('pysam is required to read BAM/SAM files.')
+
+    with open(filename, 'rb') as fp:
+        magic = fp.read(2)
+    if magic == '\x1f\x8b':  # BAM is always bgzip compressed
+        return pysam.Samfile(filename, 'rb')
+    else:
+        return pysam.Samfile(filename, 'r')
+
+
+def get_references(filename):
+    '''Returns names of references in the header of a BAM or SAM
+    file, i.e. the order of chromosomes of a coordinate-sorted file.
+
+    '''
+    samfile = open_file(filename)
+    references = list(samfile.references)
+    samfile.close()
+    return references
+
+
+def read(filename, regions=None):
+    '''Returns a chromosome and a list of exons of each mapped read.
+
+    regions = a list of (chrom, start, end) tuples (see regions.py).
+    Only reads overlapping the regions are read using a BAM index,
+    or by reading the whole file if there is no index (i.e. SAM).
+    A read overlapping more than one region is returned once and
+    regions on contigs not in the header are skipped.
+    Otherwise, all reads are read in the order of the file.
+
+    Unmapped, secondary, duplicate and QC failed reads are skipped.
+
+    '''
+    samfile = open_file(filename)
+
+    if regions and samfile.has_index():
+        reads = fetch_regions(samfile, regions)
+    elif regions:
+        reads = scan_regions(samfile, regions)
+    else:
+        reads = samfile.fetch(until_eof=True)
+
+    for read in reads:
+        if (read.is_unmapped or read.is_secondary or
+                read.is_duplicate or read.is_qcfail):
+            continue
+
+        exons = get_exons(read.cigar, read.pos)
+        if exons:
+            yield samfile.getrname(read.tid), exons
+
+    samfile.close()
+
+
+def fetch_regions(samfile, regions):
+    '''Returns reads overlapping regions in coordinate order.'''
+
+    references = set(samfile.references)
+    regions = [region for region in merge_regions(regions)
+                if region[0] in references]
+    regions.sort(key=lambda region: (samfile.gettid(region[0]), region[1]))
+
+    last_chrom, last_end = None, 0
+    for chrom, start, end in regions:
+        for read in samfile.fetch(chrom, start, end):
+            if chrom == last_chrom and read.pos < last_end:
+                continue  # returned from the previous region
+            yield read
+        last_chrom, last_end = chrom, end
+
+
+def scan_regions(samfile, regions):
+    '''Returns reads overlapping regions in the order of a file
+    without an index.
+
+    '''
+    tid_regions = {}
+    for chrom, start, end in merge_regions(regions):
+        tid = samfile.gettid(chrom)
+        if tid >= 0:
+            tid_regions.setdefault(tid, []).append((start, end))
+
+    for read in samfile.fetch(until_eof=True):
+        if read.is_unmapped:
+            continue
+
+        try:
+            ranges = tid_regions[read.tid]
+        except KeyError:
+            continue
+
+        for start, end in ranges:
+            if read.pos < end and read.aend > start:
+                yield read
+                break
@@ -4,24 +4,19 @@ Output is written to standrad output.
 '''
 
 import sys
-import csv
+
+import bedio
+import fileio
 
 
 def parseBED(filename):
-    reader = csv.reader(open(filename), dialect='excel-tab')
-    for row in reader:
-        chrom = row[0]
-        chrom_start = int(row[1]) + 1
-        transcript_id = row[3]
-        strand = row[5]
-        exon_sizes = [int(s) for s in row[10].split(',')]
-        exon_starts = [int(s) for s in row[11].split(',')]
-        yield (chrom,
-                chrom_start,
-                transcript_id,
-                strand,
-                exon_sizes,
-                exon_starts)
+    for bed in bedio.read(fileio.open_file(filename)):
+        yield (bed.chrom,
+                bed.chromStart + 1,
+                bed.name,
+                bed.strand,
+                bed.blockSizes,
+                bed.blockStarts)
 
 
 def printGFF(transcript, source="custom"):
@@ -0,0 +1,134 @@
+'''The script reads transcripts in BED (BED12) format.
+read method returns each transcript stored in a BED object.
+
+Only a line is split when a transcript is read. Other columns,
+including block sizes and block starts, are decoded when they are
+first accessed.
+
+'''
+
+from collections import OrderedDict
+
+import numpy as np
+
+from pslparser import Column
+
+
+def _to_list(column):
+    return [int(i) for i in column.rstrip(',').split(',')]
+
+
+def _to_array(column):
+    return np.fromstring(column.rstrip(','), dtype=np.int64, sep=',')
+
+
+# (attribute, column, converter); None keeps a column as a string.
+FIELDS = (('chrom', 0, None),
+            ('chromStart', 1, int),
+            ('chromEnd', 2, int),
+            ('name', 3, None),
+            ('score', 4, None),
+            ('strand', 5, None),
+            ('thickStart', 6, int),
+            ('thickEnd', 7, int),
+            ('itemRgb', 8, None),
+            ('blockCount', 9, int),
+            ('blockSizes', 10, _to_list),
+            ('blockStarts', 11, _to_list))
+
+
+class BED(object):
+    '''A transcript with the columns split from a line of BED file.'''
+
+    __slots__ = ('rows',) + tuple('_' + name for name, _, _ in FIELDS)
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    @property
+    def gene_id(self):
+        '''Returns a gene name from a "gene.isoform" transcript name.'''
+        return self.name.split('.')[0]
+
+    def exons(self):
+        '''Returns (start, end) of each block in genome coordinates.'''
+        chrom_start = self.chromStart
+        return [(chrom_start + start, chrom_start + start + size)
+                    for start, size in zip(self.blockStarts, self.blockSizes)]
+
+
+class BEDArray(BED):
+    '''A BED object with block sizes and block starts in NumPy arrays.'''
+
+    __slots__ = ()
+
+    def exons(self):
+        '''Returns an array of (start, end) of each block
+        in genome coordinates.
+
+        '''
+        starts = self.blockStarts + self.chromStart
+        return np.column_stack((starts, starts + self.blockSizes))
+
+
+for _name, _column, _convert in FIELDS:
+    setattr(BED, _name, Column(getattr(BED, '_' + _name), _column, _convert))
+
+for _name, _column in (('blockSizes', 10), ('blockStarts', 11)):
+    setattr(BEDArray, _name,
+                Column(getattr(BED, '_' + _name), _column, _to_array))
+
+
+def read(fobj, comment=None, arrays=False):
+    '''Return an object of a transcript.
+
+    fobj = file object.
+
+    comment = read() will ignore the line starting
+    with comment character.
+
+    arrays = block sizes and block starts are returned
+    in NumPy arrays instead of lists.
+
+    '''
+    record = BEDArray if arrays else BED
+    for line in fobj:
+        if comment and line.startswith(comment):
+            continue
+
+        rows = line.rstrip('\r\n').split('\t')
+        if rows == ['']:
+            continue
+
+        yield record(rows)
+
+
+def read_genes(fobj, comment=None, arrays=False):
+    '''Return a gene ID and a list of its transcripts.
+
+    Transcripts of overlapping genes can be interleaved in a file
+    sorted by chromosome and position, i.e. gimme output, or
+    transcripts of each gene can be next to each other. A gene is
+    returned when a transcript of another gene starts after its end
+    on the same chromosome, so genes are returned in order of their
+    first transcripts.
+
+    '''
+    genes = OrderedDict()  # gene ID -> [chrom, end, transcripts]
+    for bed in read(fobj, comment, arrays):
+        try:
+            gene = genes[bed.gene_id]
+        except KeyError:
+            while genes:
+                gene_id, (chrom, end, transcripts) = next(genes.iteritems())
+                if chrom == bed.chrom and end >= bed.chromStart:
+                    break
+                del genes[gene_id]
+                yield gene_id, transcripts
+            gene = genes[bed.gene_id] = [bed.chrom, bed.chromEnd, []]
+
+        gene[1] = max(gene[1], bed.chromEnd)
+        gene[2].append(bed)
+
+    for gene_id, (chrom, end, transcripts) in genes.iteritems():
+        yield gene_id, transcripts
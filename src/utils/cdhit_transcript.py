@@ -7,16 +7,17 @@ it to standard output in BED format.
 import sys
 import csv
 
+import bedio
+import fileio
+
 
 def parseBED(bed_file, kept):
-    reader = csv.reader(open(bed_file), dialect='excel-tab')
     writer = csv.writer(sys.stdout, dialect='excel-tab')
 
     print >> sys.stderr, 'filtering sequences...'
-    for n, line in enumerate(reader, start=1):
-        tr_name = line[3]
-        if tr_name in kept:
-            writer.writerow(line)
+    for n, bed in enumerate(bedio.read(fileio.open_file(bed_file)), start=1):
+        if bed.name in kept:
+            writer.writerow(bed.rows)
 
         if n % 10000 == 0:
             print >> sys.stderr, '...', n
@@ -0,0 +1,195 @@
+'''The script writes and reads exon chains in a compact binary file
+that can be memory-mapped (see gimme.py convert).
+
+An exon chain is a chromosome followed by start and end positions
+of all exons of an alignment after gaps and large introns are removed.
+A file stores unique chains and a number of alignments with each
+chain, so alignments are not parsed again when gene models are built
+with different parameters.
+
+File layout (little-endian):
+
+    magic (8 bytes)
+    header size (uint64)
+    header (JSON, padded to 8 bytes)
+    arrays of each chromosome, each padded to 8 bytes:
+        starts, ends = int32 positions of all exons
+        offsets = int64, exons of chain i are
+                    starts[offsets[i]:offsets[i + 1]]
+        counts = int64, a number of alignments with each chain
+
+The header has a name, numbers of chains and exons and offsets of
+the arrays (from the end of the header) of each chromosome, and other
+information given to write (i.e. parameters used to build the chains).
+
+'''
+
+import json
+import mmap
+import struct
+
+import numpy as np
+
+MAGIC = 'GIMMECF\x01'
+POSITION_DTYPE = np.dtype('<i4')
+COUNT_DTYPE = np.dtype('<i8')
+
+
+def is_chain_file(filename):
+    '''Returns True if a file is a chain file.'''
+
+    if filename == '-':
+        return False
+    with open(filename, 'rb') as fp:
+        return fp.read(len(MAGIC)) == MAGIC
+
+
+def _padding(size):
+    return '\0' * (-size % 8)
+
+
+def write(filename, chains, counts, info=None):
+    '''Writes chains and counts to a chain file.
+
+    Chains of each chromosome are kept in the given order; chromosomes
+    are written in order they are first found.
+
+    info = a dictionary saved in the header.
+
+    '''
+    chrom_chains = {}
+    chroms = []
+    for chain, count in zip(chains, counts):
+        try:
+            chrom_chains[chain[0]].append((chain, count))
+        except KeyError:
+            chrom_chains[chain[0]] = [(chain, count)]
+            chroms.append(chain[0])
+
+    arrays = []
+    for chrom in chroms:
+        positions = [pos for chain, count in chrom_chains[chrom]
+                        for pos in chain[1:]]
+        if positions and max(positions) > np.iinfo(POSITION_DTYPE).max:
+            raise ValueError('Positions on %s are too large.' % chrom)
+
+        positions = np.array(positions, dtype=POSITION_DTYPE)
+        offsets = np.zeros(len(chrom_chains[chrom]) + 1, dtype=COUNT_DTYPE)
+        np.cumsum([(len(chain) - 1) // 2
+                    for chain, count in chrom_chains[chrom]],
+                    out=offsets[1:])
+        counts = np.array([count for chain, count in chrom_chains[chrom]],
+                            dtype=COUNT_DTYPE)
+        arrays.append((chrom, positions[0::2].copy(), positions[1::2].copy(),
+                        offsets, counts))
+
+    header = {'info': info or {}, 'chroms': []}
+    offset = 0
+    for chrom, starts, ends, offsets, counts in arrays:
+        chrom_header = {'name': chrom,
+                        'chains': len(counts),
+                        'exons': len(starts)}
+        for name, array in (('starts', starts), ('ends', ends),
+                            ('offsets', offsets), ('counts', counts)):
+            chrom_header[name] = offset
+            offset += array.nbytes + len(_padding(array.nbytes))
+        header['chroms'].append(chrom_header)
+    header = json.dumps(header, sort_keys=True)
+    header += ' ' * (-len(header) % 8)
+
+    with open(filename, 'wb') as fp:
+        fp.write(MAGIC)
+        fp.write(struct.pack('<Q', len(header)))
+        fp.write(header)
+        for chrom, starts, ends, offsets, counts in arrays:
+            for array in (starts, ends, offsets, counts):
+                fp.write(array.tostring())
+                fp.write(_padding(array.nbytes))
+
+
+class ChainFile(object):
+    '''A memory-mapped chain file.
+
+    Arrays of a chromosome are views of the file, so only pages
+    that are used are read from a disk.
+
+    '''
+
+    def __init__(self, filename):
+        self.fp = open(filename, 'rb')
+        self.data = mmap.mmap(self.fp.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.data[:len(MAGIC)] != MAGIC:
+            raise ValueError('%s is not a chain file.' % filename)
+
+        header_size = struct.unpack('<Q',
+                                    self.data[len(MAGIC):len(MAGIC) + 8])[0]
+        self.data_offset = len(MAGIC) + 8 + header_size
+        header = json.loads(self.data[len(MAGIC) + 8:self.data_offset])
+
+        self.info = header['info']
+        self.chroms = [str(chrom['name']) for chrom in header['chroms']]
+        self.chrom_headers = dict(zip(self.chroms, header['chroms']))
+
+    def arrays(self, chrom):
+        '''Returns starts, ends, offsets and counts of a chromosome.'''
+
+        header = self.chrom_headers[chrom]
+        offset = self.data_offset
+        return (np.frombuffer(self.data, POSITION_DTYPE, header['exons'],
+                                offset + header['starts']),
+                np.frombuffer(self.data, POSITION_DTYPE, header['exons'],
+                                offset + header['ends']),
+                np.frombuffer(self.data, COUNT_DTYPE, header['chains'] + 1,
+                                offset + header['offsets']),
+                np.frombuffer(self.data, COUNT_DTYPE, header['chains'],
+                                offset + header['counts']))
+
+    def exons(self, chrom, region_index=None):
+        '''Returns starts and ends of exons of each chain of
+        a chromosome and its count.
+
+        region_index = regions (see regions.RegionIndex); only chains
+        from the start of the first exon to the end of the last exon
+        overlapping a region are returned.
+
+        '''
+        if chrom not in self.chrom_headers:
+            return
+
+        starts, ends, offsets, counts = self.arrays(chrom)
+        if region_index is None:
+            selected = xrange(len(counts))
+        else:
+            selected = np.flatnonzero(region_index.overlaps(chrom,
+                                        starts[offsets[:-1]],
+                                        ends[offsets[1:] - 1])).tolist()
+
+        starts = starts.tolist()
+        ends = ends.tolist()
+        offsets = offsets.tolist()
+        counts = counts.tolist()
+        for i in selected:
+            yield (starts[offsets[i]:offsets[i + 1]],
+                    ends[offsets[i]:offsets[i + 1]],
+                    counts[i])
+
+    def chains(self, chrom=None, region_index=None):
+        '''Returns each chain and its count of all chromosomes
+        or a given chromosome (see exons).
+
+        '''
+        if chrom is None:
+            chroms = self.chroms
+        else:
+            chroms = [chrom]
+
+        for chrom in chroms:
+            for starts, ends, count in self.exons(chrom, region_index):
+                positions = [chrom] * (len(starts) * 2 + 1)
+                positions[1::2] = starts
+                positions[2::2] = ends
+                yield tuple(positions), count
+
+    def close(self):
+        self.data.close()
+        self.fp.close()
@@ -14,27 +14,16 @@ junctions.
 '''
 
 
-import csv
 import os.path
 import sys
-from collections import namedtuple
 
+import bedio
+import fileio
 import pslparser
 
 MIN_INTRON = 50
 MAX_INTRON = 300000
 
-Transcript = namedtuple('Transcript', [
-                                        'chrom',
-                                        'start',
-                                        'end',
-                                        'blockSizes',
-                                        'blockStarts',
-                                        'name',
-                                        'strand',
-                                    ])
-
-
 class Exon(object):
     def __init__(self, chrom, start, end, strand):
         self.chrom = chrom
@@ -86,7 +75,7 @@ def parse_psl(filename):
 
     '''
 
-    for pslobj in pslparser.read(open(filename)):
+    for pslobj in pslparser.read(fileio.open_file(filename)):
         exons = []
         for i in range(len(pslobj.tStarts)):
             start = pslobj.tStarts[i]
@@ -134,32 +123,16 @@ def add_intron(exons, intron_db, all=False):
 
 
 def parse_bed(bedFile):
-    with open(bedFile) as fp:
-        for row in csv.reader(fp, dialect='excel-tab'):
-            blockStarts = [int(i) for i in row[11].split(',')]
-            blockSizes = [int(i) for i in row[10].split(',')]
-            strand = row[5]
-            transcript = Transcript(row[0],
-                                        int(row[1]),
-                                        int(row[2]),
-                                        blockSizes,
-                                        blockStarts,
-                                        row[3],
-                                        strand,
-                                    )
+    with fileio.open_file(bedFile) as fp:
+        for transcript in bedio.read(fp):
             yield transcript
 
 
 def add_intron_bed(transcript, modelintron_db, all=False):
-    exons = []
-
-    for i in range(len(transcript.blockStarts)):
-        start = transcript.blockStarts[i] + transcript.start
-        end = transcript.blockSizes[i] + start
-        strand = transcript.strand
-        exon = Exon(transcript.chrom, start, end, strand)
-
-        exons.append(exon)
+    chrom = transcript.chrom
+    strand = transcript.strand
+    exons = [Exon(chrom, start, end, strand)
+                for start, end in transcript.exons()]
 
     add_intron(exons, modelintron_db, all)
 
@@ -195,11 +168,11 @@ def main(args):
         print >> sys.stderr, "Parsing alignment from %s ..." % \
                                                         (input_filename1)
         for n, exons in enumerate(parser(input_filename1), start=1):
-            if len(exons) > 1:
-                if parser == parse_psl:
+            if parser == parse_psl:
+                if len(exons) > 1:
                     add_intron(exons, db1, args.all)
-                else:
-                    add_intron_bed(exons, db1, args.all)
+            else:
+                add_intron_bed(exons, db1, args.all)
 
             if n % 1000 == 0:
                 print >> sys.stderr, '...', n
@@ -246,11 +219,11 @@ def main(args):
         for filename, parser, db in ((first), (second)):
             print >> sys.stderr, "Parsing alignment from %s ..." % (filename)
             for n, exons in enumerate(parser(filename), start=1):
-                if len(exons) > 1:
-                    if parser == parse_psl:
+                if parser == parse_psl:
+                    if len(exons) > 1:
                         add_intron(exons, db)
-                    else:
-                        add_intron_bed(exons, db)
+                else:
+                    add_intron_bed(exons, db)
 
                 if n % 1000 == 0:
                     print >> sys.stderr, '...', n
@@ -3,16 +3,18 @@ A gene name must be in "chromosome:gene.isoform" format.
 '''
 
 import sys
-import csv
+
+import bedio
+import fileio
 
 genes = set([])
 isoforms = set([])
 
-for rows in csv.reader(open(sys.argv[1]), dialect='excel-tab'):
+for bed in bedio.read(fileio.open_file(sys.argv[1])):
     try:
-        gene, isoform = rows[3].split('.')
+        gene, isoform = bed.name.split('.')
         genes.add(gene)
-        isoforms.add(rows[3])
+        isoforms.add(bed.name)
     except:
         pass
 
@@ -8,9 +8,12 @@ in this package.
 '''
 
 import sys
-import csv
+
 import pysam
 
+import bedio
+import fileio
+
 
 class Junction(object):
     def __init__(self, chrom, start, end):
@@ -24,16 +27,16 @@ class Junction(object):
         return '%s:%d-%d' % (self.chrom, self.start, self.end)
 
 
-def get_junction_position(row, junction):
+def get_junction_position(bed, junction):
     '''Returns a position of a junction on transcripts.
 
     '''
 
     junctions = []
-    chrom = row[0]
-    chrom_start = int(row[1])
-    block_starts = [int(s) for s in row[-1].split(',')]
-    block_sizes = [int(s) for s in row[-2].split(',')]
+    chrom = bed.chrom
+    chrom_start = bed.chromStart
+    block_starts = bed.blockStarts
+    block_sizes = bed.blockSizes
 
     for i in range(len(block_starts)):
         start = chrom_start + block_starts[i]
@@ -49,25 +52,25 @@ def get_junction_position(row, junction):
     try:
         position = sum(block_sizes[:junctions.index(str(junction)) + 1])
     except ValueError:
-        print >> sys.stderr, row[3], junction, 'not in list'
+        print >> sys.stderr, bed.name, junction, 'not in list'
         return None
     else:
         return position
 
 
-def get_junction(row):
+def get_junction(bed):
     '''Retreive all junctions from a given transcripts.
 
     Argument:
-        row : a list of all attributes of a transcript
+        bed : a transcript from bedio.read()
 
     '''
 
-    chrom = row[0]
-    transcript = row[3]
-    chrom_start = int(row[1])
-    block_starts = [int(b) for b in row[-1].split(',')]
-    block_sizes = [int(s) for s in row[-2].split(',')]
+    chrom = bed.chrom
+    transcript = bed.name
+    chrom_start = bed.chromStart
+    block_starts = bed.blockStarts
+    block_sizes = bed.blockSizes
 
     for i in range(len(block_starts) - 1):
         start = block_starts[i] + block_sizes[i] + chrom_start + 1
@@ -90,11 +93,9 @@ def main(bedfile, samfile):
 
     junction_db = {}
 
-    reader = csv.reader(open(bedfile), dialect='excel-tab')
-
-    for n, row in enumerate(reader, start=1):
-        for junction, transcript in get_junction(row):
-            junction.transcript_pos = get_junction_position(row, junction)
+    for n, bed in enumerate(bedio.read(fileio.open_file(bedfile)), start=1):
+        for junction, transcript in get_junction(bed):
+            junction.transcript_pos = get_junction_position(bed, junction)
             num_mapped_reads = samfile.count(transcript,
                                                 junction.transcript_pos,
                                                 junction.transcript_pos + 1
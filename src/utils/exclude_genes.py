@@ -7,12 +7,8 @@ The default is 50.
 import sys
 import csv
 
-
-def parse_BED(filename):
-    reader = csv.reader(open(filename), dialect='excel-tab')
-    for row in reader:
-        transcript_id = row[3].replace(':', '-')
-        yield transcript_id, row
+import bedio
+import fileio
 
 
 def main():
@@ -26,32 +22,13 @@ def main():
         print >> sys.stderr, 'Max isoform = %d' % max_isoform
 
     excluded = 0
-    current_id = None
     writer = csv.writer(sys.stdout, dialect='excel-tab')
-    transcripts = []
-    for transcript_id, row in parse_BED(infile):
-        new_id = transcript_id.split('.')[0]
-        if not current_id:  # first gene
-            current_id = new_id
-            transcripts.append(row)
+    for gene_id, transcripts in bedio.read_genes(fileio.open_file(infile)):
+        if len(transcripts) <= max_isoform:
+            for trn in transcripts:
+                writer.writerow(trn.rows)
         else:
-            if new_id != current_id:
-                if len(transcripts) <= max_isoform:
-                    for trn in transcripts:
-                        writer.writerow(trn)
-                else:
-                    excluded += 1
-
-                current_id = new_id
-                transcripts = []
-
-            transcripts.append(row)
-
-    if len(transcripts) <= max_isoform:
-        for trn in transcripts:
-            writer.writerow(trn)
-    else:
-        excluded += 1
+            excluded += 1
 
     print >> sys.stderr, 'Total %d genes excluded.' % excluded
 
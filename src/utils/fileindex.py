@@ -0,0 +1,270 @@
+'''The script reads alignments overlapping genomic regions from
+PSL/BED files sorted by chromosome and start position.
+
+A plain text file is indexed by a sidecar file (<input>.idx) holding
+byte offsets of lines. For each window of WINDOW_SIZE bp, the index
+stores an offset of the first line overlapping the window, so reading
+a region starts from the window of the region start and stops at the
+first line starting after the region end. The index is built when it
+is first needed and rebuilt when the input file changes.
+
+A bgzip compressed file is indexed by tabix (<input>.tbi) using pysam.
+Other inputs (gzip compressed files and standard input) cannot be
+indexed; they are read through to find alignments in regions.
+
+Regions are (chrom, start, end) tuples (see regions.py). Alignments
+overlapping more than one region are returned once.
+
+'''
+
+import os
+import sys
+
+import fileio
+from regions import merge_regions, RegionIndex
+
+try:
+    import pysam
+except ImportError:
+    pysam = None
+
+WINDOW_SIZE = 1 << 14  # bp
+INDEX_SUFFIX = '.idx'
+
+# 0-based columns of chromosome, start and end of each format
+COLUMNS = {'PSL': (13, 15, 16),
+            'BED': (0, 1, 2)}
+
+
+def get_coords(line, columns):
+    '''Returns chromosome, start and end of an alignment or None
+    if a line is not an alignment (i.e. a header).
+
+    '''
+    chrom_col, start_col, end_col = columns
+    rows = line.split()
+    try:
+        return rows[chrom_col], int(rows[start_col]), int(rows[end_col])
+    except (IndexError, ValueError):
+        return None
+
+
+def get_stamp(filename):
+    '''Returns a size and a modification time of a file.'''
+
+    stat = os.stat(filename)
+    return '#%d\t%d' % (stat.st_size, stat.st_mtime)
+
+
+def build_index(filename, columns):
+    '''Returns an index of a sorted PSL/BED file and writes it to
+    a sidecar file.
+
+    An index is a dictionary of chromosomes. Each chromosome has
+    a list of byte offsets of windows and an offset of the end of
+    the chromosome.
+
+    '''
+    index = {}
+    window_offsets = None
+    last_chrom, last_start = None, 0
+    offset = 0
+    with open(filename, 'rb') as fp:
+        for line in fp:
+            coords = get_coords(line, columns)
+            if coords is None:
+                offset += len(line)
+                continue
+
+            chrom, start, end = coords
+            if chrom != last_chrom:
+                if chrom in index:
+                    raise ValueError('%s is not sorted, %s is found '
+                                        'after other chromosomes.' %
+                                        (filename, chrom))
+                if last_chrom is not None:
+                    index[last_chrom][1] = offset
+                window_offsets = []
+                index[chrom] = [window_offsets, None]
+                last_chrom = chrom
+            elif start < last_start:
+                raise ValueError('%s is not sorted, %s:%d is found '
+                                    'after %s:%d.' % (filename, chrom, start,
+                                                        chrom, last_start))
+            last_start = start
+
+            # Windows before len(window_offsets) are overlapped by
+            # an earlier line, so only new windows are added.
+            first_window = start // WINDOW_SIZE
+            last_window = max(start, end - 1) // WINDOW_SIZE
+            if last_window >= len(window_offsets):
+                window_offsets.extend([None] *
+                            max(first_window - len(window_offsets), 0))
+                window_offsets.extend([offset] *
+                            (last_window + 1 - len(window_offsets)))
+
+            offset += len(line)
+
+    if last_chrom is not None:
+        index[last_chrom][1] = offset
+
+    for window_offsets, end_offset in index.itervalues():
+        next_offset = end_offset  # windows without alignments
+        for window in range(len(window_offsets) - 1, -1, -1):
+            if window_offsets[window] is None:
+                window_offsets[window] = next_offset
+            else:
+                next_offset = window_offsets[window]
+
+    try:
+        write_index(filename, index)
+    except IOError:
+        print >> sys.stderr, 'Cannot write %s%s, the index is not saved.' % \
+                                                    (filename, INDEX_SUFFIX)
+    return index
+
+
+def write_index(filename, index):
+    '''Writes an index to a sidecar file.'''
+
+    with open(filename + INDEX_SUFFIX, 'w') as fp:
+        print >> fp, get_stamp(filename)
+        for chrom, (window_offsets, end_offset) in sorted(index.items()):
+            offsets = ','.join([str(offset) for offset in window_offsets])
+            print >> fp, '%s\t%d\t%s' % (chrom, end_offset, offsets)
+
+
+def load_index(filename):
+    '''Returns an index from a sidecar file or None if the index does
+    not exist or is older than the file.
+
+    '''
+    try:
+        fp = open(filename + INDEX_SUFFIX)
+    except IOError:
+        return None
+
+    with fp:
+        if fp.readline().rstrip('\n') != get_stamp(filename):
+            return None
+
+        index = {}
+        for line in fp:
+            chrom, end_offset, window_offsets = line.rstrip('\n').split('\t')
+            window_offsets = [int(o) for o in window_offsets.split(',') if o]
+            index[chrom] = [window_offsets, int(end_offset)]
+    return index
+
+
+def get_index(filename, columns):
+    '''Returns an index of a file; the index is built if needed.'''
+
+    index = load_index(filename)
+    if index is None:
+        print >> sys.stderr, 'Indexing %s' % filename
+        index = build_index(filename, columns)
+    return index
+
+
+def fetch_indexed(filename, columns, regions, index):
+    '''Returns lines overlapping regions from a plain text file
+    using a sidecar index (see get_index).
+
+    '''
+    with open(filename, 'rb') as fp:
+        last_chrom, last_end = None, 0
+        for chrom, start, end in merge_regions(regions):
+            if chrom not in index:
+                continue
+
+            window_offsets, end_offset = index[chrom]
+            window = start // WINDOW_SIZE
+            if window < len(window_offsets):
+                fp.seek(window_offsets[window])
+                offset = window_offsets[window]
+                while offset < end_offset:
+                    line = fp.readline()
+                    offset += len(line)
+                    coords = get_coords(line, columns)
+                    if coords is None:
+                        continue
+
+                    line_chrom, line_start, line_end = coords
+                    if line_start >= end:
+                        break
+                    if line_end <= start:
+                        continue
+                    if chrom == last_chrom and line_start < last_end:
+                        continue  # returned from the previous region
+                    yield line
+
+            last_chrom, last_end = chrom, end
+
+
+def fetch_tabix(filename, columns, regions):
+    '''Returns lines overlapping regions from a bgzip compressed file
+    using a tabix index; the index is built if needed.
+
+    '''
+    if pysam is None:
+        raise ImportError('pysam is required to read regions ' +
+                            'from bgzip compressed files.')
+
+    chrom_col, start_col, end_col = columns
+    if not os.path.exists(filename + '.tbi'):
+        print >> sys.stderr, 'Indexing %s' % filename
+        pysam.tabix_index(filename, seq_col=chrom_col, start_col=start_col,
+                            end_col=end_col, zerobased=True)
+
+    tabixfile = pysam.TabixFile(filename)
+    contigs = set(tabixfile.contigs)
+
+    last_chrom, last_end = None, 0
+    for chrom, start, end in merge_regions(regions):
+        if chrom in contigs:
+            for line in tabixfile.fetch(chrom, start, end):
+                line_chrom, line_start, line_end = get_coords(line, columns)
+                if chrom == last_chrom and line_start < last_end:
+                    continue  # returned from the previous region
+                yield line + '\n'
+        last_chrom, last_end = chrom, end
+
+    tabixfile.close()
+
+
+def can_index(filename):
+    '''Returns True if a file can be indexed, i.e. a plain text or
+    a bgzip compressed file.
+
+    '''
+    return filename != '-' and (not fileio.is_compressed(filename) or
+                                    fileio.is_bgzip(filename))
+
+
+def fetch(filename, input_format, regions):
+    '''Returns lines overlapping regions from a sorted PSL/BED file
+    that can be indexed (see can_index).
+
+    A bgzip compressed file is read with tabix, a plain text file
+    with a sidecar index. Raises ValueError if a plain text file
+    is not sorted.
+
+    '''
+    columns = COLUMNS[input_format]
+    if fileio.is_compressed(filename):
+        return fetch_tabix(filename, columns, regions)
+    else:
+        index = get_index(filename, columns)
+        return fetch_indexed(filename, columns, regions, index)
+
+
+def fetch_scan(lines, columns, regions):
+    '''Returns lines overlapping regions from lines of a file
+    in any order, i.e. gzip compressed files or standard input.
+
+    '''
+    region_index = RegionIndex(regions)
+    for line in lines:
+        coords = get_coords(line, columns)
+        if coords is not None and region_index.overlaps(*coords):
+            yield line
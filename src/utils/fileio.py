@@ -0,0 +1,256 @@
+'''The script opens input files for parsers.
+
+open_file method returns a file object of a plain text file or
+a gzip/bgzip compressed file. A compressed file is decompressed
+on a background thread, which passes blocks of lines to a parser
+through a bounded queue, so decompression and parsing overlap.
+
+A file name "-" is standard input, which may be plain text or
+compressed. It is read on a background thread as well, so an
+upstream program can write to a pipe while lines are parsed.
+
+A plain text file can be split into line-aligned byte ranges
+(split_file), which are read independently (open_range), e.g.
+by different processes.
+
+'''
+
+import os
+import sys
+import itertools
+import Queue
+import threading
+import zlib
+
+GZIP_MAGIC = '\x1f\x8b'  # also the first bytes of bgzip files
+CHUNK_SIZE = 1 << 18  # bytes of compressed data read at a time
+QUEUE_SIZE = 8  # a maximum number of blocks waiting for a parser
+
+
+def read_blocks(fobj, chunk_size=CHUNK_SIZE):
+    '''Returns blocks of data from a file object.
+
+    Gzip or bgzip data is detected from the first block
+    and decompressed.
+
+    '''
+    data = fobj.read(chunk_size)
+    if data.startswith(GZIP_MAGIC):
+        blocks = decompress(fobj, chunk_size, data)
+    else:
+        blocks = iter(lambda: fobj.read(chunk_size), '')
+        if data:
+            blocks = itertools.chain([data], blocks)
+    return blocks
+
+
+def decompress(fobj, chunk_size=CHUNK_SIZE, data=''):
+    '''Returns blocks of decompressed data from a gzip file object.
+
+    data = compressed data already read from the file object.
+
+    A bgzip file is a series of gzip members; a new decompressor
+    is started at the beginning of each member.
+
+    '''
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    while True:
+        if not data:
+            data = fobj.read(chunk_size)
+        if not data:
+            break
+        while data:
+            block = decompressor.decompress(data)
+            if block:
+                yield block
+            data = decompressor.unused_data
+            if data:  # end of a member
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    block = decompressor.flush()
+    if block:
+        yield block
+
+
+def split_lines(blocks):
+    '''Returns lists of complete lines from blocks of text.'''
+
+    rest = ''
+    for block in blocks:
+        lines = (rest + block).splitlines(True)
+        if lines[-1].endswith('\n'):
+            rest = ''
+        else:
+            rest = lines.pop()
+        if lines:
+            yield lines
+    if rest:
+        yield [rest]
+
+
+class BackgroundReader(object):
+    '''Reads lines from a plain or compressed file object
+    on a background thread.
+
+    '''
+
+    def __init__(self, fobj, chunk_size=CHUNK_SIZE, queue_size=QUEUE_SIZE):
+        self.fobj = fobj
+        self.name = getattr(fobj, 'name', None)
+        self.chunk_size = chunk_size
+        self.queue = Queue.Queue(queue_size)
+        self.lines = iter([])
+        self.closed = False
+        self.done = False
+
+        self.thread = threading.Thread(target=self._fill)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _fill(self):
+        try:
+            for lines in split_lines(read_blocks(self.fobj, self.chunk_size)):
+                if self.closed:
+                    break
+                self.queue.put(lines)
+        except Exception as e:
+            self.queue.put(e)
+        self.queue.put(None)  # end of file
+
+    def _next_chunk(self):
+        if self.done:
+            return False
+
+        chunk = self.queue.get()
+        if chunk is None:
+            self.done = True
+            return False
+        elif isinstance(chunk, Exception):
+            self.done = True
+            raise chunk
+
+        self.lines = iter(chunk)
+        return True
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        while True:
+            try:
+                return next(self.lines)
+            except StopIteration:
+                if not self._next_chunk():
+                    raise
+
+    def readline(self):
+        try:
+            return self.next()
+        except StopIteration:
+            return ''
+
+    def close(self):
+        '''Stops the background thread and closes the file.'''
+
+        self.closed = True
+        while not self.done:  # unblock the thread waiting on a full queue
+            chunk = self.queue.get()
+            if chunk is None or isinstance(chunk, Exception):
+                self.done = True
+        self.thread.join()
+        self.fobj.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def is_compressed(filename):
+    '''Returns True if a file is gzip or bgzip compressed.'''
+
+    with open(filename, 'rb') as fp:
+        return fp.read(2) == GZIP_MAGIC
+
+
+def is_bgzip(filename):
+    '''Returns True if a file is bgzip compressed, i.e. the first
+    gzip member has a BC extra field.
+
+    '''
+    with open(filename, 'rb') as fp:
+        header = fp.read(18)
+    return (header.startswith(GZIP_MAGIC) and len(header) == 18 and
+                ord(header[3]) & 4 and header[12:14] == 'BC')
+
+
+def open_file(filename):
+    '''Returns a file object of a plain text or compressed file.
+
+    Compressed files are detected from their content,
+    not a file extension.
+
+    '''
+    if filename == '-':
+        return BackgroundReader(sys.stdin)
+    elif is_compressed(filename):
+        return BackgroundReader(open(filename, 'rb'))
+    else:
+        return open(filename)
+
+
+def split_file(filename, n):
+    '''Returns up to n byte ranges (start, end) of a plain text file
+    of about the same size. Each range starts at the beginning of
+    a line and ends after a newline or at the end of the file.
+
+    '''
+    size = os.path.getsize(filename)
+    offsets = [0]
+    with open(filename, 'rb') as fp:
+        for i in range(1, n):
+            pos = size * i // n
+            if pos <= offsets[-1]:
+                continue
+            fp.seek(pos - 1)
+            fp.readline()  # move to the beginning of the next line
+            pos = fp.tell()
+            if offsets[-1] < pos < size:
+                offsets.append(pos)
+    offsets.append(size)
+    return zip(offsets[:-1], offsets[1:])
+
+
+def open_range(filename, start, end):
+    '''Returns lines of a plain text file from byte offset start
+    to end (see split_file).
+
+    '''
+    with open(filename, 'rb') as fp:
+        fp.seek(start)
+        pos = start
+        for line in fp:
+            if pos >= end:
+                break
+            pos += len(line)
+            yield line
+
+
+def peek_line(fobj, comment=None):
+    '''Returns the first line of a file object and an iterator
+    over all lines, including the first one.
+
+    comment = lines starting with comment (e.g. '#') before the
+    first line are skipped. The first of them is returned if a file
+    has no other lines.
+
+    The first line is kept in memory instead of reopening a file,
+    so it works with standard input and pipes.
+
+    '''
+    header = ''
+    first_line = next(fobj, '')
+    while comment and first_line.startswith(comment):
+        header = header or first_line
+        first_line = next(fobj, '')
+    return first_line or header, itertools.chain([first_line], fobj)
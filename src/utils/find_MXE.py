@@ -5,11 +5,13 @@ exon usage analysis using MISO.
 '''
 
 import sys
-import csv
 
 import networkx as nx
 from bx.intervals import IntervalTree
 
+import bedio
+import fileio
+
 
 class Exon(object):
     def __init__(self, chrom, start, end, transcript_id, strand):
@@ -24,34 +26,13 @@ class Exon(object):
         return "%s:%d-%d" % (self.chrom, self.start, self.end)
 
 
-def parse_BED(filename):
-    reader = csv.reader(open(filename), dialect='excel-tab')
-    for row in reader:
-        chrom = row[0]
-        chrom_start = int(row[1]) + 1
-        transcript_id = row[3].replace(':', '-')
-        strand = row[5]
-        exon_sizes = [int(s) for s in row[10].split(',')]
-        exon_starts = [int(s) for s in row[11].split(',')]
-        if strand == '.':
-            continue
-        yield (chrom,
-                chrom_start,
-                transcript_id,
-                strand,
-                exon_sizes,
-                exon_starts)
-
-
 def get_exon_node(infile):
-    for features in parse_BED(infile):
-        (chrom, chrom_start, transcript_id,
-                strand, exon_sizes, exon_starts) = features
-        exons = []
-        for i in range(len(exon_sizes)):
-            start = chrom_start + exon_starts[i]
-            end = start + exon_sizes[i] - 1
-            exons.append(Exon(chrom, start, end, transcript_id, strand))
+    for bed in bedio.read(fileio.open_file(infile)):
+        if bed.strand == '.':
+            continue
+        transcript_id = bed.name.replace(':', '-')
+        exons = [Exon(bed.chrom, start + 1, end, transcript_id, bed.strand)
+                    for start, end in bed.exons()]
         yield exons, transcript_id
 
 
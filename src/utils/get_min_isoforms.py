@@ -11,6 +11,9 @@ import csv
 
 import networkx as nx
 
+import bedio
+import fileio
+
 
 class ExonObj(object):
     def __init__(self, chrom, start, end):
@@ -23,28 +26,22 @@ class ExonObj(object):
 
 
 def parseBed(filename):
-    '''Reads BED file and returns exons of a transcript.'''
-
-    with open(filename) as fp:
-        for row in csv.reader(fp, dialect='excel-tab'):
-            exons = []
-            chrom = row[0]
-            chromStart = int(row[1])
-            geneId = row[3].split('.')[0]
+    '''Reads BED file and returns exons of a transcript.
+    Transcripts of a gene are returned next to each other
+    (see bedio.read_genes).
 
-            '''Get all exons except terminal ones.'''
-            blockStarts = [int(i) for i in row[-1].split(',')]
-            blockSizes = [int(i) for i in row[-2].split(',')]
-
-            if len(blockStarts) == 1:
-                continue
+    '''
+    with fileio.open_file(filename) as fp:
+        for gene_id, transcripts in bedio.read_genes(fp):
+            for bed in transcripts:
+                if bed.blockCount == 1:
+                    continue
 
-            for i in range(len(blockStarts)):
-                start = chromStart + blockStarts[i]
-                end = start + blockSizes[i]
-                exons.append(ExonObj(chrom, start, end))
+                chrom = bed.chrom
+                exons = [ExonObj(chrom, start, end)
+                            for start, end in bed.exons()]
 
-            yield geneId, exons, row
+                yield gene_id, exons, bed.rows
 
 
 def create_bipartite_graph(G):
@@ -67,10 +64,12 @@ def create_bipartite_graph(G):
     for node in g.nodes():
         B.add_edge('S', node, capacity=1.0)  # add edge to [S]ource node
 
-        bottom_nodes[node] = node_id
+        # bottom nodes are tuples, so they never clash with
+        # nodes of G, which can be integers
+        bottom_nodes[node] = (node_id,)
         node_index.append(node)
 
-        B.add_edge(node_id, 'T', capacity=1.0)  # add edge to [T]arget node
+        B.add_edge((node_id,), 'T', capacity=1.0)  # add edge to [T]arget node
 
         node_id += 1
     # print bottom_nodes;
@@ -112,7 +111,7 @@ def rebuild_edges(edges, node_index):
             # print node, e
 
             if edges[node][e] > 0.0:
-                K.add_edge(node, node_index[e])
+                K.add_edge(node, node_index[e[0]])
 
     return K.edges()
 
@@ -165,8 +164,7 @@ def add_path(edges, paths, G):
             raise ValueError, "Error: edges are added."
         # for e in SG.edges():
         #     print e
-        path_str = '->'.join(path)
-        paths.add(path_str)
+        paths.add(tuple(path))
 
 
 def get_min_paths(G, verbose=True):
@@ -199,7 +197,7 @@ def get_min_paths(G, verbose=True):
 
     paths = list(paths)
     for i in range(len(paths)):
-        paths[i] = paths[i].split('->')
+        paths[i] = list(paths[i])
         paths[i].remove('Start')
         paths[i].remove('End')
 
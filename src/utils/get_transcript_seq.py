@@ -5,11 +5,13 @@ The script requires pygr package.
 '''
 
 import sys
-import csv
 
 from collections import namedtuple
 from pygr import seqdb, sequtil
 
+import bedio
+import fileio
+
 Exon = namedtuple('Exon', 'chrom, start, end')
 
 
@@ -42,20 +44,11 @@ def get_sequence_exon(genome, exons, strand='positive'):
 
 
 def write_seq(filename, genome, output, strand):
-    reader = csv.reader(open(filename), dialect='excel-tab')
-
-    for n, line in enumerate(reader, start=1):
-        chrom = line[0]
-        chrom_start = int(line[1])
-        gene_id = line[3]
-        exon_starts = [int(start) + \
-                chrom_start for start in line[-1].split(',')]
-        exon_sizes = [int(size) for size in line[-2].split(',')]
-        exon_ends = [exon_starts[i] + \
-                exon_sizes[i] for i in range(len(exon_starts))]
-        exons = [Exon(chrom, exon_starts[i], exon_ends[i]) for i in \
-                range(len(exon_starts))]
-        strand = 'negative' if line[5] == '-' else 'positive'
+    for n, bed in enumerate(bedio.read(fileio.open_file(filename)), start=1):
+        chrom = bed.chrom
+        gene_id = bed.name
+        exons = [Exon(chrom, start, end) for start, end in bed.exons()]
+        strand = 'negative' if bed.strand == '-' else 'positive'
 
         if output == 'transcript':
             seq = get_sequence_transcript(genome, exons, strand)
@@ -0,0 +1,113 @@
+'''The script reads transcripts from GTF/GFF3 files.
+
+Exon lines are grouped by transcript: transcript_id in GTF or Parent
+in GFF3 (an exon with more than one parent belongs to each of them).
+Exons of a transcript do not need to be next to each other or sorted,
+so lines can be in any order. Exons are kept until the end of a file,
+and transcripts are returned by chromosome in order of their first
+exons in the file.
+
+read method returns a chromosome and sorted exons of each transcript
+like bamio.read.
+
+'''
+
+import urllib
+
+STRANDS = ('+', '-', '.', '?')
+
+
+def is_gff(first_line):
+    '''Returns True if a line is a header or a feature line
+    of a GTF/GFF file.
+
+    '''
+    if first_line.startswith(('##gff-version', '#!')):
+        return True
+    cols = first_line.rstrip('\r\n').split('\t')
+    return (len(cols) == 9 and cols[3].isdigit() and cols[4].isdigit()
+                and cols[6] in STRANDS)
+
+
+def get_transcript_ids(attributes):
+    '''Returns transcript IDs from attributes of an exon, i.e.
+    transcript_id "ID"; in GTF or Parent=ID1,ID2 in GFF3.
+
+    '''
+    for field in attributes.split(';'):
+        field = field.strip()
+        if field.startswith('Parent='):
+            return [urllib.unquote(parent)
+                        for parent in field[len('Parent='):].split(',')]
+
+        key_value = field.split(None, 1)
+        if len(key_value) == 2 and key_value[0] == 'transcript_id':
+            return [key_value[1].strip('"')]
+    return []
+
+
+def group_transcripts(lines):
+    '''Returns a chromosome, a transcript ID and a list of exons
+    (0-based start, end) of each transcript.
+
+    Exons are grouped by transcript ID of each chromosome across
+    all lines. Chromosomes are returned in order of their first exons
+    and transcripts of a chromosome in order of their start positions.
+
+    '''
+    chroms = []
+    chrom_transcripts = {}  # chrom -> {transcript ID: exons}
+
+    for line in lines:
+        if line.startswith('##FASTA'):
+            break
+        if line.startswith('#') or not line.strip():
+            continue
+
+        cols = line.rstrip('\r\n').split('\t')
+        if len(cols) != 9 or cols[2] != 'exon':
+            continue
+
+        try:
+            transcripts = chrom_transcripts[cols[0]]
+        except KeyError:
+            transcripts = chrom_transcripts[cols[0]] = {}
+            chroms.append(cols[0])
+
+        exon = (int(cols[3]) - 1, int(cols[4]))
+        for transcript_id in get_transcript_ids(cols[8]):
+            try:
+                transcripts[transcript_id].append(exon)
+            except KeyError:
+                transcripts[transcript_id] = [exon]
+
+    for chrom in chroms:
+        for transcript in _sort_transcripts(chrom,
+                                            chrom_transcripts.pop(chrom)):
+            yield transcript
+
+
+def _sort_transcripts(chrom, transcripts):
+    sorted_transcripts = [(chrom, transcript_id, sorted(set(exons)))
+                            for transcript_id, exons in transcripts.items()]
+    sorted_transcripts.sort(key=lambda t: (t[2][0][0], t[2][-1][1], t[1]))
+    return sorted_transcripts
+
+
+def read(lines, regions=None):
+    '''Returns a chromosome and a list of exons of each transcript
+    from lines of a GTF/GFF3 file.
+
+    regions = a list of (chrom, start, end) tuples (see regions.py).
+    Only transcripts overlapping the regions are returned.
+
+    '''
+    chrom_regions = {}
+    for chrom, start, end in regions or []:
+        chrom_regions.setdefault(chrom, []).append((start, end))
+
+    for chrom, transcript_id, exons in group_transcripts(lines):
+        if regions and not any(start < exons[-1][1] and end > exons[0][0]
+                            for start, end in chrom_regions.get(chrom, [])):
+            continue
+        yield chrom, exons
@@ -2,11 +2,12 @@
 
 import sys
 import csv
+import fileio
 import pslparser
 
 
 def parsePSL(filename):
-    for pslObj in pslparser.read(open(filename)):
+    for pslObj in pslparser.read(fileio.open_file(filename)):
         strand = pslObj.strand
         chrom = pslObj.tName
         name = pslObj.qName
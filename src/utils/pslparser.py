@@ -5,14 +5,76 @@ read method returns each alignment stored in an PSL object.
 '''
 
 import sys
+from collections import namedtuple
+
+import numpy as np
+
+
+def _to_list(column):
+    return [int(i) for i in column.split(',')[:-1]]
+
+
+# (attribute, column, converter); None keeps a column as a string.
+FIELDS = (('matches', 0, None),
+            ('misMatches', 1, None),
+            ('repMatches', 2, None),
+            ('nCount', 3, int),
+            ('qNumInsert', 4, None),
+            ('qBaseInsert', 5, None),
+            ('tNumInsert', 6, None),
+            ('tBaseInsert', 7, None),
+            ('strand', 8, None),
+            ('qName', 9, None),
+            ('qSize', 10, int),
+            ('qStart', 11, int),
+            ('qEnd', 12, int),
+            ('tName', 13, None),
+            ('tSize', 14, int),
+            ('tStart', 15, int),
+            ('tEnd', 16, int),
+            ('blockCount', 17, int),
+            ('blockSizes', 18, _to_list),
+            ('qStarts', 19, _to_list),
+            ('tStarts', 20, _to_list))
+
+
+class Column(object):
+    '''Decodes a column of a PSL record when it is first accessed and
+    keeps the value in the slot of the record.
+
+    '''
+    def __init__(self, slot, column, convert):
+        self.slot = slot
+        self.column = column
+        self.convert = convert
+
+    def __get__(self, pobj, cls):
+        if pobj is None:
+            return self
+        try:
+            return self.slot.__get__(pobj, cls)
+        except AttributeError:
+            value = pobj.rows[self.column]
+            if self.convert:
+                value = self.convert(value)
+            self.slot.__set__(pobj, value)
+            return value
+
+    def __set__(self, pobj, value):
+        self.slot.__set__(pobj, value)
 
 
 class PSL(object):
-    def __init__(self, **kwargs):
-        self.attrib = kwargs
+    '''An alignment with the columns split from a line of PSL file.'''
+
+    __slots__ = ('rows',) + tuple('_' + name for name, _, _ in FIELDS)
+
+    def __init__(self, rows):
+        self.rows = rows
+
 
-    def __getattr__(self, key):
-        return self.attrib[key]
+for _name, _column, _convert in FIELDS:
+    setattr(PSL, _name, Column(getattr(PSL, '_' + _name), _column, _convert))
 
 
 def read(fobj, comment=None):
@@ -29,7 +91,6 @@ def read(fobj, comment=None):
         if comment and line.startswith(comment):
                 continue
 
-        attrib = {}
         rows = line.split()
 
         try:
@@ -39,30 +100,8 @@ def read(fobj, comment=None):
             n += 1
             continue
 
-        attrib['matches'] = rows[0]
-        attrib['misMatches'] = rows[1]
-        attrib['repMatches'] = rows[2]
-        attrib['nCount'] = int(rows[3])
-        attrib['qNumInsert'] = rows[4]
-        attrib['qBaseInsert'] = rows[5]
-        attrib['tNumInsert'] = rows[6]
-        attrib['tBaseInsert'] = rows[7]
-        attrib['strand'] = rows[8]
-        attrib['qName'] = rows[9]
-        attrib['qSize'] = int(rows[10])
-        attrib['qStart'] = int(rows[11])
-        attrib['qEnd'] = int(rows[12])
-        attrib['tName'] = rows[13]
-        attrib['tSize'] = int(rows[14])
-        attrib['tStart'] = int(rows[15])
-        attrib['tEnd'] = int(rows[16])
-        attrib['blockCount'] = int(rows[17])
-        attrib['blockSizes'] = [int(i) for i in rows[18].split(',')[:-1]]
-        attrib['qStarts'] = [int(i) for i in rows[19].split(',')[:-1]]
-        attrib['tStarts'] = [int(i) for i in rows[20].split(',')[:-1]]
-
-        pobj = PSL(**attrib)  # pobj = PSL object
-        if attrib['blockCount'] == 0:
+        pobj = PSL(rows)  # pobj = PSL object
+        if pobj.blockCount == 0:
             print >> sys.stderr, '>%d' % n, line
             n += 1
             continue
@@ -70,5 +109,127 @@ def read(fobj, comment=None):
             n += 1
             yield pobj
 
+
+Batch = namedtuple('Batch', ['chroms',
+                                'chrom_ids',
+                                'offsets',
+                                'starts',
+                                'sizes',
+                                'matches',
+                                'mismatches',
+                                'rep_matches',
+                                'q_sizes',
+                                'q_starts',
+                                'q_ends'])
+
+
+# matches, misMatches, repMatches, qSize, qStart and qEnd columns
+STATS_COLUMNS = (0, 1, 2, 10, 11, 12)
+
+
+def _to_array(columns, total):
+    '''Convert comma-terminated PSL list columns to an integer array.'''
+
+    if not total:
+        return np.zeros(0, dtype=np.int64)
+    return np.fromstring(''.join(columns)[:-1], dtype=np.int64, sep=',')
+
+
+def _to_int_array(column):
+    '''Convert a list of integer strings to an integer array.'''
+
+    return np.fromstring(' '.join(column), dtype=np.int64, sep=' ')
+
+
+def _make_batch(chroms, chrom_ids, counts, starts, sizes, total, stats):
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+
+    return Batch(chroms,
+                np.array(chrom_ids, dtype=np.int32),
+                offsets,
+                _to_array(starts, total),
+                _to_array(sizes, total),
+                *[_to_int_array(column) for column in stats])
+
+
+def read_batches(fobj, size=10000, comment=None):
+    '''Return alignments in blocks of columns (NumPy arrays).
+
+    fobj = file object.
+
+    size = a maximum number of alignments in each block.
+
+    comment = read_batches() will ignore the line starting
+    with comment character.
+
+    Each block is a Batch with the following attributes.
+
+    chroms = a list of target names shared by all blocks from
+    the same file; chrom_ids index this list.
+
+    chrom_ids = a target (tName) id of each alignment.
+
+    offsets = blocks of alignment i are starts[offsets[i]:offsets[i + 1]].
+
+    starts, sizes = target starts and sizes of all blocks.
+
+    matches, mismatches, rep_matches, q_sizes, q_starts, q_ends =
+    matches, misMatches, repMatches, qSize, qStart and qEnd
+    of each alignment.
+
+    '''
+    chroms = []
+    chrom_index = {}
+    chrom_ids = []
+    counts = []
+    starts = []
+    sizes = []
+    stats = [[] for column in STATS_COLUMNS]
+    total = 0
+    n = 0
+    for line in fobj:
+        if comment and line.startswith(comment):
+            continue
+
+        rows = line.split()
+
+        if len(rows) != 21 or int(rows[17]) == 0:
+            print >> sys.stderr, '>%d' % n, line
+            n += 1
+            continue
+        n += 1
+
+        chrom = rows[13]
+        try:
+            chrom_id = chrom_index[chrom]
+        except KeyError:
+            chrom_id = chrom_index[chrom] = len(chroms)
+            chroms.append(chrom)
+
+        count = rows[20].count(',')
+        chrom_ids.append(chrom_id)
+        counts.append(count)
+        sizes.append(rows[18])
+        starts.append(rows[20])
+        for values, column in zip(stats, STATS_COLUMNS):
+            values.append(rows[column])
+        total += count
+
+        if len(counts) == size:
+            yield _make_batch(chroms, chrom_ids, counts,
+                                starts, sizes, total, stats)
+            chrom_ids = []
+            counts = []
+            starts = []
+            sizes = []
+            stats = [[] for column in STATS_COLUMNS]
+            total = 0
+
+    if counts:
+        yield _make_batch(chroms, chrom_ids, counts,
+                            starts, sizes, total, stats)
+
+
 if __name__ == '__main__':
     pass
@@ -0,0 +1,79 @@
+'''The script parses genomic regions in chr:start-end format
+(1-based, inclusive, like samtools), e.g. chr1:1000-2000 or chr1.
+
+Regions are stored as (chrom, start, end) tuples with 0-based start
+and excluded end, the same coordinates as BED and PSL.
+
+'''
+
+MAX_POSITION = 2 ** 31 - 1  # the end of a region without an end position
+
+
+def parse_region(text):
+    '''Returns (chrom, start, end) from chr, chr:start or chr:start-end.
+
+    Commas in positions are ignored.
+
+    '''
+    chrom, sep, coord = text.rpartition(':')
+    if not sep:
+        return text, 0, MAX_POSITION
+
+    try:
+        coord = coord.replace(',', '')
+        if '-' in coord:
+            start, end = coord.split('-')
+            start, end = int(start) - 1, int(end)
+        else:
+            start, end = int(coord) - 1, MAX_POSITION
+    except ValueError:
+        raise ValueError('Invalid region: %s' % text)
+
+    if not chrom or start < 0 or end <= start:
+        raise ValueError('Invalid region: %s' % text)
+    return chrom, start, end
+
+
+def merge_regions(regions):
+    '''Returns sorted regions with overlapped regions merged
+    from a list of (chrom, start, end) tuples.
+
+    '''
+    merged = []
+    for chrom, start, end in sorted(regions):
+        if merged and merged[-1][0] == chrom and start <= merged[-1][2]:
+            if end > merged[-1][2]:
+                merged[-1] = (chrom, merged[-1][1], end)
+        else:
+            merged.append((chrom, start, end))
+    return merged
+
+
+class RegionIndex(object):
+    '''Merged regions of each chromosome.
+
+    A range overlaps a region if it starts before the region ends and
+    ends after the region starts. The same test selects alignment lines
+    (see fileindex.fetch_scan), groups of exons (see gimme.select_groups)
+    and chains of chain files (see chainfile.ChainFile.exons).
+
+    '''
+    def __init__(self, regions):
+        self.chroms = {}
+        for chrom, start, end in merge_regions(regions):
+            self.chroms.setdefault(chrom, []).append((start, end))
+
+    def __contains__(self, chrom):
+        return chrom in self.chroms
+
+    def overlaps(self, chrom, starts, ends):
+        '''Returns True if a range overlaps a region of a chromosome.
+
+        starts and ends may be numpy arrays of ranges, then a boolean
+        array is returned (or False if no region is on the chromosome).
+
+        '''
+        result = False
+        for start, end in self.chroms.get(chrom, ()):
+            result = result | ((starts < end) & (ends > start))
+        return result
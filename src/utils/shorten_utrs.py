@@ -3,6 +3,9 @@
 import sys
 import csv
 
+import bedio
+import fileio
+
 LEFT_UTR_LEN = 50
 RIGHT_UTR_LEN = 50
 
@@ -23,27 +26,15 @@ def parse_bed(bed_file):
 
     '''
 
-    reader = csv.reader(open(bed_file), dialect='excel-tab')
-    for row in reader:
-        exons = []
-        chrom = row[0]
-        chrom_start = int(row[1])
-        trans_id = row[3]
-        cds_start = int(row[6])
-        cds_end = int(row[7])
-        strand = row[5]
-
-        exon_sizes = [int(s) for s in row[10].split(',')]
-        exon_starts = [chrom_start + int(s) for s in row[11].split(',')]
-
-        for i in range(len(exon_starts)):
-            exon_start = exon_starts[i]
-            exon_end = exon_start + exon_sizes[i]
+    for bed in bedio.read(fileio.open_file(bed_file)):
+        chrom = bed.chrom
+        trans_id = bed.name
+        strand = bed.strand
 
-            exon = ExonObj(chrom, exon_start, exon_end, trans_id, strand)
-            exons.append(exon)
+        exons = [ExonObj(chrom, start, end, trans_id, strand)
+                    for start, end in bed.exons()]
 
-        yield exons, cds_start, cds_end
+        yield exons, bed.thickStart, bed.thickEnd
 
 
 def shorten_UTRs(exons, cds_start, cds_end):
@@ -0,0 +1,223 @@
+'''A light-weight directed graph of exons used to build gene models.
+
+Edges are kept in successor and predecessor sets of each node while
+a graph is built and edited (i.e. by collapse_exon). Queries on the
+whole graph use a compressed sparse row (CSR) form: nodes are sorted
+and numbered 0..n-1, successors of node i are
+indices[indptr[i]:indptr[i + 1]], and a topological order is
+computed once. The CSR form is cached until the graph is changed.
+
+A splice graph has no Start and End nodes; paths start at nodes
+without predecessors (sources) and end at nodes without successors
+(sinks). to_digraph adds them for networkx algorithms
+(see get_min_isoforms.py).
+
+'''
+
+import array
+
+import networkx as nx
+
+
+class SpliceGraph(object):
+    '''A directed acyclic graph of exon ids on a strand.'''
+
+    def __init__(self, edges=None, strand=None):
+        self.succ = {}
+        self.pred = {}
+        self.strand = strand
+        self._csr = None
+        if edges:
+            self.add_edges_from(edges)
+
+    def __len__(self):
+        return len(self.succ)
+
+    def add_node(self, node):
+        if node not in self.succ:
+            self.succ[node] = set()
+            self.pred[node] = set()
+            self._csr = None
+
+    def add_edge(self, u, v):
+        self.add_node(u)
+        self.add_node(v)
+        if v not in self.succ[u]:
+            self.succ[u].add(v)
+            self.pred[v].add(u)
+            self._csr = None
+
+    def add_edges_from(self, edges):
+        for u, v in edges:
+            self.add_edge(u, v)
+
+    def add_path(self, nodes):
+        self.add_edges_from(zip(nodes[:-1], nodes[1:]))
+
+    def remove_node(self, node):
+        for v in self.succ.pop(node):
+            self.pred[v].discard(node)
+        for u in self.pred.pop(node):
+            self.succ[u].discard(node)
+        self._csr = None
+
+    def remove_nodes_from(self, nodes):
+        for node in nodes:
+            if node in self.succ:
+                self.remove_node(node)
+
+    def remove_edges_from(self, edges):
+        for u, v in edges:
+            if u in self.succ and v in self.succ[u]:
+                self.succ[u].remove(v)
+                self.pred[v].remove(u)
+                self._csr = None
+
+    def has_node(self, node):
+        return node in self.succ
+
+    def has_edge(self, u, v):
+        return u in self.succ and v in self.succ[u]
+
+    def successors(self, node):
+        return list(self.succ[node])
+
+    neighbors = successors
+
+    def predecessors(self, node):
+        return list(self.pred[node])
+
+    def in_degree(self, node):
+        return len(self.pred[node])
+
+    def out_degree(self, node):
+        return len(self.succ[node])
+
+    def degree(self, node):
+        return len(self.pred[node]) + len(self.succ[node])
+
+    def nodes(self):
+        return self.csr()[0][:]
+
+    def edges(self):
+        '''Returns edges in order of nodes (see csr).'''
+
+        nodes, indptr, indices = self.csr()
+        return [(nodes[i], nodes[indices[k]])
+                    for i in range(len(nodes))
+                    for k in range(indptr[i], indptr[i + 1])]
+
+    def csr(self):
+        '''Returns sorted nodes and CSR arrays (indptr, indices)
+        of successors of each node.
+
+        '''
+        if self._csr is None:
+            nodes = sorted(self.succ)
+            index = dict((node, i) for i, node in enumerate(nodes))
+            indptr = array.array('l', [0])
+            indices = array.array('l')
+            for node in nodes:
+                indices.extend(sorted(index[v] for v in self.succ[node]))
+                indptr.append(len(indices))
+            self._csr = (nodes, indptr, indices,
+                            self._sort(nodes, indptr, indices))
+        return self._csr[:3]
+
+    @staticmethod
+    def _sort(nodes, indptr, indices):
+        in_degrees = array.array('l', [0] * len(nodes))
+        for j in indices:
+            in_degrees[j] += 1
+
+        order = [i for i in range(len(nodes)) if not in_degrees[i]]
+        for i in order:  # order grows while it is iterated
+            for k in range(indptr[i], indptr[i + 1]):
+                j = indices[k]
+                in_degrees[j] -= 1
+                if not in_degrees[j]:
+                    order.append(j)
+
+        if len(order) != len(nodes):
+            raise ValueError('A splice graph has a cycle.')
+        return order
+
+    def topological_order(self):
+        '''Returns node indices (see csr) in topological order.'''
+
+        self.csr()
+        return self._csr[3]
+
+    def sources(self):
+        return [node for node in self.csr()[0] if not self.pred[node]]
+
+    def sinks(self):
+        return [node for node in self.csr()[0] if not self.succ[node]]
+
+    def count_paths(self):
+        '''Returns a number of paths from sources to sinks.'''
+
+        nodes, indptr, indices = self.csr()
+        counts = [0] * len(nodes)
+        for i in reversed(self.topological_order()):
+            if indptr[i] == indptr[i + 1]:
+                counts[i] = 1  # a sink
+            else:
+                counts[i] = sum([counts[indices[k]]
+                                    for k in range(indptr[i], indptr[i + 1])])
+        return sum([counts[i] for i in range(len(nodes))
+                        if not self.pred[nodes[i]]])
+
+    def paths(self):
+        '''Returns all paths from sources to sinks as lists of nodes.
+
+        Paths are found by depth-first search from each source,
+        following successors in order of nodes.
+
+        '''
+        nodes, indptr, indices = self.csr()
+        paths = []
+        for source in range(len(nodes)):
+            if self.pred[nodes[source]]:
+                continue
+
+            path = [source]
+            stack = [indptr[source]]  # the next successor of each node
+            while stack:
+                i = path[-1]
+                k = stack[-1]
+                if indptr[i] == indptr[i + 1]:  # a sink
+                    paths.append([nodes[j] for j in path])
+                if k < indptr[i + 1]:
+                    stack[-1] += 1
+                    path.append(indices[k])
+                    stack.append(indptr[indices[k]])
+                else:
+                    path.pop()
+                    stack.pop()
+        return paths
+
+    def to_digraph(self, key=None, start='Start', end='End'):
+        '''Returns a networkx DiGraph with edges from start to sources
+        and from sinks to end, and a list of nodes of this graph.
+
+        Nodes of the DiGraph are numbered 0..n-1 in order of key
+        (i.e. positions of exons) and edges are added in that order,
+        since results of some networkx algorithms depend on order of
+        nodes and edges (see get_min_isoforms.py). Node i of the
+        DiGraph is nodes[i].
+
+        '''
+        nodes = sorted(self.succ, key=key)
+        index = dict((node, i) for i, node in enumerate(nodes))
+
+        g = nx.DiGraph()
+        g.add_nodes_from(range(len(nodes)))
+        g.add_edges_from(sorted((index[u], index[v])
+                                    for u, v in self.edges()))
+        for i, node in enumerate(nodes):
+            if not self.pred[node]:
+                g.add_edge(start, i)
+            if not self.succ[node]:
+                g.add_edge(i, end)
+        return g, nodes
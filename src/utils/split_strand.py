@@ -1,18 +1,22 @@
 import string
 
-import networkx as nx
+from splice_graph import SpliceGraph
 
 table = string.maketrans('ACGT', 'TGCA')
 
 
-def get_splice_sites(genome, exon1, exon2):
-    chrom, pos = exon1.split(':')
-    start, end = [int(p) for p in pos.split('-')]
-    donor = genome[chrom][end:end + 2]
+def get_splice_sites(genome, exon_db, exon1, exon2):
+    '''Returns a donor and an acceptor site of an intron
+    between exons with ids exon1 and exon2.
 
-    chrom, pos = exon2.split(':')
-    start, end = [int(p) for p in pos.split('-')]
-    acceptor = genome[chrom][start - 2:start]
+    genome = sequences indexed by chromosome ids of exons
+    (see gimme.GenomeDB)
+    exon_db = an exon table (see gimme.ExonTable)
+
+    '''
+    chrom = genome[exon_db.chroms[exon1]]
+    donor = chrom[exon_db.ends[exon1]:exon_db.ends[exon1] + 2]
+    acceptor = chrom[exon_db.starts[exon2] - 2:exon_db.starts[exon2]]
 
     return str(donor), str(acceptor)
 
@@ -30,12 +34,19 @@ def identify_strand(splice_sites):
         return 0
 
 
-def compare_edges(edge):
-    return int(edge[0].split(':')[1].split('-')[0])
+def split(graph, genome, exon_db):
+    '''Returns splice graphs (see splice_graph.py) of edges
+    of a graph on each strand.
 
+    genome = sequences indexed by chromosome ids (see gimme.GenomeDB)
+    exon_db = an exon table with nodes of the graph (see gimme.ExonTable)
 
-def split(graph, genome):
-    '''genome = pygr sequence DB object'''
+    Edges are sorted by start and end of the first exon and then of
+    the second exon, and a strand of each edge is scored with its
+    neighbors in that order. Edges from the same exon are ordered by
+    their second exons, not by the order of the graph.
+
+    '''
 
     class Edgeobj(object):
         def __init__(self, edge, ss, strand):
@@ -46,13 +57,18 @@ def split(graph, genome):
     # print 'total nodes %d' % graph.number_of_nodes()
     edges = {}
 
-    pos_graph = nx.DiGraph(strand='+')  # a graph for positive strand
-    neg_graph = nx.DiGraph(strand='-')  # a graph for negative strand
+    pos_graph = SpliceGraph(strand='+')  # a graph for positive strand
+    neg_graph = SpliceGraph(strand='-')  # a graph for negative strand
+
+    def compare_edges(edge):
+        exon1, exon2 = edge
+        return (exon_db.starts[exon1], exon_db.ends[exon1],
+                exon_db.starts[exon2], exon_db.ends[exon2])
 
     strand_scores = []
     sorted_edges = sorted(graph.edges(), key=compare_edges)
     for edge in sorted_edges:
-        splice_sites = get_splice_sites(genome, *edge)
+        splice_sites = get_splice_sites(genome, exon_db, *edge)
         strand = identify_strand(splice_sites)
         edges[edge] = Edgeobj(edge, splice_sites, strand)
         strand_scores.append(strand)
@@ -73,8 +89,7 @@ def split(graph, genome):
     return a graph with strand=".".
     '''
     if sum(score_matrix) == 0:
-        neutral_graph = nx.DiGraph(strand='.')
-        neutral_graph.add_edges_from(sorted_edges)
+        neutral_graph = SpliceGraph(sorted_edges, strand='.')
         return (neutral_graph,)
 
     for i in range(len(sorted_edges)):
@@ -4,16 +4,17 @@ and plot a histogram of transcript lengths
 '''
 
 import sys
-import csv
 import matplotlib.pyplot as plot
 
+import bedio
+import fileio
+
 
 def get_len_dist(filename):
     print >> sys.stderr, "Reading from %s" % filename
     lengths = []
-    reader = csv.reader(open(filename), dialect="excel-tab")
-    for line in reader:
-        lengths.append(sum([int(size) for size in line[10].split(",")]))
+    for bed in bedio.read(fileio.open_file(filename), arrays=True):
+        lengths.append(bed.blockSizes.sum())
 
     return lengths
 
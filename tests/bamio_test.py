@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import pysam
+
+from utils import bamio
+
+test_file = "../test_data/spliced.test.sam"
+
+
+class TestGetExons(unittest.TestCase):
+    def test_unspliced(self):
+        self.assertEqual(bamio.get_exons([(0, 40)], 100), [(100, 140)])
+
+    def test_spliced(self):
+        cigar = [(4, 5), (0, 50), (3, 200), (0, 30), (4, 10)]
+        self.assertEqual(bamio.get_exons(cigar, 100),
+                            [(100, 150), (350, 380)])
+
+    def test_indels(self):
+        cigar = [(0, 20), (2, 2), (7, 10), (1, 3), (8, 1), (0, 5)]
+        self.assertEqual(bamio.get_exons(cigar, 100), [(100, 138)])
+
+
+class TestIsSAM(unittest.TestCase):
+    def test_sam(self):
+        lines = open(test_file).readlines()
+        self.assertTrue(bamio.is_sam(lines[0]))
+        self.assertTrue(bamio.is_sam(lines[3]))
+
+    def test_psl(self):
+        line = open('../sample_data/sample.psl').readline()
+        self.assertFalse(bamio.is_sam(line))
+
+    def test_bed(self):
+        line = open('../test_data/SE.test.bed').readline()
+        self.assertFalse(bamio.is_sam(line))
+
+
+class TestRead(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.bam_file = os.path.join(self.tmpdir, 'spliced.test.bam')
+        pysam.view('-b', '-o', self.bam_file, test_file, catch_stdout=False)
+        pysam.index(self.bam_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_sam(self):
+        reads = list(bamio.read(test_file))
+        self.assertEqual(reads, [('chr1', [(1000, 1050), (1250, 1280)]),
+                                ('chr1', [(1000, 1050), (1250, 1280)]),
+                                ('chr1', [(5000, 5120)]),
+                                ('chr2', [(2000, 2030), (3030, 3050),
+                                            (3550, 3590)])])
+
+    def test_bam(self):
+        self.assertEqual(list(bamio.read(self.bam_file)),
+                            list(bamio.read(test_file)))
+
+    def test_regions(self):
+        reads = list(bamio.read(self.bam_file, [('chr2', 0, 2010),
+                                                ('chr1', 5100, 6000)]))
+        self.assertEqual([chrom for chrom, exons in reads], ['chr1', 'chr2'])
+
+    def test_overlapped_regions(self):
+        reads = list(bamio.read(self.bam_file, [('chr1', 1000, 1010),
+                                                ('chr1', 1260, 1270),
+                                                ('chr1', 1020, 1030)]))
+        self.assertEqual(len(reads), 2)
+
+    def test_unknown_contig(self):
+        reads = list(bamio.read(self.bam_file, [('chrUn', 0, 10000),
+                                                ('chr2', 0, 2010)]))
+        self.assertEqual([chrom for chrom, exons in reads], ['chr2'])
+        self.assertEqual(list(bamio.read(self.bam_file,
+                                            [('chrUn', 0, 10000)])), [])
+
+    def test_sam_regions(self):
+        regions = [('chr2', 0, 2010), ('chr1', 5100, 6000),
+                    ('chrUn', 0, 10000)]
+        self.assertEqual(list(bamio.read(test_file, regions)),
+                            list(bamio.read(self.bam_file, regions)))
+        self.assertEqual(len(list(bamio.read(test_file,
+                                                [('chr1', 1000, 1010),
+                                                ('chr1', 1260, 1270)]))), 2)
+
+    def test_bam_without_index(self):
+        os.remove(self.bam_file + '.bai')
+        regions = [('chr1', 1000, 1010), ('chr2', 3040, 3045)]
+        reads = list(bamio.read(self.bam_file, regions))
+        self.assertEqual(reads, list(bamio.read(test_file, regions)))
+        self.assertEqual([chrom for chrom, exons in reads],
+                            ['chr1', 'chr1', 'chr2'])
+
@@ -0,0 +1,63 @@
+import unittest
+from utils import bedio
+
+test_file = "../test_data/SE.test.bed"
+
+
+class TestRead(unittest.TestCase):
+    def setUp(self):
+        self.bed = next(bedio.read(open(test_file)))
+
+    def test_columns(self):
+        self.assertEqual(self.bed.chrom, 'chr1')
+        self.assertEqual(self.bed.chromStart, 6195394)
+        self.assertEqual(self.bed.name, 'chr1:7972.1')
+        self.assertEqual(self.bed.gene_id, 'chr1:7972')
+        self.assertEqual(self.bed.blockCount, 13)
+        self.assertEqual(self.bed.blockSizes[:3], [129, 72, 55])
+        self.assertEqual(self.bed.blockStarts[:3], [0, 1933, 4007])
+
+    def test_exons(self):
+        exons = self.bed.exons()
+        self.assertEqual(len(exons), 13)
+        self.assertEqual(exons[0], (6195394, 6195523))
+        self.assertEqual(exons[-1], (6229675, 6233291))
+
+    def test_lazy_decoding(self):
+        self.assertFalse(hasattr(self.bed, '__dict__'))
+        self.assertFalse(hasattr(self.bed, '_blockSizes'))
+        sizes = self.bed.blockSizes
+        self.assertTrue(self.bed.blockSizes is sizes)
+
+    def test_arrays(self):
+        bed = next(bedio.read(open(test_file), arrays=True))
+        self.assertEqual(bed.blockSizes.sum(), sum(self.bed.blockSizes))
+        self.assertEqual([tuple(e) for e in bed.exons()], self.bed.exons())
+
+
+class TestReadGenes(unittest.TestCase):
+    def test_interleaved(self):
+        def line(name, start, end, chrom='chr1'):
+            return '\t'.join([chrom, str(start), str(end), name, '1000', '+',
+                                str(start), str(end), '0,0,0', '1',
+                                str(end - start), '0']) + '\n'
+
+        lines = [line('a.1', 100, 200), line('b.1', 150, 900),
+                    line('a.2', 180, 300), line('c.1', 400, 500),
+                    line('b.2', 800, 900), line('d.1', 10, 20, 'chr2')]
+        genes = [(gene_id, [bed.name for bed in transcripts])
+                    for gene_id, transcripts in bedio.read_genes(lines)]
+        self.assertEqual(genes, [('a', ['a.1', 'a.2']),
+                                    ('b', ['b.1', 'b.2']),
+                                    ('c', ['c.1']),
+                                    ('d', ['d.1'])])
+
+    def test_read_genes(self):
+        genes = list(bedio.read_genes(open(test_file)))
+        transcripts = list(bedio.read(open(test_file)))
+
+        self.assertEqual(sum([len(trns) for _, trns in genes]),
+                            len(transcripts))
+        for gene_id, trns in genes:
+            for bed in trns:
+                self.assertEqual(bed.gene_id, gene_id)
@@ -0,0 +1,134 @@
+'''Reports memory used by exons of exon db built from an input file.
+Run from the tests directory:
+
+    python benchmark_exon_memory.py ../sample_data/sample.psl
+
+Bytes per exon are measured with sys.getsizeof for columns of
+gimme.ExonTable and the same exons stored as the previous
+representations: an object with an instance dictionary and two sets
+per exon, and an object with slots and two tuples per exon, kept in a
+dictionary by exon ids. Interned coordinates of exon ids (see
+gimme.CoordTable) are included in all of them.
+
+'''
+
+import os
+import sys
+
+source_path = os.path.abspath('../src')
+if source_path not in sys.path:
+    sys.path.append(source_path)
+
+import gimme
+
+
+class DictExonObj:
+    '''The first exon representation.'''
+
+    def __init__(self, exon_db, exon_id, next_exons):
+        self.chrom = exon_db.chroms[exon_id]
+        self.start = exon_db.starts[exon_id]
+        self.end = exon_db.ends[exon_id]
+        self.id = exon_id
+        self.terminal = exon_db.terminals[exon_id] or None
+        self.next_exons = set(next_exons)
+        self.introns = set(exon_db.introns[exon_id])
+        self.single = False
+        self.remove = False
+
+
+class SlotExonObj(object):
+    '''The second exon representation.'''
+
+    __slots__ = ('chrom', 'start', 'end', 'id', 'terminal',
+                    'next_exons', 'introns', 'remove', 'support')
+
+    def __init__(self, exon_db, exon_id, next_exons):
+        self.chrom = exon_db.chroms[exon_id]
+        self.start = exon_db.starts[exon_id]
+        self.end = exon_db.ends[exon_id]
+        self.id = exon_id
+        self.terminal = exon_db.terminals[exon_id] or None
+        self.next_exons = tuple(next_exons)
+        self.introns = exon_db.introns[exon_id]
+        self.remove = False
+        self.support = exon_db.support[exon_id]
+
+
+def get_size(exon):
+    '''Returns bytes of an exon object and its containers.'''
+
+    size = sys.getsizeof(exon)
+    if hasattr(exon, '__dict__'):
+        size += sys.getsizeof(exon.__dict__)
+    for ids in (exon.next_exons, exon.introns):
+        if ids != ():  # an empty tuple is shared by all exons
+            size += sys.getsizeof(ids)
+    return size
+
+
+def get_ids_size(ids):
+    '''Returns bytes of a coordinate table (see gimme.CoordTable):
+    dictionaries of each chromosome, coordinate tuples and integers
+    of their keys and values.
+
+    '''
+    size = sys.getsizeof(ids.chroms)
+    for coords in ids.chroms.itervalues():
+        size += sys.getsizeof(coords)
+        for (start, end), exon_id in coords.iteritems():
+            size += sys.getsizeof((start, end))
+            size += sum(sys.getsizeof(value) for value in
+                        (start, end, exon_id) if value > 256)  # not cached
+    return size
+
+
+def get_table_size(exon_db):
+    '''Returns bytes of columns and ids of an exon table.'''
+
+    size = sum(sys.getsizeof(column) for column in
+                (exon_db.chroms, exon_db.starts, exon_db.ends,
+                    exon_db.terminals, exon_db.support, exon_db.introns))
+    size += sum(sys.getsizeof(introns) for introns in exon_db.introns
+                    if introns != ())
+    return size + get_ids_size(exon_db.ids)
+
+
+def main(input_file):
+    align_db = gimme.AlignmentDB()
+    for groups in gimme.read_alignments(input_file, {'identity': 0,
+                                                        'coverage': 0}):
+        gimme.add_alignment(align_db, groups)
+
+    exon_db = align_db.exon_db
+    if not len(exon_db):
+        print >> sys.stderr, 'No multi-exon alignments in %s' % input_file
+        raise SystemExit
+
+    next_exons = dict((exon_id, []) for exon_id in range(len(exon_db)))
+    for intron_id in range(len(align_db.intron_db)):
+        for exon1, exon2 in align_db.intron_db.get_edges(intron_id):
+            if exon2 not in next_exons[exon1]:
+                next_exons[exon1].append(exon2)
+
+    # exon objects were stored in a dictionary by their ids
+    ids_size = get_ids_size(exon_db.ids)
+    db_size = sys.getsizeof(dict.fromkeys(range(len(exon_db))))
+    dict_size = sum(get_size(DictExonObj(exon_db, i, next_exons[i]))
+                    for i in range(len(exon_db))) + ids_size + db_size
+    slot_size = sum(get_size(SlotExonObj(exon_db, i, next_exons[i]))
+                    for i in range(len(exon_db))) + ids_size + db_size
+    table_size = get_table_size(exon_db)
+
+    n = float(len(exon_db))
+    print 'Exons\t\t%d' % len(exon_db)
+    print 'Dictionary\t%.1f bytes per exon' % (dict_size / n)
+    print 'Slots\t\t%.1f bytes per exon' % (slot_size / n)
+    print 'Table\t\t%.1f bytes per exon' % (table_size / n)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print >> sys.stderr, 'Usage: python %s <input file>' % sys.argv[0]
+        raise SystemExit
+    main(sys.argv[1])
@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+import unittest
+from utils import chainfile
+from utils.regions import RegionIndex
+
+chains = [('chr1', 100, 200, 300, 400),
+            ('chr2', 50, 80),
+            ('chr1', 500, 600),
+            ('chr1', 100, 200, 350, 400, 500, 550)]
+counts = [3, 1, 1, 2]
+
+
+class TestChainFile(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'test.gcf')
+        chainfile.write(self.filename, chains, counts, {'alignments': 7})
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_is_chain_file(self):
+        self.assertTrue(chainfile.is_chain_file(self.filename))
+        self.assertFalse(chainfile.is_chain_file('../test_data/SE.test.bed'))
+        self.assertFalse(chainfile.is_chain_file('-'))
+
+    def test_round_trip(self):
+        chain_file = chainfile.ChainFile(self.filename)
+        self.assertEqual(chain_file.info, {'alignments': 7})
+        self.assertEqual(chain_file.chroms, ['chr1', 'chr2'])
+        self.assertEqual(list(chain_file.chains()),
+                            [(chains[0], 3), (chains[2], 1),
+                                (chains[3], 2), (chains[1], 1)])
+        self.assertEqual(list(chain_file.chains('chr2')), [(chains[1], 1)])
+        self.assertEqual(list(chain_file.chains('chrX')), [])
+        chain_file.close()
+
+    def test_arrays(self):
+        chain_file = chainfile.ChainFile(self.filename)
+        starts, ends, offsets, chain_counts = chain_file.arrays('chr1')
+        self.assertEqual(starts.tolist(), [100, 300, 500, 100, 350, 500])
+        self.assertEqual(ends.tolist(), [200, 400, 600, 200, 400, 550])
+        self.assertEqual(offsets.tolist(), [0, 2, 3, 6])
+        self.assertEqual(chain_counts.tolist(), [3, 1, 2])
+        chain_file.close()
+
+    def test_regions(self):
+        chain_file = chainfile.ChainFile(self.filename)
+        region_index = RegionIndex([('chr1', 380, 450), ('chr2', 0, 10)])
+        self.assertEqual(list(chain_file.exons('chr1', region_index)),
+                            [([100, 300], [200, 400], 3),
+                                ([100, 350, 500], [200, 400, 550], 2)])
+        self.assertEqual(list(chain_file.exons('chr2', region_index)), [])
+        self.assertEqual(list(chain_file.chains(region_index=region_index)),
+                            [(chains[0], 3), (chains[3], 2)])
+        chain_file.close()
+
+    def test_not_chain_file(self):
+        self.assertRaises(ValueError, chainfile.ChainFile,
+                            '../test_data/SE.test.bed')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import pysam
+
+from utils import fileindex
+
+test_file = "../sample_data/sample.psl"
+
+REGIONS = [('chr25', 0, 500000),
+            ('chr25', 400000, 800000),
+            ('chr25', 1500000, 1500100),
+            ('chr25', 1969000, 1969100),
+            ('chrUn', 0, 1000)]
+
+
+class TestFetch(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.columns = fileindex.COLUMNS['PSL']
+        self.lines = sorted(open(test_file),
+                    key=lambda line: fileindex.get_coords(line,
+                                                        self.columns)[1])
+        self.sorted_file = os.path.join(self.tmpdir, 'sorted.psl')
+        with open(self.sorted_file, 'w') as fp:
+            fp.writelines(self.lines)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def expected(self, regions):
+        lines = []
+        for line in self.lines:
+            chrom, start, end = fileindex.get_coords(line, self.columns)
+            for region_chrom, region_start, region_end in regions:
+                if (chrom == region_chrom and start < region_end and
+                        end > region_start):
+                    lines.append(line)
+                    break
+        return sorted(lines)
+
+    def test_indexed(self):
+        lines = fileindex.fetch(self.sorted_file, 'PSL', REGIONS)
+        self.assertEqual(sorted(lines), self.expected(REGIONS))
+        self.assertTrue(os.path.exists(self.sorted_file + '.idx'))
+
+        for region in REGIONS:  # a saved index
+            lines = fileindex.fetch(self.sorted_file, 'PSL', [region])
+            self.assertEqual(sorted(lines), self.expected([region]))
+
+    def test_outdated_index(self):
+        list(fileindex.fetch(self.sorted_file, 'PSL', REGIONS[:1]))
+        self.lines = self.lines[:100]
+        with open(self.sorted_file, 'w') as fp:
+            fp.writelines(self.lines)
+
+        lines = fileindex.fetch(self.sorted_file, 'PSL', REGIONS)
+        self.assertEqual(sorted(lines), self.expected(REGIONS))
+
+    def test_unsorted(self):
+        self.assertRaises(ValueError, fileindex.fetch, test_file,
+                            'PSL', REGIONS)
+
+    def test_tabix(self):
+        bgzip_file = self.sorted_file + '.bgz'
+        pysam.tabix_compress(self.sorted_file, bgzip_file)
+
+        self.assertTrue(fileindex.can_index(bgzip_file))
+        lines = fileindex.fetch(bgzip_file, 'PSL', REGIONS)
+        self.assertEqual(sorted(lines), self.expected(REGIONS))
+
+    def test_scan(self):
+        lines = fileindex.fetch_scan(open(test_file), self.columns, REGIONS)
+        self.assertEqual(sorted(lines), self.expected(REGIONS))
@@ -0,0 +1,99 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+from utils import fileio
+
+test_file = "../test_data/SE.test.bed"
+
+
+class TestOpenFile(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.lines = open(test_file).readlines()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write_gzip(self, filename, parts):
+        '''Writes each part as a separate gzip member (like bgzip).'''
+        filename = os.path.join(self.tmpdir, filename)
+        with open(filename, 'wb') as fp:
+            for part in parts:
+                member = gzip.GzipFile(fileobj=fp, mode='wb')
+                member.write(''.join(part))
+                member.close()
+        return filename
+
+    def test_plain(self):
+        with fileio.open_file(test_file) as fp:
+            self.assertEqual(list(fp), self.lines)
+
+    def test_gzip(self):
+        filename = self.write_gzip('test.bed.gz', [self.lines])
+        with fileio.open_file(filename) as fp:
+            self.assertEqual(list(fp), self.lines)
+
+    def test_bgzip(self):
+        parts = [self.lines[:3], self.lines[3:10], self.lines[10:]]
+        filename = self.write_gzip('test.bed.bgz', parts)
+        with fileio.open_file(filename) as fp:
+            self.assertEqual(list(fp), self.lines)
+
+    def test_small_chunks(self):
+        filename = self.write_gzip('test.bed.gz', [self.lines])
+        fp = fileio.BackgroundReader(open(filename, 'rb'), chunk_size=7,
+                                        queue_size=2)
+        self.assertEqual(fp.readline(), self.lines[0])
+        self.assertEqual(list(fp), self.lines[1:])
+        self.assertEqual(fp.readline(), '')
+        fp.close()
+
+    def test_plain_stream(self):
+        fp = fileio.BackgroundReader(open(test_file), chunk_size=7)
+        self.assertEqual(list(fp), self.lines)
+        fp.close()
+
+    def test_peek_line(self):
+        filename = self.write_gzip('test.bed.gz', [self.lines])
+        first_line, lines = fileio.peek_line(fileio.open_file(filename))
+        self.assertEqual(first_line, self.lines[0])
+        self.assertEqual(list(lines), self.lines)
+
+    def test_peek_line_comment(self):
+        header = ['# comment\n', '##header\n']
+        first_line, lines = fileio.peek_line(iter(header + self.lines), '#')
+        self.assertEqual(first_line, self.lines[0])
+        self.assertEqual(list(lines), self.lines)
+
+        first_line, lines = fileio.peek_line(iter(header), '#')
+        self.assertEqual(first_line, header[0])
+        self.assertEqual(list(lines), [''])
+
+    def test_close_early(self):
+        filename = self.write_gzip('test.bed.gz', [self.lines])
+        fp = fileio.BackgroundReader(open(filename, 'rb'), chunk_size=7,
+                                        queue_size=1)
+        fp.readline()
+        fp.close()
+        self.assertFalse(fp.thread.is_alive())
+
+
+class TestSplitFile(unittest.TestCase):
+    def setUp(self):
+        self.lines = open(test_file).readlines()
+
+    def test_ranges(self):
+        for n in (1, 2, 3, 7, 100):
+            ranges = fileio.split_file(test_file, n)
+            self.assertTrue(len(ranges) <= n)
+            self.assertEqual(ranges[0][0], 0)
+            self.assertEqual(ranges[-1][1], os.path.getsize(test_file))
+
+            lines = []
+            for start, end in ranges:
+                range_lines = list(fileio.open_range(test_file, start, end))
+                self.assertTrue(range_lines)
+                lines.extend(range_lines)
+            self.assertEqual(lines, self.lines)
@@ -0,0 +1,36 @@
+import unittest
+import networkx as nx
+from utils import get_min_isoforms
+
+
+class TestGetMinPaths(unittest.TestCase):
+    def make_graph(self, paths):
+        G = nx.DiGraph()
+        for path in paths:
+            G.add_path(['Start'] + path + ['End'])
+        return G
+
+    def check_paths(self, G, paths):
+        K = nx.DiGraph()
+        for path in paths:
+            K.add_path(path)
+        g = G.copy()
+        g.remove_nodes_from(['Start', 'End'])
+        self.assertEqual(set(K.edges()), set(g.edges()))
+
+    def test_integer_nodes(self):
+        G = self.make_graph([[0, 1, 3], [0, 2, 3], [0, 1, 2, 3]])
+        paths = get_min_isoforms.get_min_paths(G, False)
+        self.assertTrue(len(paths) <= 3)
+        self.check_paths(G, paths)
+
+    def test_string_nodes(self):
+        G = self.make_graph([['chr1:1-10', 'chr1:20-30'],
+                                ['chr1:1-10', 'chr1:40-50']])
+        paths = get_min_isoforms.get_min_paths(G, False)
+        self.assertEqual(sorted(paths), [['chr1:1-10', 'chr1:20-30'],
+                                            ['chr1:1-10', 'chr1:40-50']])
+
+
+if __name__ == '__main__':
+    unittest.main()
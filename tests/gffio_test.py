@@ -0,0 +1,69 @@
+import unittest
+from utils import gffio
+
+gtf = ['#!genome-build test\n',
+        'chr1\tsrc\ttranscript\t101\t400\t.\t+\t.\t'
+            'gene_id "g1"; transcript_id "t1";\n',
+        'chr1\tsrc\texon\t301\t400\t.\t+\t.\t'
+            'gene_id "g1"; transcript_id "t1";\n',
+        'chr1\tsrc\texon\t51\t80\t.\t-\t.\t'
+            'gene_id "g2"; transcript_id "t2";\n',
+        'chr1\tsrc\texon\t101\t200\t.\t+\t.\t'
+            'gene_id "g1"; transcript_id "t1";\n',
+        'chr2\tsrc\texon\t11\t20\t.\t+\t.\t'
+            'gene_id "g3"; transcript_id "t3";\n']
+
+gff3 = ['##gff-version 3\n',
+        'chr1\tsrc\tmRNA\t101\t400\t.\t+\t.\tID=t1;Parent=g1\n',
+        'chr1\tsrc\texon\t301\t400\t.\t+\t.\tID=e2;Parent=t1,t%3B2\n',
+        'chr1\tsrc\texon\t101\t200\t.\t+\t.\tID=e1;Parent=t1\n',
+        '##FASTA\n',
+        '>chr1\n']
+
+
+class TestGFF(unittest.TestCase):
+    def test_is_gff(self):
+        self.assertTrue(gffio.is_gff(gtf[0]))
+        self.assertTrue(gffio.is_gff(gtf[2]))
+        self.assertTrue(gffio.is_gff(gff3[0]))
+        self.assertFalse(gffio.is_gff(open('../test_data/SE.test.bed')
+                                        .readline()))
+
+    def test_transcript_ids(self):
+        self.assertEqual(gffio.get_transcript_ids(gtf[2].split('\t')[8]),
+                            ['t1'])
+        self.assertEqual(gffio.get_transcript_ids(gff3[2].split('\t')[8]),
+                            ['t1', 't;2'])
+        self.assertEqual(gffio.get_transcript_ids('gene_id "g1";'), [])
+
+    def test_gtf(self):
+        self.assertEqual(list(gffio.group_transcripts(gtf)),
+                            [('chr1', 't2', [(50, 80)]),
+                                ('chr1', 't1', [(100, 200), (300, 400)]),
+                                ('chr2', 't3', [(10, 20)])])
+
+    def test_gff3(self):
+        self.assertEqual(list(gffio.read(gff3)),
+                            [('chr1', [(100, 200), (300, 400)]),
+                                ('chr1', [(300, 400)])])
+
+    def test_regions(self):
+        self.assertEqual(list(gffio.read(gtf, [('chr1', 150, 160)])),
+                            [('chr1', [(100, 200), (300, 400)])])
+
+    def test_unsorted_chromosomes(self):
+        lines = gtf[:3] + gtf[5:] + gtf[3:5]
+        self.assertEqual(list(gffio.group_transcripts(lines)),
+                            [('chr1', 't2', [(50, 80)]),
+                                ('chr1', 't1', [(100, 200), (300, 400)]),
+                                ('chr2', 't3', [(10, 20)])])
+
+    def test_header(self):
+        lines = ['# stringtie -o out.gtf in.bam\n',
+                    '##description: evidence-based annotation\n',
+                    '##provider: GENCODE\n'] + gtf[1:]
+        self.assertEqual(list(gffio.read(lines)), list(gffio.read(gtf)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,50 +2,77 @@
 
 import sys
 import os
+import shutil
+import gzip
+import array
+import tempfile
 
 from unittest import TestCase
 import unittest
 import networkx as nx
+import numpy as np
+from StringIO import StringIO
 
 source_path = os.path.abspath('src')
 if source_path not in sys.path:
     sys.path.append(os.path.abspath('src'))
 
 import gimme
+from utils import pslparser, fileio, split_strand, bedio, chainfile
+from utils.regions import RegionIndex
+from utils.splice_graph import SpliceGraph
 
 
 class TestCollapseExons(TestCase):
     def setUp(self):
         self.align_db = gimme.AlignmentDB()
+        self.chrom = gimme.chrom_table.get_id('chr1')
+        self.names = {}
         start = 1000
         n = 1
         exons = []
 
         while n < 7:
-            e = gimme.ExonObj('chr1', start, start + 100)
-            self.align_db.exon_db[str(e)] = e
-            exons.append(str(e))
+            exons.append(self.add_exon(start, start + 100))
             start += 300
             n += 1
 
-        self.align_db.exon_db[exons[0]].terminal = 1  # mark a left terminal
-        self.align_db.exon_db[exons[-1]].terminal = 2  # mark a right terminal
+        terminals = self.align_db.exon_db.terminals
+        terminals[exons[0]] = 1  # mark a left terminal
+        terminals[exons[-1]] = 2  # mark a right terminal
 
-        self.exon_graph = nx.DiGraph()
+        self.exon_graph = SpliceGraph()
         self.exon_graph.add_path(exons)
 
+    def add_exon(self, start, end, terminal=0):
+        '''Adds an exon to exon db and returns its id.'''
+        exon_id = self.align_db.exon_db.add(self.chrom, start, end, terminal)
+        self.names[exon_id] = 'chr1:%d-%d' % (start, end)
+        return exon_id
+
+    def exon(self, name):
+        '''Returns an id of an exon added by add_exon.'''
+        return dict((v, k) for k, v in self.names.iteritems())[name]
+
+    def get_nodes(self):
+        return [self.names[node] for node in self.exon_graph.nodes()]
+
+    def get_edges(self):
+        return [(self.names[exon1], self.names[exon2])
+                for exon1, exon2 in self.exon_graph.edges()]
+
     def test_building_base_exon_db_and_exon_graph(self):
         self.assertEqual(len(self.align_db.exon_db), 6)
         self.assertEqual(len(self.exon_graph.nodes()), 6)
         self.assertEqual(len(self.exon_graph.edges()), 5)
-        self.assertItemsEqual(self.exon_graph.nodes(), ['chr1:1000-1100',
-                                                    'chr1:1300-1400',
-                                                    'chr1:1600-1700',
-                                                    'chr1:1900-2000',
-                                                    'chr1:2200-2300',
-                                                    'chr1:2500-2600'])
-
-        self.assertItemsEqual(self.exon_graph.edges(),
+        self.assertItemsEqual(self.get_nodes(), ['chr1:1000-1100',
+                                                'chr1:1300-1400',
+                                                'chr1:1600-1700',
+                                                'chr1:1900-2000',
+                                                'chr1:2200-2300',
+                                                'chr1:2500-2600'])
+
+        self.assertItemsEqual(self.get_edges(),
                 [('chr1:1000-1100', 'chr1:1300-1400'),
                     ('chr1:1300-1400', 'chr1:1600-1700'),
                     ('chr1:1600-1700', 'chr1:1900-2000'),
@@ -63,10 +90,8 @@ class TestCollapseExons(TestCase):
 
         '''
 
-        e = gimme.ExonObj('chr1', 1050, 1100)
-        e.terminal = 1
-        self.align_db.exon_db[str(e)] = e
-        self.exon_graph.add_edge(str(e), 'chr1:1300-1400')
+        e = self.add_exon(1050, 1100, 1)
+        self.exon_graph.add_edge(e, self.exon('chr1:1300-1400'))
         self.assertEqual(len(self.exon_graph.nodes()), 7)
         self.assertEqual(len(self.exon_graph.edges()), 6)
 
@@ -86,10 +111,8 @@ class TestCollapseExons(TestCase):
 
         '''
 
-        e = gimme.ExonObj('chr1', 2500, 2550)
-        e.terminal = 2
-        self.align_db.exon_db[str(e)] = e
-        self.exon_graph.add_edge('chr1:2200-2300', str(e))
+        e = self.add_exon(2500, 2550, 2)
+        self.exon_graph.add_edge(self.exon('chr1:2200-2300'), e)
         self.assertEqual(len(self.exon_graph.nodes()), 7)
         self.assertEqual(len(self.exon_graph.edges()), 6)
 
@@ -109,14 +132,10 @@ class TestCollapseExons(TestCase):
 
         '''
 
-        e1 = gimme.ExonObj('chr1', 700, 800)
-        e1.terminal = 1
-        self.align_db.exon_db[str(e1)] = e1
+        e1 = self.add_exon(700, 800, 1)
 
-        e2 = gimme.ExonObj('chr1', 900, 1100)
-        e2.terminal = 2
-        self.align_db.exon_db[str(e2)] = e2
-        self.exon_graph.add_edge(str(e1), str(e2))
+        e2 = self.add_exon(900, 1100, 2)
+        self.exon_graph.add_edge(e1, e2)
 
         self.assertEqual(len(self.exon_graph.nodes()), 8)
         self.assertEqual(len(self.exon_graph.edges()), 6)
@@ -126,7 +145,7 @@ class TestCollapseExons(TestCase):
         self.assertEqual(len(self.exon_graph.nodes()), 7)
         self.assertEqual(len(self.exon_graph.edges()), 6)
 
-        self.assertItemsEqual(self.exon_graph.edges(),
+        self.assertItemsEqual(self.get_edges(),
                 [('chr1:700-800', 'chr1:900-1100'),
                     ('chr1:900-1100', 'chr1:1300-1400'),
                     ('chr1:1300-1400', 'chr1:1600-1700'),
@@ -145,14 +164,10 @@ class TestCollapseExons(TestCase):
 
         '''
 
-        e1 = gimme.ExonObj('chr1', 2550, 2600)
-        e1.terminal = 1
-        self.align_db.exon_db[str(e1)] = e1
+        e1 = self.add_exon(2550, 2600, 1)
 
-        e2 = gimme.ExonObj('chr1', 2800, 2900)
-        e2.terminal = 2
-        self.align_db.exon_db[str(e2)] = e2
-        self.exon_graph.add_edge(str(e1), str(e2))
+        e2 = self.add_exon(2800, 2900, 2)
+        self.exon_graph.add_edge(e1, e2)
 
         self.assertEqual(len(self.exon_graph.nodes()), 8)
         self.assertEqual(len(self.exon_graph.edges()), 6)
@@ -162,7 +177,7 @@ class TestCollapseExons(TestCase):
         self.assertEqual(len(self.exon_graph.nodes()), 7)
         self.assertEqual(len(self.exon_graph.edges()), 6)
 
-        self.assertItemsEqual(self.exon_graph.edges(),
+        self.assertItemsEqual(self.get_edges(),
                 [('chr1:1000-1100', 'chr1:1300-1400'),
                     ('chr1:1300-1400', 'chr1:1600-1700'),
                     ('chr1:1600-1700', 'chr1:1900-2000'),
@@ -183,14 +198,10 @@ class TestCollapseExons(TestCase):
 
         '''
 
-        e1 = gimme.ExonObj('chr1', 1900, 2000)
-        e1.terminal = 1
-        self.align_db.exon_db[str(e1)] = e1
+        e1 = self.add_exon(1900, 2000, 1)
 
-        e2 = gimme.ExonObj('chr1', 2500, 2550)
-        e2.terminal = 2
-        self.align_db.exon_db[str(e2)] = e2
-        self.exon_graph.add_edge(str(e1), str(e2))
+        e2 = self.add_exon(2500, 2550, 2)
+        self.exon_graph.add_edge(e1, e2)
 
         self.assertEqual(len(self.exon_graph.nodes()), 7)
         self.assertEqual(len(self.exon_graph.edges()), 6)
@@ -206,7 +217,7 @@ class TestCollapseExons(TestCase):
         self.assertEqual(len(self.exon_graph.nodes()), 6)
         self.assertEqual(len(self.exon_graph.edges()), 6)
 
-        self.assertItemsEqual(self.exon_graph.edges(),
+        self.assertItemsEqual(self.get_edges(),
                 [('chr1:1000-1100', 'chr1:1300-1400'),
                     ('chr1:1300-1400', 'chr1:1600-1700'),
                     ('chr1:1600-1700', 'chr1:1900-2000'),
@@ -227,14 +238,10 @@ class TestCollapseExons(TestCase):
 
         '''
 
-        e1 = gimme.ExonObj('chr1', 1050, 1100)
-        e1.terminal = 1
-        self.align_db.exon_db[str(e1)] = e1
+        e1 = self.add_exon(1050, 1100, 1)
 
-        e2 = gimme.ExonObj('chr1', 1600, 1700)
-        e2.terminal = 2
-        self.align_db.exon_db[str(e2)] = e2
-        self.exon_graph.add_edge(str(e1), str(e2))
+        e2 = self.add_exon(1600, 1700, 2)
+        self.exon_graph.add_edge(e1, e2)
 
         self.assertEqual(len(self.exon_graph.nodes()), 7)
         self.assertEqual(len(self.exon_graph.edges()), 6)
@@ -244,7 +251,7 @@ class TestCollapseExons(TestCase):
         self.assertEqual(len(self.exon_graph.nodes()), 6)
         self.assertEqual(len(self.exon_graph.edges()), 6)
 
-        self.assertItemsEqual(self.exon_graph.edges(),
+        self.assertItemsEqual(self.get_edges(),
                 [('chr1:1000-1100', 'chr1:1300-1400'),
                     ('chr1:1000-1100', 'chr1:1600-1700'),
                     ('chr1:1300-1400', 'chr1:1600-1700'),
@@ -265,19 +272,14 @@ class TestCollapseExons(TestCase):
 
         '''
 
-        e1 = gimme.ExonObj('chr1', 1050, 1100)
-        e1.terminal = 1
-        self.align_db.exon_db[str(e1)] = e1
+        e1 = self.add_exon(1050, 1100, 1)
 
-        e2 = gimme.ExonObj('chr1', 1600, 1700)
-        self.align_db.exon_db[str(e2)] = e2
+        e2 = self.add_exon(1600, 1700)
 
-        e3 = gimme.ExonObj('chr1', 1900, 1950)
-        e3.terminal = 2
-        self.align_db.exon_db[str(e3)] = e3
+        e3 = self.add_exon(1900, 1950, 2)
 
-        self.exon_graph.add_edge(str(e1), str(e2))
-        self.exon_graph.add_edge(str(e2), str(e3))
+        self.exon_graph.add_edge(e1, e2)
+        self.exon_graph.add_edge(e2, e3)
 
         self.assertEqual(len(self.exon_graph.nodes()), 8)
         self.assertEqual(len(self.exon_graph.edges()), 7)
@@ -287,7 +289,7 @@ class TestCollapseExons(TestCase):
         self.assertEqual(len(self.exon_graph.nodes()), 6)
         self.assertEqual(len(self.exon_graph.edges()), 6)
 
-        self.assertItemsEqual(self.exon_graph.edges(),
+        self.assertItemsEqual(self.get_edges(),
                 [('chr1:1000-1100', 'chr1:1300-1400'),
                     ('chr1:1000-1100', 'chr1:1600-1700'),
                     ('chr1:1300-1400', 'chr1:1600-1700'),
@@ -308,19 +310,14 @@ class TestCollapseExons(TestCase):
 
         '''
 
-        e1 = gimme.ExonObj('chr1', 1190, 1400)
-        e1.terminal = 1
-        self.align_db.exon_db[str(e1)] = e1
+        e1 = self.add_exon(1190, 1400, 1)
 
-        e2 = gimme.ExonObj('chr1', 1600, 1700)
-        self.align_db.exon_db[str(e2)] = e2
+        e2 = self.add_exon(1600, 1700)
 
-        e3 = gimme.ExonObj('chr1', 1900, 1950)
-        e3.terminal = 2
-        self.align_db.exon_db[str(e3)] = e3
+        e3 = self.add_exon(1900, 1950, 2)
 
-        self.exon_graph.add_edge(str(e1), str(e2))
-        self.exon_graph.add_edge(str(e2), str(e3))
+        self.exon_graph.add_edge(e1, e2)
+        self.exon_graph.add_edge(e2, e3)
 
         self.assertEqual(len(self.exon_graph.nodes()), 8)
         self.assertEqual(len(self.exon_graph.edges()), 7)
@@ -329,7 +326,7 @@ class TestCollapseExons(TestCase):
 
         self.assertEqual(len(self.exon_graph.nodes()), 7)
         self.assertEqual(len(self.exon_graph.edges()), 6)
-        self.assertItemsEqual(self.exon_graph.edges(),
+        self.assertItemsEqual(self.get_edges(),
                 [('chr1:1000-1100', 'chr1:1300-1400'),
                     ('chr1:1190-1400', 'chr1:1600-1700'),
                     ('chr1:1300-1400', 'chr1:1600-1700'),
@@ -349,19 +346,14 @@ class TestCollapseExons(TestCase):
 
         '''
 
-        e1 = gimme.ExonObj('chr1', 1250, 1400)
-        e1.terminal = 1
-        self.align_db.exon_db[str(e1)] = e1
+        e1 = self.add_exon(1250, 1400, 1)
 
-        e2 = gimme.ExonObj('chr1', 1600, 1700)
-        self.align_db.exon_db[str(e2)] = e2
+        e2 = self.add_exon(1600, 1700)
 
-        e3 = gimme.ExonObj('chr1', 1900, 1950)
-        e3.terminal = 2
-        self.align_db.exon_db[str(e3)] = e3
+        e3 = self.add_exon(1900, 1950, 2)
 
-        self.exon_graph.add_edge(str(e1), str(e2))
-        self.exon_graph.add_edge(str(e2), str(e3))
+        self.exon_graph.add_edge(e1, e2)
+        self.exon_graph.add_edge(e2, e3)
 
         self.assertEqual(len(self.exon_graph.nodes()), 8)
         self.assertEqual(len(self.exon_graph.edges()), 7)
@@ -383,19 +375,14 @@ class TestCollapseExons(TestCase):
 
         '''
 
-        e1 = gimme.ExonObj('chr1', 1050, 1100)
-        e1.terminal = 1
-        self.align_db.exon_db[str(e1)] = e1
+        e1 = self.add_exon(1050, 1100, 1)
 
-        e2 = gimme.ExonObj('chr1', 1300, 1400)
-        self.align_db.exon_db[str(e2)] = e2
+        e2 = self.add_exon(1300, 1400)
 
-        e3 = gimme.ExonObj('chr1', 1600, 1850)
-        e3.terminal = 2
-        self.align_db.exon_db[str(e3)] = e3
+        e3 = self.add_exon(1600, 1850, 2)
 
-        self.exon_graph.add_edge(str(e1), str(e2))
-        self.exon_graph.add_edge(str(e2), str(e3))
+        self.exon_graph.add_edge(e1, e2)
+        self.exon_graph.add_edge(e2, e3)
 
         self.assertEqual(len(self.exon_graph.nodes()), 8)
         self.assertEqual(len(self.exon_graph.edges()), 7)
@@ -405,7 +392,7 @@ class TestCollapseExons(TestCase):
         self.assertEqual(len(self.exon_graph.nodes()), 7)
         self.assertEqual(len(self.exon_graph.edges()), 6)
 
-        self.assertItemsEqual(self.exon_graph.edges(),
+        self.assertItemsEqual(self.get_edges(),
                 [('chr1:1000-1100', 'chr1:1300-1400'),
                     ('chr1:1300-1400', 'chr1:1600-1700'),
                     ('chr1:1300-1400', 'chr1:1600-1850'),
@@ -426,15 +413,11 @@ class TestCollapseExons(TestCase):
 
         '''
 
-        e1 = gimme.ExonObj('chr1', 1150, 1400)
-        e1.terminal = 1
-        self.align_db.exon_db[str(e1)] = e1
+        e1 = self.add_exon(1150, 1400, 1)
 
-        e2 = gimme.ExonObj('chr1', 1600, 1850)
-        e2.terminal = 2
-        self.align_db.exon_db[str(e2)] = e2
+        e2 = self.add_exon(1600, 1850, 2)
 
-        self.exon_graph.add_edge(str(e1), str(e2))
+        self.exon_graph.add_edge(e1, e2)
 
         self.assertEqual(len(self.exon_graph.nodes()), 8)
         self.assertEqual(len(self.exon_graph.edges()), 6)
@@ -443,7 +426,7 @@ class TestCollapseExons(TestCase):
 
         self.assertEqual(len(self.exon_graph.nodes()), 8)
         self.assertEqual(len(self.exon_graph.edges()), 6)
-        self.assertItemsEqual(self.exon_graph.edges(),
+        self.assertItemsEqual(self.get_edges(),
                 [('chr1:1000-1100', 'chr1:1300-1400'),
                     ('chr1:1300-1400', 'chr1:1600-1700'),
                     ('chr1:1150-1400', 'chr1:1600-1850'),
@@ -463,15 +446,11 @@ class TestCollapseExons(TestCase):
 
         '''
 
-        e1 = gimme.ExonObj('chr1', 1250, 1400)
-        e1.terminal = 1
-        self.align_db.exon_db[str(e1)] = e1
+        e1 = self.add_exon(1250, 1400, 1)
 
-        e2 = gimme.ExonObj('chr1', 1600, 1750)
-        e2.terminal = 2
-        self.align_db.exon_db[str(e2)] = e2
+        e2 = self.add_exon(1600, 1750, 2)
 
-        self.exon_graph.add_edge(str(e1), str(e2))
+        self.exon_graph.add_edge(e1, e2)
 
         self.assertEqual(len(self.exon_graph.nodes()), 8)
         self.assertEqual(len(self.exon_graph.edges()), 6)
@@ -492,19 +471,14 @@ class TestCollapseExons(TestCase):
 
         '''
 
-        e1 = gimme.ExonObj('chr1', 1050, 1100)
-        e1.terminal = 1
-        self.align_db.exon_db[str(e1)] = e1
+        e1 = self.add_exon(1050, 1100, 1)
 
-        e2 = gimme.ExonObj('chr1', 1300, 1400)
-        self.align_db.exon_db[str(e2)] = e2
+        e2 = self.add_exon(1300, 1400)
 
-        e3 = gimme.ExonObj('chr1', 1600, 1750)
-        e3.terminal = 2
-        self.align_db.exon_db[str(e3)] = e3
+        e3 = self.add_exon(1600, 1750, 2)
 
-        self.exon_graph.add_edge(str(e1), str(e2))
-        self.exon_graph.add_edge(str(e2), str(e3))
+        self.exon_graph.add_edge(e1, e2)
+        self.exon_graph.add_edge(e2, e3)
 
         self.assertEqual(len(self.exon_graph.nodes()), 8)
         self.assertEqual(len(self.exon_graph.edges()), 7)
@@ -525,15 +499,11 @@ class TestCollapseExons(TestCase):
 
         '''
 
-        e1 = gimme.ExonObj('chr1', 1350, 1400)
-        e1.terminal = 1
-        self.align_db.exon_db[str(e1)] = e1
+        e1 = self.add_exon(1350, 1400, 1)
 
-        e2 = gimme.ExonObj('chr1', 1600, 1650)
-        e2.terminal = 2
-        self.align_db.exon_db[str(e2)] = e2
+        e2 = self.add_exon(1600, 1650, 2)
 
-        self.exon_graph.add_edge(str(e1), str(e2))
+        self.exon_graph.add_edge(e1, e2)
 
         self.assertEqual(len(self.exon_graph.nodes()), 8)
         self.assertEqual(len(self.exon_graph.edges()), 6)
@@ -555,24 +525,17 @@ class TestCollapseExons(TestCase):
           L|=========|------|=====|--------|======|-------|======|R
 
         '''
-        e1 = gimme.ExonObj('chr1', 990, 1010)
-        e1.terminal = 1
-        self.align_db.exon_db[str(e1)] = e1
+        e1 = self.add_exon(990, 1010, 1)
 
-        e2 = gimme.ExonObj('chr1', 1300, 1400)
-        e2.terminal = 2
-        self.align_db.exon_db[str(e2)] = e2
+        e2 = self.add_exon(1300, 1400, 2)
 
-        e3 = gimme.ExonObj('chr1', 950, 1100)
-        e3.terminal = 1
-        self.align_db.exon_db[str(e3)] = e3
+        e3 = self.add_exon(950, 1100, 1)
 
-        e4 = gimme.ExonObj('chr1', 1030, 1040)
-        self.align_db.exon_db[str(e4)] = e4
+        e4 = self.add_exon(1030, 1040)
 
-        self.exon_graph.add_edge(str(e1), str(e4))
-        self.exon_graph.add_edge(str(e3), str(e2))
-        self.exon_graph.add_edge(str(e4), str(e2))
+        self.exon_graph.add_edge(e1, e4)
+        self.exon_graph.add_edge(e3, e2)
+        self.exon_graph.add_edge(e4, e2)
 
         self.assertEqual(len(self.exon_graph.nodes()), 9)
         self.assertEqual(len(self.exon_graph.edges()), 8)
@@ -592,20 +555,14 @@ class TestCollapseExons(TestCase):
                           L|=|-|======|------|====|R
 
         '''
-        e1 = gimme.ExonObj('chr1', 2510, 2520)
-        e1.terminal = 1
-        self.align_db.exon_db[str(e1)] = e1
+        e1 = self.add_exon(2510, 2520, 1)
 
-        e2 = gimme.ExonObj('chr1', 2530, 2600)
-        e2.terminal = 2
-        self.align_db.exon_db[str(e2)] = e2
+        e2 = self.add_exon(2530, 2600, 2)
 
-        e3 = gimme.ExonObj('chr1', 2700, 2800)
-        e3.terminal = 1
-        self.align_db.exon_db[str(e3)] = e3
+        e3 = self.add_exon(2700, 2800, 1)
 
-        self.exon_graph.add_edge(str(e1), str(e2))
-        self.exon_graph.add_edge(str(e2), str(e3))
+        self.exon_graph.add_edge(e1, e2)
+        self.exon_graph.add_edge(e2, e3)
 
         self.assertEqual(len(self.exon_graph.nodes()), 9)
         self.assertEqual(len(self.exon_graph.edges()), 7)
@@ -625,20 +582,14 @@ class TestCollapseExons(TestCase):
                      L|=|-|======|------|====|R
 
         '''
-        e1 = gimme.ExonObj('chr1', 2400, 2450)
-        e1.terminal = 1
-        self.align_db.exon_db[str(e1)] = e1
+        e1 = self.add_exon(2400, 2450, 1)
 
-        e2 = gimme.ExonObj('chr1', 2500, 2600)
-        e2.terminal = 2
-        self.align_db.exon_db[str(e2)] = e2
+        e2 = self.add_exon(2500, 2600, 2)
 
-        e3 = gimme.ExonObj('chr1', 2700, 2800)
-        e3.terminal = 1
-        self.align_db.exon_db[str(e3)] = e3
+        e3 = self.add_exon(2700, 2800, 1)
 
-        self.exon_graph.add_edge(str(e1), str(e2))
-        self.exon_graph.add_edge(str(e2), str(e3))
+        self.exon_graph.add_edge(e1, e2)
+        self.exon_graph.add_edge(e2, e3)
 
         self.assertEqual(len(self.exon_graph.nodes()), 8)
         self.assertEqual(len(self.exon_graph.edges()), 7)
@@ -655,35 +606,482 @@ class TestAddIntrons(TestCase):
         start = 1000
         n = 1
         self.exons = []
+        self.chrom = gimme.chrom_table.get_id('chr1')
 
         while n < 7:
-            e = gimme.ExonObj('chr1', start, start + 100)
+            e = gimme.ExonObj(self.chrom, start, start + 100)
             self.exons.append(e)
             start += 300
             n += 1
 
-        self.exons[0].terminal = 1  # mark a left terminal
-        self.exons[-1].terminal = 2  # mark a right terminal
-
     def test_simple(self):
-        gimme.add_intron(self.exons, self.align_db, {}, 0)
+        gimme.add_exon(self.align_db, self.exons)
+        gimme.add_intron(self.exons, self.align_db)
 
         self.assertEqual(len(self.align_db.intron_db), 5)
 
+    def test_ids(self):
+        gimme.add_exon(self.align_db, self.exons)
+        gimme.add_intron(self.exons, self.align_db)
+
+        self.assertEqual([e.id for e in self.exons], range(6))
+        self.assertEqual(len(self.align_db.intron_db), 5)
+        self.assertEqual(self.align_db.intron_db.get_edges(0), [(0, 1)])
+        self.assertEqual(self.align_db.intron_db.get_clusters(),
+                            {0: range(5)})
+        self.assertEqual(self.align_db.exon_db.introns[1], (0, 1))
+        self.assertEqual(self.align_db.exon_db.introns[0], (0,))
+
+    def test_same_exons(self):
+        gimme.add_exon(self.align_db, self.exons)
+        exons = [gimme.ExonObj(self.chrom, 1000, 1100),
+                    gimme.ExonObj(self.chrom, 1300, 1450)]
+        gimme.add_exon(self.align_db, exons)
+
+        self.assertEqual([e.id for e in exons], [0, 6])
+        self.assertEqual(len(self.align_db.exon_db), 7)
+
+        exon_db = self.align_db.exon_db
+        self.assertEqual(list(exon_db.terminals), [1, 0, 0, 0, 0, 2, 2])
+        self.assertEqual(list(exon_db.support), [2, 1, 1, 1, 1, 1, 1])
+
+    def test_first_alignment_introns(self):
+        gimme.add_alignment(self.align_db, [self.exons[:3]])
+        exons = [gimme.ExonObj(self.chrom, 1300, 1400),
+                    gimme.ExonObj(self.chrom, 1600, 1700),
+                    gimme.ExonObj(self.chrom, 1900, 2000)]
+        gimme.add_alignment(self.align_db, [exons])
+
+        exon_db = self.align_db.exon_db
+        self.assertEqual(exon_db.introns, [(0,), (0, 1), (1,), (2,)])
+        self.assertEqual(self.align_db.intron_db.get_edges(2), [(2, 3)])
+
+
+class TestExonObj(TestCase):
+    def test_no_dict(self):
+        exon = gimme.ExonObj('chr1', 100, 200)
+        self.assertFalse(hasattr(exon, '__dict__'))
+        self.assertRaises(AttributeError, setattr, exon, 'name', 'e1')
+
+
+class TestExonTable(TestCase):
+    def test_add(self):
+        exon_db = gimme.ExonTable()
+        self.assertEqual(exon_db.add(0, 100, 200, 1), 0)
+        self.assertEqual(exon_db.add(0, 300, 400, 2, 3), 1)
+        self.assertEqual(exon_db.add(0, 100, 200, 1), 0)
+        self.assertEqual(exon_db.add(0, 300, 400, 0), 1)
+        self.assertEqual(exon_db.add(0, 300, 400, 2), 1)
+
+        self.assertEqual(len(exon_db), 2)
+        self.assertEqual(list(exon_db.terminals), [1, 0])
+        self.assertEqual(list(exon_db.support), [2, 5])
+        self.assertEqual(exon_db.get_size(1), 101)
+
+        starts, ends = exon_db.get_positions([1, 0])
+        self.assertEqual(list(starts), [300, 100])
+        self.assertEqual(list(ends), [400, 200])
+
+    def test_introns(self):
+        exon_db = gimme.ExonTable()
+        exon_db.add(0, 100, 200)
+        self.assertEqual(exon_db.introns, [()])
+        exon_db.add_intron(0, 3)
+        exon_db.add_intron(0, 5)
+        exon_db.add_intron(0, 3)
+        self.assertEqual(exon_db.introns, [(3, 5)])
+
+
+class TestIntronTable(TestCase):
+    def test_add(self):
+        intron_db = gimme.IntronTable()
+        self.assertEqual(intron_db.add(0, 201, 299, 0, 1), 0)
+        self.assertEqual(intron_db.add(0, 401, 499, 1, 2), 1)
+        self.assertEqual(intron_db.add(0, 201, 299, 3, 1), 0)
+        self.assertEqual(intron_db.add(0, 201, 299, 0, 1), 0)
+
+        self.assertEqual(len(intron_db), 2)
+        self.assertEqual(intron_db.get_edges(0), [(0, 1), (3, 1)])
+        self.assertEqual(intron_db.edges[0], (0, 1, 3, 1))
+        self.assertEqual(list(intron_db.starts), [201, 401])
+        self.assertEqual(list(intron_db.ends), [299, 499])
+        self.assertEqual(list(intron_db.parents), [0, 1])
+        self.assertEqual(list(intron_db.support), [3, 1])
+        self.assertEqual(intron_db.get_support(0, 201, 299), 3)
+        self.assertEqual(intron_db.get_support(0, 201, 300), 0)
+
+    def test_clusters(self):
+        intron_db = gimme.IntronTable()
+        for i in range(8):
+            intron_db.add(0, i * 100 + 1, i * 100 + 99, i, i + 1)
+        self.assertEqual(intron_db.get_clusters(),
+                            dict((i, [i]) for i in range(8)))
+
+        self.assertEqual(intron_db.union_clusters(0, 1), 0)
+        self.assertEqual(intron_db.union_clusters(2, 3), 2)
+        self.assertEqual(intron_db.union_clusters(3, 1), 2)  # by rank
+        self.assertEqual(intron_db.union_clusters(4, 0), 2)
+        self.assertEqual(intron_db.union_clusters(5, 6), 5)
+        self.assertEqual(list(intron_db.ranks), [1, 0, 2, 0, 0, 1, 0, 0])
+        self.assertEqual(list(intron_db.parents), [2, 0, 2, 2, 2, 5, 5, 7])
+
+        self.assertEqual(list(intron_db.get_roots()),
+                            [2, 2, 2, 2, 2, 5, 5, 7])
+        self.assertEqual(intron_db.get_clusters(),
+                            {2: [0, 1, 2, 3, 4], 5: [5, 6], 7: [7]})
+
+    def test_path_compression(self):
+        intron_db = gimme.IntronTable()
+        for i in range(4):
+            intron_db.add(0, i * 100 + 1, i * 100 + 99, i, i + 1)
+        intron_db.parents[:] = array.array('l', [0, 0, 1, 2])
+
+        self.assertEqual(list(intron_db.get_roots()), [0, 0, 0, 0])
+        self.assertEqual(list(intron_db.parents), [0, 0, 1, 2])
+        self.assertEqual(intron_db.find_cluster(3), 0)
+        self.assertEqual(list(intron_db.parents), [0, 0, 0, 0])
+
+    def test_no_introns(self):
+        self.assertEqual(gimme.IntronTable().get_clusters(), {})
+
+
+class TestSupport(TestCase):
+    def setUp(self):
+        self.align_db = gimme.AlignmentDB()
+        self.chrom = gimme.chrom_table.get_id('chr1')
+
+    def add(self, coords, count=1):
+        exons = [gimme.ExonObj(self.chrom, start, end)
+                    for start, end in coords]
+        gimme.add_alignment(self.align_db, [exons], count)
+        exon_ids = self.align_db.exon_db.ids
+        return [exon_ids.find(self.chrom, start, end)
+                    for start, end in coords]
+
+    def test_counts(self):
+        ids = self.add([(100, 200), (300, 400)])
+        self.add([(100, 200), (300, 400)], 2)  # the same chain
+        self.add([(100, 200), (500, 600)])
+
+        exon_db = self.align_db.exon_db
+        self.assertEqual([exon_db.support[i] for i in ids], [4, 3])
+        intron_db = self.align_db.intron_db
+        self.assertEqual(intron_db.get_support(self.chrom, 201, 299), 3)
+        self.assertEqual(intron_db.get_support(self.chrom, 201, 499), 1)
+
+    def test_unknown_chain(self):
+        self.add([(100, 200), (300, 400)])
+        exons = [gimme.ExonObj(self.chrom, start, end)
+                    for start, end in [(100, 200), (500, 600)]]
+        gimme.add_support(self.align_db, exons, 2)
+
+        exon_db = self.align_db.exon_db
+        intron_db = self.align_db.intron_db
+        self.assertEqual(len(exon_db), 2)
+        self.assertEqual(intron_db.ids.size, len(intron_db))
+        self.assertEqual(intron_db.ids.find(self.chrom, 201, 499), None)
+        self.assertEqual(list(exon_db.support), [3, 1])
+
+    def test_single_exons(self):
+        self.add([(100, 200)], 2)
+        self.add([(100, 200)])
+        self.add([(150, 300)])
+        self.add([(1000, 1200)])
+
+        merged = gimme.merge_exon(self.align_db)[self.chrom]
+        self.assertEqual(list(merged['support']), [4, 1])
+
+    def test_prune_edges(self):
+        a, b = self.add([(100, 200), (300, 400)], 10)
+        self.add([(100, 200), (500, 600)], 2)
+        self.add([(700, 800), (300, 400)], 1)
+        c = self.align_db.exon_db.ids.find(self.chrom, 500, 600)
+        d = self.align_db.exon_db.ids.find(self.chrom, 700, 800)
+
+        g = SpliceGraph([(a, b), (a, c), (d, b)])
+        self.assertEqual(gimme.prune_edges(g, self.align_db), 0)
+        self.assertEqual(gimme.prune_edges(g, self.align_db, 2), 1)
+        self.assertEqual(sorted(g.edges()), sorted([(a, b), (a, c)]))
+        self.assertFalse(g.has_node(d))
+
+        self.assertEqual(gimme.prune_edges(g, self.align_db, 1, 0.5), 1)
+        self.assertEqual(g.edges(), [(a, b)])
+
+    def test_transcript_score(self):
+        a, b, c = self.add([(100, 200), (300, 400), (500, 600)], 5)
+        self.add([(100, 200), (300, 400)], 2000)
+
+        self.assertEqual(gimme.get_transcript_score(self.align_db,
+                                                    [a, b, c]), 5)
+        self.assertEqual(gimme.get_transcript_score(self.align_db, [a, b]),
+                            1000)
+
+
+class TestMergeCluster(TestCase):
+    def setUp(self):
+        self.align_db = gimme.AlignmentDB()
+        chrom = gimme.chrom_table.get_id('chr1')
+        for coords in ([(100, 200), (300, 400)],
+                        [(1000, 1100), (1300, 1400)],
+                        [(100, 200), (300, 400), (500, 600)],
+                        [(5000, 5100), (5300, 5400), (5600, 5700)]):
+            exons = [gimme.ExonObj(chrom, start, end)
+                        for start, end in coords]
+            gimme.add_alignment(self.align_db, [exons])
+
+    def test_clusters(self):
+        self.assertEqual(gimme.merge_cluster(self.align_db),
+                            [[0, 2], [1], [3, 4]])
+
+    def test_exon_in_two_clusters(self):
+        intron_db = self.align_db.intron_db
+        introns = dict((intron_db.find_cluster(i), i)
+                        for i in range(len(intron_db)))
+        exon_db = self.align_db.exon_db
+        exon_id = exon_db.add(0, 1300, 1400)
+        exon_db.introns[exon_id] = (introns[1], introns[3], introns[1])
+
+        self.assertEqual(gimme.merge_cluster(self.align_db),
+                            [[0, 2], [1, 3, 4]])
+
+    def test_intron_not_in_exons(self):
+        self.align_db.intron_db.add(0, 8001, 8999, 0, 1)
+        self.assertEqual(gimme.merge_cluster(self.align_db),
+                            [[0, 2], [1], [3, 4]])
+
+
+class TestCoordTable(TestCase):
+    def test_get_id(self):
+        table = gimme.CoordTable()
+        self.assertEqual(table.get_id('chr1', 100, 200), 0)
+        self.assertEqual(table.get_id('chr2', 100, 200), 1)
+        self.assertEqual(table.get_id('chr1', 100, 300), 2)
+        self.assertEqual(table.get_id('chr1', 100, 200), 0)
+        self.assertEqual(table.size, 3)
+
+
+class TestChromTable(TestCase):
+    def test_get_id(self):
+        table = gimme.ChromTable()
+        self.assertEqual(table.get_id('chr2'), 0)
+        self.assertEqual(table.get_id('chr1'), 1)
+        self.assertEqual(table.get_id('chr2'), 0)
+        self.assertEqual(table.names, ['chr2', 'chr1'])
+
+    def test_genome_db(self):
+        table = gimme.ChromTable()
+        genome = gimme.GenomeDB({'chr1': 'ACGTAGGTAAAG', 'chr2': 'TTTT'},
+                                table)
+        chr2, chr1 = table.get_id('chr2'), table.get_id('chr1')
+        self.assertEqual(genome[chr1], 'ACGTAGGTAAAG')
+        self.assertEqual(genome[chr2], 'TTTT')
+
+        exon_db = gimme.ExonTable()
+        exon1 = exon_db.add(chr1, 0, 5)
+        exon2 = exon_db.add(chr1, 9, 12)
+        self.assertEqual(split_strand.get_splice_sites(genome, exon_db,
+                                                        exon1, exon2),
+                            ('GG', 'TA'))
+
+    def test_split_strand(self):
+        sequence = ['A'] * 1000
+        for pos, site in [(10, 'GT'), (98, 'AG'), (30, 'GT'), (148, 'AG'),
+                            (60, 'GT'), (198, 'AG'),
+                            (310, 'GT'), (398, 'AG'), (498, 'AT'),
+                            (610, 'CT'), (698, 'AC'), (810, 'CT'),
+                            (898, 'AC')]:
+            sequence[pos:pos + 2] = site
+        genome = {0: ''.join(sequence)}
+
+        exon_db = gimme.ExonTable()
+        coords = [(0, 10), (100, 110), (20, 30), (150, 160), (50, 60),
+                    (200, 210), (300, 310),
+                    (500, 510), (400, 410),  # before exon 400-410 in ids
+                    (600, 610), (700, 710), (800, 810), (900, 910)]
+        ids = dict((coord, exon_db.add(0, *coord)) for coord in coords)
+
+        def edge(exon1, exon2):
+            return ids[exon1], ids[exon2]
+
+        g = SpliceGraph([edge((0, 10), (100, 110)),
+                            edge((20, 30), (150, 160)),
+                            edge((50, 60), (200, 210)),
+                            edge((300, 310), (500, 510)),  # GT-AT, -
+                            edge((300, 310), (400, 410)),  # GT-AG, +
+                            edge((600, 610), (700, 710)),
+                            edge((800, 810), (900, 910))])
+        pos_graph, neg_graph = split_strand.split(g, genome, exon_db)
+        self.assertEqual(sorted(pos_graph.edges()),
+                            sorted([edge((0, 10), (100, 110)),
+                                    edge((20, 30), (150, 160)),
+                                    edge((50, 60), (200, 210)),
+                                    edge((300, 310), (400, 410))]))
+        self.assertEqual(sorted(neg_graph.edges()),
+                            sorted([edge((300, 310), (500, 510)),
+                                    edge((600, 610), (700, 710)),
+                                    edge((800, 810), (900, 910))]))
+
+    def test_print_genes(self):
+        align_db = gimme.AlignmentDB()
+        chrom = gimme.chrom_table.get_id('chrX')
+        exons = [gimme.ExonObj(chrom, 100, 200),
+                    gimme.ExonObj(chrom, 300, 400)]
+        gimme.add_exon(align_db, exons)
+        multi_exon = gimme.get_bed(align_db, [e.id for e in exons], '+')
+        single_exon = gimme.get_bed_single(exons[0])
+        self.assertEqual(single_exon,
+                            ('chrX', 100, 200, 1000, '+', 1, '100', '0'))
+
+        stdout = gimme.stdout
+        gimme.stdout = StringIO()
+        try:
+            gene_id = gimme.print_genes([[multi_exon], [single_exon]], 5)
+            rows = [line.split('\t')
+                        for line in gimme.stdout.getvalue().splitlines()]
+        finally:
+            gimme.stdout = stdout
+
+        self.assertEqual(gene_id, 7)
+        self.assertEqual([row[:4] for row in rows],
+                            [['chrX', '100', '200', 'chrX:100-200.1'],
+                            ['chrX', '100', '400', 'chrX:100-400.1']])
+        self.assertEqual(rows[1][5:], ['+', '100', '400', '0,0,0', '2',
+                                        '100,100', '0,200'])
+
+    def test_print_genes_sorted(self):
+        def bed(chrom, start, end, strand='+'):
+            return (chrom, start, end, 1000, strand, 1,
+                    str(end - start), '0')
+
+        genes = [[bed('chr2', 50, 90)],
+                    [bed('chr1', 500, 900), bed('chr1', 100, 900)],
+                    [bed('chr1', 300, 400), bed('chr1', 100, 200, '-')]]
+        outputs = []
+        for order in (genes, genes[::-1], [genes[2], genes[0], genes[1]],
+                        genes[1:2]):
+            stdout = gimme.stdout
+            gimme.stdout = StringIO()
+            try:
+                gimme.print_genes(order)
+                outputs.append(gimme.stdout.getvalue())
+            finally:
+                gimme.stdout = stdout
+
+        self.assertEqual(outputs[1], outputs[0])
+        self.assertEqual(outputs[2], outputs[0])
+        self.assertEqual([line.split('\t')[:4]
+                            for line in outputs[0].splitlines()],
+                            [['chr1', '100', '200', 'chr1:100-400.1'],
+                            ['chr1', '100', '900', 'chr1:100-900.1'],
+                            ['chr1', '300', '400', 'chr1:100-400.2'],
+                            ['chr1', '500', '900', 'chr1:100-900.2'],
+                            ['chr2', '50', '90', 'chr2:50-90.1']])
+
+        # names do not depend on other genes, e.g. with --region
+        self.assertEqual([line.split('\t')[3]
+                            for line in outputs[3].splitlines()],
+                            ['chr1:100-900.1', 'chr1:100-900.2'])
+
+        genes = [(gene_id, [bed.name for bed in transcripts])
+                    for gene_id, transcripts in
+                        bedio.read_genes(StringIO(outputs[0]))]
+        self.assertEqual(genes, [('chr1:100-400', ['chr1:100-400.1',
+                                                    'chr1:100-400.2']),
+                                    ('chr1:100-900', ['chr1:100-900.1',
+                                                        'chr1:100-900.2']),
+                                    ('chr2:50-90', ['chr2:50-90.1'])])
+
+    def test_print_genes_same_locus(self):
+        def bed(start, end, strand):
+            return ('chr1', start, end, 1000, strand, 1,
+                    str(end - start), '0')
+
+        stdout = gimme.stdout
+        gimme.stdout = StringIO()
+        try:
+            gimme.print_genes([[bed(100, 900, '-')],
+                                [bed(100, 900, '+'), bed(200, 300, '+')]])
+            names = [line.split('\t')[3]
+                        for line in gimme.stdout.getvalue().splitlines()]
+        finally:
+            gimme.stdout = stdout
+        self.assertEqual(names, ['chr1:100-900.1', 'chr1:100-900_2.1',
+                                    'chr1:100-900.2'])
+
+
+class TestMinIsoforms(TestCase):
+    alignments = [[(100, 200), (300, 350), (600, 700), (800, 900)],
+                    [(100, 200), (400, 450), (600, 700), (1000, 1100)],
+                    [(100, 200), (300, 350), (600, 700), (1000, 1100)]]
+
+    def build(self, alignments, max_isoforms):
+        chrom = gimme.chrom_table.get_id('chr1')
+        genome = gimme.GenomeDB({'chr1': 'N' * 2000}, gimme.chrom_table)
+        align_db = gimme.AlignmentDB()
+        for coords in alignments:
+            exons = [gimme.ExonObj(chrom, start, end)
+                        for start, end in coords]
+            gimme.add_alignment(align_db, [exons])
+
+        genes, excluded = gimme.build_gene_model(genome, align_db,
+                                    gimme.merge_cluster(align_db), False,
+                                    max_isoforms=max_isoforms)
+        return [sorted(gene) for gene in genes]
+
+    def test_min_isoforms(self):
+        genes = self.build(self.alignments, 1)
+        self.assertEqual(len(genes), 1)
+        self.assertEqual([(row[1], row[2], row[7]) for row in genes[0]],
+                            [(100, 900, '0,200,500,700'),
+                            (100, 900, '0,300,500,700'),
+                            (100, 1100, '0,200,500,900')])
+        self.assertEqual(len(self.build(self.alignments, 4)[0]), 4)
+
+    def test_input_order(self):
+        genes = self.build(self.alignments, 1)
+        self.assertEqual(self.build(self.alignments[::-1], 1), genes)
+        self.assertEqual(self.build(self.alignments[1:] +
+                                        self.alignments[:1], 1), genes)
+
+
+class TestCountChains(TestCase):
+    def setUp(self):
+        self.align_db = gimme.AlignmentDB()
+
+    def make_exons(self, coords, chrom='chr1'):
+        return [gimme.ExonObj(chrom, start, end) for start, end in coords]
+
+    def test_identical_chains(self):
+        for i in range(3):
+            exons = self.make_exons([(1000, 1100), (1300, 1400)])
+            self.assertEqual(gimme.count_chain(self.align_db, exons), i == 0)
+
+        self.assertEqual(self.align_db.chain_db.values(), [3])
+
+    def test_different_chains(self):
+        chains = [self.make_exons([(1000, 1100), (1300, 1400)]),
+                    self.make_exons([(1000, 1100), (1300, 1450)]),
+                    self.make_exons([(1000, 1100)]),
+                    self.make_exons([(1000, 1100), (1300, 1400)], 'chr2')]
+        for exons in chains:
+            self.assertTrue(gimme.count_chain(self.align_db, exons))
+
+        self.assertEqual(sorted(self.align_db.chain_db.values()), [1, 1, 1, 1])
+
 
 class TestMergeExons(TestCase):
     def setUp(self):
         self.align_db = gimme.AlignmentDB()
-        self.align_db.single_exons_db = {'chr1': []}
+        self.align_db.single_exons_db = gimme.SingleExonDB()
         self.e1 = gimme.ExonObj('chr1', 1000, 2000)
         self.e2 = gimme.ExonObj('chr1', 3000, 4000)
         self.e3 = gimme.ExonObj('chr1', 5000, 6000)
         self.e4 = gimme.ExonObj('chr1', 7000, 8000)
 
-        self.align_db.single_exons_db['chr1'].append(self.e1)
-        self.align_db.single_exons_db['chr1'].append(self.e2)
-        self.align_db.single_exons_db['chr1'].append(self.e3)
-        self.align_db.single_exons_db['chr1'].append(self.e4)
+        self.align_db.single_exons_db.add(self.e1)
+        self.align_db.single_exons_db.add(self.e2)
+        self.align_db.single_exons_db.add(self.e3)
+        self.align_db.single_exons_db.add(self.e4)
 
     def print_items(self, items):
         for e in items['chr1']:
@@ -691,8 +1089,8 @@ class TestMergeExons(TestCase):
         print >> sys.stderr, ''
 
     def test_no_merge_single_exons(self):
-        self.align_db.single_exons_db = {'chr1': []}
-        self.align_db.single_exons_db['chr1'].append(self.e1)
+        self.align_db.single_exons_db = gimme.SingleExonDB()
+        self.align_db.single_exons_db.add(self.e1)
         self.merged_exons = gimme.merge_exon(self.align_db)
 
         self.assertEqual(len(self.merged_exons['chr1']), 1)
@@ -704,7 +1102,7 @@ class TestMergeExons(TestCase):
 
     def test_subset_merge(self):
         self.e5 = gimme.ExonObj('chr1', 1100, 1800)
-        self.align_db.single_exons_db['chr1'].append(self.e5)
+        self.align_db.single_exons_db.add(self.e5)
 
         self.merged_exons = gimme.merge_exon(self.align_db)
 
@@ -712,7 +1110,7 @@ class TestMergeExons(TestCase):
 
     def test_extend_front(self):
         self.e5 = gimme.ExonObj('chr1', 500, 1800)
-        self.align_db.single_exons_db['chr1'].append(self.e5)
+        self.align_db.single_exons_db.add(self.e5)
 
         self.merged_exons = gimme.merge_exon(self.align_db)
 
@@ -720,14 +1118,14 @@ class TestMergeExons(TestCase):
 
     def test_extend_back_first(self):
         self.e5 = gimme.ExonObj('chr1', 1100, 2200)
-        self.align_db.single_exons_db['chr1'].append(self.e5)
+        self.align_db.single_exons_db.add(self.e5)
         self.merged_exons = gimme.merge_exon(self.align_db)
 
         self.assertEqual(len(self.merged_exons['chr1']), 4)
 
     def test_extend_back_last(self):
         self.e5 = gimme.ExonObj('chr1', 7100, 8200)
-        self.align_db.single_exons_db['chr1'].append(self.e5)
+        self.align_db.single_exons_db.add(self.e5)
 
         self.merged_exons = gimme.merge_exon(self.align_db)
         self.assertEqual(len(self.merged_exons['chr1']), 4)
@@ -735,15 +1133,15 @@ class TestMergeExons(TestCase):
     def test_extend_back_first_last(self):
         self.e5 = gimme.ExonObj('chr1', 7100, 8200)
         self.e6 = gimme.ExonObj('chr1', 1100, 2200)
-        self.align_db.single_exons_db['chr1'].append(self.e5)
-        self.align_db.single_exons_db['chr1'].append(self.e6)
+        self.align_db.single_exons_db.add(self.e5)
+        self.align_db.single_exons_db.add(self.e6)
 
         self.merged_exons = gimme.merge_exon(self.align_db)
         self.assertEqual(len(self.merged_exons['chr1']), 4)
 
     def test_single_merge(self):
         self.e5 = gimme.ExonObj('chr1', 500, 8200)
-        self.align_db.single_exons_db['chr1'].append(self.e5)
+        self.align_db.single_exons_db.add(self.e5)
 
         self.merged_exons = gimme.merge_exon(self.align_db)
 
@@ -751,7 +1149,7 @@ class TestMergeExons(TestCase):
 
     def test_merge_two_exons(self):
         self.e5 = gimme.ExonObj('chr1', 1300, 3200)
-        self.align_db.single_exons_db['chr1'].append(self.e5)
+        self.align_db.single_exons_db.add(self.e5)
 
         self.merged_exons = gimme.merge_exon(self.align_db)
 
@@ -759,12 +1157,48 @@ class TestMergeExons(TestCase):
 
     def test_merge_two_exons_extend(self):
         self.e5 = gimme.ExonObj('chr1', 1300, 4200)
-        self.align_db.single_exons_db['chr1'].append(self.e5)
+        self.align_db.single_exons_db.add(self.e5)
 
         self.merged_exons = gimme.merge_exon(self.align_db)
 
         self.assertEqual(len(self.merged_exons['chr1']), 3)
 
+    def test_merged_coordinates(self):
+        self.align_db.single_exons_db.add(gimme.ExonObj('chr1', 1300, 4200))
+        self.align_db.single_exons_db.add(gimme.ExonObj('chr1', 4200, 4500))
+        merged = gimme.merge_exon(self.align_db)['chr1']
+
+        self.assertEqual(zip(merged['start'], merged['end']),
+                            [(1000, 4500), (5000, 6000), (7000, 8000)])
+        self.assertFalse(merged['remove'].any())
+
+    def test_find(self):
+        gimme.merge_exon(self.align_db)
+        merged, lo, hi = self.align_db.single_exons_db.find('chr1',
+                                                    [2000, 1999, 2500],
+                                                    [5001, 3000, 2600])
+        self.assertEqual(zip(lo, hi), [(1, 3), (0, 1), (1, 1)])
+
+    def test_remove_redundant_exons(self):
+        chrom = gimme.chrom_table.get_id('chr1')
+        align_db = gimme.AlignmentDB()
+        for start, end in [(1000, 2000), (2950, 4050), (5000, 6000),
+                            (7000, 8000)]:
+            align_db.single_exons_db.add(gimme.ExonObj(chrom, start, end))
+        merged = gimme.merge_exon(align_db)[chrom]
+
+        exon_db = align_db.exon_db
+        a = exon_db.add(chrom, 900, 2100)  # contains 1000-2000
+        b = exon_db.add(chrom, 3000, 4000)  # 2950-4050 extends 100
+        c = exon_db.add(chrom, 5950, 8000)  # 5000-6000 extends 950
+        gimme.remove_redundant_exons(SpliceGraph([(a, b), (b, c)]), align_db)
+        self.assertEqual(list(merged['remove']), [True, False, False, True])
+
+        d = exon_db.add(chrom, 3000, 4001)  # 2950-4050 extends 99
+        e = exon_db.add(chrom, 9000, 9100)
+        gimme.remove_redundant_exons(SpliceGraph([(d, e)]), align_db)
+        self.assertEqual(list(merged['remove']), [True, True, False, True])
+
 
 class TestSplitExonGroups(TestCase):
     max_intron = 200
@@ -841,5 +1275,470 @@ class TestSplitExonGroups(TestCase):
                                         )
         self.assertEqual(len(split), 3)
 
+
+class TestBatchParsing(TestCase):
+    psl_file = '../sample_data/sample.psl'
+
+    def to_coords(self, groups):
+        return [[(e.chrom, e.start, e.end) for e in group]
+                    for group in groups]
+
+    def test_delete_gap_batch(self):
+        starts = np.array([100, 200, 500, 100, 180])
+        ends = np.array([150, 300, 600, 150, 250])
+        offsets = np.array([0, 3, 5])
+
+        new_starts, new_ends, new_offsets = gimme.delete_gap_batch(starts,
+                                                        ends, offsets, 50)
+
+        self.assertEqual(list(new_starts), [100, 500, 100])
+        self.assertEqual(list(new_ends), [300, 600, 250])
+        self.assertEqual(list(new_offsets), [0, 2, 3])
+
+    def test_remove_large_intron_batch(self):
+        starts = np.array([1000, 1200, 1800, 1000, 2800])
+        ends = np.array([1100, 1300, 1900, 1100, 2900])
+        offsets = np.array([0, 3, 5])
+
+        groups = gimme.remove_large_intron_batch(starts, ends, offsets, 200)
+
+        self.assertEqual(list(groups), [0, 2, 3, 4, 5])
+
+    def test_same_as_records(self):
+        expected = []
+        for pslobj in pslparser.read(open(self.psl_file)):
+            chrom = gimme.chrom_table.get_id(pslobj.tName)
+            exons = [gimme.ExonObj(chrom, start, start + size)
+                        for start, size in zip(pslobj.tStarts,
+                                                pslobj.blockSizes)]
+            exons = gimme.delete_gap(exons, gimme.gap_size)
+            groups = gimme.remove_large_intron(exons, gimme.max_intron)
+            expected.append(self.to_coords(groups))
+
+        for batch_size in (1, 100, 10000):
+            batches = gimme.parse_psl_batches(open(self.psl_file),
+                                                batch_size=batch_size)
+            result = [self.to_coords(groups) for groups in batches]
+            self.assertEqual(result, expected)
+
+
+class TestFilterBatch(TestCase):
+    def setUp(self):
+        psl_file = '../sample_data/sample.psl'
+        self.alignments = list(pslparser.read(open(psl_file)))
+        self.batch = next(pslparser.read_batches(open(psl_file), size=500))
+
+    def identity(self, pslobj):
+        aligned = int(pslobj.matches) + int(pslobj.repMatches)
+        return 100.0 * aligned / (aligned + int(pslobj.misMatches))
+
+    def coverage(self, pslobj):
+        return 100.0 * (pslobj.qEnd - pslobj.qStart) / pslobj.qSize
+
+    def check(self, expected, min_identity, min_coverage):
+        filtered = {'identity': 0, 'coverage': 0}
+        chrom_ids, starts, sizes, offsets = gimme.filter_batch(self.batch,
+                                                            filtered,
+                                                            min_identity,
+                                                            min_coverage)
+        self.assertEqual(len(chrom_ids), len(expected))
+        self.assertEqual(len(chrom_ids) + sum(filtered.values()), 500)
+        for i, pslobj in enumerate(expected):
+            self.assertEqual(list(starts[offsets[i]:offsets[i + 1]]),
+                                pslobj.tStarts)
+            self.assertEqual(list(sizes[offsets[i]:offsets[i + 1]]),
+                                pslobj.blockSizes)
+        return filtered
+
+    def test_no_filter(self):
+        filtered = self.check(self.alignments[:500], 0, 0)
+        self.assertEqual(filtered, {'identity': 0, 'coverage': 0})
+
+    def test_min_identity(self):
+        expected = [p for p in self.alignments[:500]
+                        if self.identity(p) >= 99]
+        filtered = self.check(expected, 99, 0)
+        self.assertTrue(filtered['identity'] > 0)
+
+    def test_min_coverage(self):
+        expected = [p for p in self.alignments[:500]
+                        if self.coverage(p) >= 90]
+        filtered = self.check(expected, 0, 90)
+        self.assertTrue(filtered['coverage'] > 0)
+
+    def test_both(self):
+        expected = [p for p in self.alignments[:500]
+                        if self.identity(p) >= 99 and self.coverage(p) >= 90]
+        self.check(expected, 99, 90)
+
+
+class TestChainTables(TestCase):
+    input_files = ['../sample_data/sample.psl', '../test_data/SE.test.bed',
+                    '../sample_data/sample.psl']
+
+    def summary(self, align_db):
+        exons = list(align_db.exon_db.terminals)
+        intron_db = align_db.intron_db
+        introns = dict((key, sorted(intron_db.get_edges(key)))
+                        for key in range(len(intron_db)))
+        return (exons, introns, intron_db.get_clusters(),
+                    align_db.chain_db)
+
+    def test_chain_to_exons(self):
+        chrom = gimme.chrom_table.get_id('chr1')
+        exons = [gimme.ExonObj(chrom, 100, 200),
+                    gimme.ExonObj(chrom, 300, 400)]
+        chain = gimme.get_chain(exons)
+        self.assertEqual(chain, (chrom, 100, 200, 300, 400))
+        self.assertEqual([str(e) for e in gimme.chain_to_exons(
+                                            ('chr1', 100, 200, 300, 400))],
+                            [str(e) for e in exons])
+
+    def test_chain_names(self):
+        chains, counts, n, filtered = \
+                            gimme.parse_input('../test_data/SE.test.bed')
+        self.assertEqual(sorted(set(chain[0] for chain in chains)),
+                            ['chr1', 'chr12', 'chr5'])
+
+    def test_same_as_serial(self):
+        align_db = gimme.AlignmentDB()
+        for input_file in self.input_files:
+            for groups in gimme.read_alignments(input_file, {'identity': 0,
+                                                            'coverage': 0}):
+                gimme.add_alignment(align_db, groups)
+
+        merged_db = gimme.AlignmentDB()
+        for input_file in self.input_files:
+            chains, counts, n, filtered = gimme.parse_input(input_file)
+            for chain, count in zip(chains, counts):
+                gimme.add_alignment(merged_db, [gimme.chain_to_exons(chain)],
+                                    count)
+
+        self.assertEqual(self.summary(merged_db), self.summary(align_db))
+
+
+class TestChainPartitions(TestCase):
+    def add_chains(self, partitions):
+        for input_file in ('../sample_data/sample.psl',
+                            '../test_data/SE.test.bed',
+                            '../sample_data/sample.psl'):
+            chains, counts, n, filtered = gimme.parse_input(input_file)
+            for chain, count in zip(chains, counts):
+                partitions.add(chain, count)
+
+    def tables(self, partitions):
+        '''Returns chain, exon and intron db of each chromosome
+        built from partitions.
+
+        '''
+        tables = {}
+        for chrom in partitions.chroms:
+            align_db = gimme.AlignmentDB()
+            for exons, count in partitions.alignments(chrom):
+                gimme.add_alignment(align_db, [exons], count)
+            exon_db = align_db.exon_db
+            tables[chrom] = (align_db.chain_db, list(exon_db.starts),
+                                list(exon_db.support), exon_db.introns,
+                                align_db.intron_db.edges)
+        return tables
+
+    def get_exons(self, partitions, chrom):
+        return [([(exon.start, exon.end) for exon in exons], count)
+                    for exons, count in partitions.alignments(chrom)]
+
+    def test_spill(self):
+        partitions = gimme.ChainPartitions()
+        self.add_chains(partitions)
+        self.assertEqual(partitions.segments, [])
+
+        spilled = gimme.ChainPartitions(max_memory=50000)
+        self.add_chains(spilled)
+        tmpdir = spilled.tmpdir
+        try:
+            self.assertTrue(spilled.spilled > 1)
+            self.assertEqual(spilled.chroms, partitions.chroms)
+            self.assertEqual(self.tables(spilled), self.tables(partitions))
+        finally:
+            spilled.close()
+        self.assertFalse(os.path.exists(tmpdir))
+
+    def test_counts(self):
+        partitions = gimme.ChainPartitions(max_memory=1)
+        try:
+            partitions.add(('chr1', 100, 200), 2)
+            partitions.add(('chr2', 100, 200, 300, 400))
+            partitions.add(('chr1', 500, 600))
+            partitions.add(('chr1', 100, 200))
+            self.assertEqual(partitions.spilled, 4)
+            self.assertEqual(self.get_exons(partitions, 'chr1'),
+                                [([(100, 200)], 2), ([(500, 600)], 1),
+                                ([(100, 200)], 1)])
+            self.assertEqual(partitions.chroms, ['chr1', 'chr2'])
+
+            chrom = gimme.chrom_table.get_id('chr1')
+            self.assertEqual(self.tables(partitions)['chr1'][0],
+                                {(chrom, 100, 200): 3, (chrom, 500, 600): 1})
+        finally:
+            partitions.close()
+
+    def test_add_file(self):
+        tmpdir = tempfile.mkdtemp()
+        filename = os.path.join(tmpdir, 'test.gcf')
+        chainfile.write(filename, [('chr1', 100, 200),
+                                    ('chr1', 5000, 5100, 5200, 5300),
+                                    ('chr3', 10, 20)], [1, 2, 1])
+        partitions = gimme.ChainPartitions()
+        try:
+            partitions.add(('chr2', 10, 20, 30, 40))
+            partitions.add_file(chainfile.ChainFile(filename),
+                                RegionIndex([('chr1', 5250, 6000),
+                                                ('chr2', 0, 100)]))
+            partitions.add(('chr2', 10, 20, 30, 40))
+
+            self.assertEqual(partitions.spilled, 1)  # to keep the order
+            self.assertEqual(partitions.chroms, ['chr2', 'chr1'])
+            self.assertEqual(self.get_exons(partitions, 'chr1'),
+                                [([(5000, 5100), (5200, 5300)], 2)])
+            self.assertEqual(self.get_exons(partitions, 'chr2'),
+                                [([(10, 20), (30, 40)], 1),
+                                ([(10, 20), (30, 40)], 1)])
+        finally:
+            partitions.close()
+            self.assertTrue(os.path.exists(filename))
+            shutil.rmtree(tmpdir)
+
+
+class TestByteRanges(TestCase):
+    def test_same_as_whole_file(self):
+        input_file = '../sample_data/sample.psl'
+        chains, counts, n, filtered = gimme.parse_input(input_file)
+
+        range_chains, range_counts, range_n = [], [], 0
+        for byte_range in fileio.split_file(input_file, 5):
+            table = gimme.parse_input(input_file, None, byte_range)
+            range_chains.extend(table[0])
+            range_counts.extend(table[1])
+            range_n += table[2]
+
+        self.assertEqual(range_n, n)
+        merged = {}
+        for chain, count in zip(range_chains, range_counts):
+            merged[chain] = merged.get(chain, 0) + count
+        self.assertEqual(merged, dict(zip(chains, counts)))
+
+    def test_split_input(self):
+        input_file = '../sample_data/sample.psl'
+        self.assertEqual(gimme.split_input(input_file, 1), [None])
+        self.assertEqual(gimme.split_input(input_file, 4), [None])  # small
+
+        min_range_size = gimme.min_range_size
+        gimme.min_range_size = 1000
+        try:
+            self.assertEqual(len(gimme.split_input(input_file, 4)), 4)
+        finally:
+            gimme.min_range_size = min_range_size
+
+    def parse_inputs(self, input_files, processes):
+        stdin = sys.stdin
+        sys.stdin = open('../sample_data/sample.psl')
+        try:
+            return [(input_file, table[:3]) for input_file, table in
+                        gimme.parse_inputs(input_files, processes)]
+        finally:
+            sys.stdin.close()
+            sys.stdin = stdin
+
+    def test_stdin_with_processes(self):
+        input_files = ['-', '../test_data/SE.test.bed',
+                        '../sample_data/sample.psl']
+        tables = self.parse_inputs(input_files, 2)
+        self.assertEqual(tables, self.parse_inputs(input_files, 1))
+        self.assertEqual([input_file for input_file, table in tables],
+                            input_files)
+        self.assertTrue(tables[0][1][2] > 0)  # alignments from stdin
+
+
+class TestConvert(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'sample.gcf')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_same_as_input(self):
+        input_file = '../sample_data/sample.psl'
+        gimme.convert([input_file], self.filename)
+
+        chains, counts, n, filtered = gimme.parse_input(input_file)
+        table = gimme.parse_input(self.filename)
+        self.assertEqual(table[2], n)
+        self.assertEqual(table[3], filtered)
+        self.assertEqual(sorted(zip(table[0], table[1])),
+                            sorted(zip(chains, counts)))
+
+    def test_regions(self):
+        bed_file = os.path.join(self.tmpdir, 'split.bed')
+        with open(bed_file, 'w') as fp:  # split by a large intron
+            fp.write('chr1\t100\t500100\tsplit\t0\t+\t100\t500100\t0\t'
+                        '2\t100,100\t0,499900\n')
+        gimme.convert([bed_file], self.filename)
+
+        regions = [('chr1', 400000, 600000)]
+        table = gimme.parse_input(bed_file, regions)
+        self.assertEqual(table[:2], ([('chr1', 500000, 500100)], [1]))
+        chains, counts, n, filtered = gimme.parse_input(self.filename,
+                                                        regions)
+        self.assertEqual((chains, counts), table[:2])
+
+    def test_parameters(self):
+        gimme.convert(['../test_data/SE.test.bed'], self.filename)
+        gap_size = gimme.gap_size
+        gimme.gap_size = gap_size + 1
+        try:
+            self.assertRaises(SystemExit, gimme.read_chain_file,
+                                self.filename)
+        finally:
+            gimme.gap_size = gap_size
+
+
+class TestSweepLoci(TestCase):
+    def make_groups(self, chrom, *coords):
+        chrom = gimme.chrom_table.get_id(chrom)
+        return [[gimme.ExonObj(chrom, start, end) for start, end in coords]]
+
+    def test_merge_sorted_inputs(self):
+        input1 = [self.make_groups('chr1', (100, 200), (300, 400)),
+                    self.make_groups('chr2', (50, 80))]
+        input2 = [self.make_groups('chr1', (150, 250)),
+                    self.make_groups('chr1', (500, 600), (700, 800))]
+        alignments = list(gimme.merge_sorted_inputs([input1, input2]))
+
+        self.assertEqual([a[:3] for a in alignments], [('chr1', 100, 400),
+                                                        ('chr1', 150, 250),
+                                                        ('chr1', 500, 800),
+                                                        ('chr2', 50, 80)])
+        self.assertTrue(alignments[1][3] is input2[0])
+
+    def test_chrom_order(self):
+        input1 = [self.make_groups('chr2', (100, 200)),
+                    self.make_groups('chr10', (50, 80))]
+        input2 = [self.make_groups('chr2', (150, 250)),
+                    self.make_groups('chr10', (10, 20))]
+        chrom_order = {'chr2': 0, 'chr10': 1}
+        alignments = gimme.merge_sorted_inputs([input1, input2],
+                                                chrom_order)
+        self.assertEqual([a[:3] for a in alignments], [('chr2', 100, 200),
+                                                        ('chr2', 150, 250),
+                                                        ('chr10', 10, 20),
+                                                        ('chr10', 50, 80)])
+
+    def test_bam_chrom_order(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            sam_file = os.path.join(tmpdir, 'test.sam')
+            with open(sam_file, 'w') as fp:
+                fp.write('@HD\tVN:1.4\tSO:coordinate\n'
+                            '@SQ\tSN:chr2\tLN:1000\n'
+                            '@SQ\tSN:chr10\tLN:1000\n')
+            input_files = [sam_file, '../sample_data/sample.psl', sam_file]
+            self.assertEqual(gimme.get_chrom_order(input_files),
+                                {'chr2': 0, 'chr10': 1})
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_loci(self):
+        alignments = [('chr1', 100, 400, 'a'),
+                        ('chr1', 150, 250, 'b'),
+                        ('chr1', 400, 500, 'c'),  # touches a
+                        ('chr1', 501, 800, 'd'),
+                        ('chr2', 600, 700, 'e'),
+                        ('chr3', 10, 20, 'f')]
+        loci = [list(locus) for locus in gimme.sweep_loci(alignments)]
+        self.assertEqual(loci, [['a', 'b', 'c'], ['d'], ['e'], ['f']])
+
+    def test_unsorted_start(self):
+        alignments = [('chr1', 100, 400, 'a'), ('chr1', 50, 250, 'b')]
+        self.assertRaises(SystemExit, list, gimme.label_loci(alignments))
+
+    def test_unsorted_chrom(self):
+        alignments = [('chr1', 100, 400, 'a'),
+                        ('chr2', 50, 250, 'b'),
+                        ('chr1', 500, 600, 'c')]
+        self.assertRaises(SystemExit, list, gimme.label_loci(alignments))
+
+
+class TestDetectFormat(TestCase):
+    def test_psl(self):
+        first_line = open('../sample_data/sample.psl').readline()
+        self.assertEqual(gimme.detect_format(first_line), 'PSL')
+
+    def test_bed(self):
+        first_line = open('../test_data/SE.test.bed').readline()
+        self.assertEqual(gimme.detect_format(first_line), 'BED')
+
+    def test_sam(self):
+        first_line = open('../test_data/spliced.test.sam').readline()
+        self.assertEqual(gimme.detect_format(first_line), 'SAM')
+
+    def test_bam(self):
+        first_line = 'BAM\x01\x00\x00\x00@HD\tVN:1.4\n'
+        self.assertEqual(gimme.detect_format(first_line), 'BAM')
+
+    def test_gff(self):
+        first_line = 'chr1\tsrc\texon\t101\t200\t.\t+\t.\t' + \
+                        'gene_id "g1"; transcript_id "t1";\n'
+        self.assertEqual(gimme.detect_format(first_line), 'GFF')
+        self.assertEqual(gimme.detect_format('##gff-version 3\n'), 'GFF')
+
+    def test_unknown(self):
+        self.assertEqual(gimme.detect_format(''), None)
+        self.assertEqual(gimme.detect_format('##description: ' +
+                            'evidence-based annotation of the human ' +
+                            'genome (GRCh38), version 38 (Ensembl 104)\n'),
+                            None)
+
+    def test_header(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            gtf_file = os.path.join(tmpdir, 'test.gtf')
+            with open(gtf_file, 'w') as fp:
+                fp.write('# stringtie -o test.gtf test.bam\n'
+                            '##provider: GENCODE\n'
+                            'chr1\tsrc\texon\t101\t200\t.\t+\t.\t'
+                            'transcript_id "t1";\n'
+                            'chr1\tsrc\texon\t301\t400\t.\t+\t.\t'
+                            'transcript_id "t1";\n')
+            alignments = gimme.read_alignments(gtf_file, {})
+            self.assertEqual([[[(e.start, e.end) for e in group]
+                                    for group in groups]
+                                for groups in alignments],
+                                [[[(100, 200), (300, 400)]]])
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+class TestParseBam(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_sam_regions(self):
+        chains, counts, n, filtered = gimme.parse_input(
+                                '../test_data/spliced.test.sam',
+                                [('chr2', 0, 2010), ('chrUn', 0, 10000)])
+        self.assertEqual(n, 1)
+        self.assertEqual([chain[0] for chain in chains], ['chr2'])
+
+    def test_broken_bam(self):
+        bam_file = os.path.join(self.tmpdir, 'broken.bam')
+        with gzip.open(bam_file, 'wb') as fp:
+            fp.write('BAM\x01\xff\xff')
+        self.assertRaises(SystemExit, gimme.parse_input, bam_file,
+                            [('chr1', 0, 100)])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+from utils import pslparser
+
+test_file = "../sample_data/sample.psl"
+
+
+class TestRead(unittest.TestCase):
+    def setUp(self):
+        self.pslobj = next(pslparser.read(open(test_file)))
+
+    def test_columns(self):
+        self.assertEqual(self.pslobj.tName, 'chr25')
+        self.assertEqual(self.pslobj.qSize, 573)
+        self.assertEqual(self.pslobj.blockCount, 5)
+        self.assertEqual(self.pslobj.blockSizes, [260, 89, 117, 82, 25])
+        self.assertEqual(self.pslobj.tStarts, [1969045, 1969612, 1970043,
+                                                1970255, 1970508])
+
+    def test_lazy_decoding(self):
+        self.assertFalse(hasattr(self.pslobj, '__dict__'))
+        self.assertFalse(hasattr(self.pslobj, '_tStarts'))
+        tstarts = self.pslobj.tStarts
+        self.assertTrue(self.pslobj.tStarts is tstarts)
+
+
+class TestReadBatches(unittest.TestCase):
+    def test_same_as_read(self):
+        alignments = list(pslparser.read(open(test_file)))
+
+        n = 0
+        for batch in pslparser.read_batches(open(test_file), size=300):
+            self.assertTrue(len(batch.chrom_ids) <= 300)
+            for i in range(len(batch.chrom_ids)):
+                pslobj = alignments[n]
+                start, end = batch.offsets[i], batch.offsets[i + 1]
+
+                self.assertEqual(batch.chroms[batch.chrom_ids[i]],
+                                    pslobj.tName)
+                self.assertEqual(list(batch.starts[start:end]),
+                                    pslobj.tStarts)
+                self.assertEqual(list(batch.sizes[start:end]),
+                                    pslobj.blockSizes)
+                self.assertEqual(batch.matches[i], int(pslobj.matches))
+                self.assertEqual(batch.mismatches[i], int(pslobj.misMatches))
+                self.assertEqual(batch.rep_matches[i], int(pslobj.repMatches))
+                self.assertEqual(batch.q_sizes[i], pslobj.qSize)
+                self.assertEqual(batch.q_starts[i], pslobj.qStart)
+                self.assertEqual(batch.q_ends[i], pslobj.qEnd)
+                n += 1
+
+        self.assertEqual(n, len(alignments))
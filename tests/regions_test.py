@@ -0,0 +1,52 @@
+import unittest
+import numpy as np
+from utils import regions
+
+
+class TestParseRegion(unittest.TestCase):
+    def test_region(self):
+        self.assertEqual(regions.parse_region('chr1:1,001-2,000'),
+                            ('chr1', 1000, 2000))
+
+    def test_chrom(self):
+        self.assertEqual(regions.parse_region('chr1'),
+                            ('chr1', 0, regions.MAX_POSITION))
+
+    def test_start(self):
+        self.assertEqual(regions.parse_region('chr1:101'),
+                            ('chr1', 100, regions.MAX_POSITION))
+
+    def test_invalid(self):
+        for text in ('chr1:x-100', 'chr1:0-100', 'chr1:200-100', ':1-10'):
+            self.assertRaises(ValueError, regions.parse_region, text)
+
+
+class TestMergeRegions(unittest.TestCase):
+    def test_merge(self):
+        merged = regions.merge_regions([('chr2', 10, 20),
+                                        ('chr1', 50, 60),
+                                        ('chr1', 10, 30),
+                                        ('chr1', 20, 40),
+                                        ('chr1', 25, 35)])
+        self.assertEqual(merged, [('chr1', 10, 40),
+                                    ('chr1', 50, 60),
+                                    ('chr2', 10, 20)])
+
+
+class TestRegionIndex(unittest.TestCase):
+    def test_overlaps(self):
+        region_index = regions.RegionIndex([('chr1', 100, 200),
+                                            ('chr1', 150, 300)])
+        self.assertTrue('chr1' in region_index)
+        self.assertTrue(region_index.overlaps('chr1', 299, 400))
+        self.assertFalse(region_index.overlaps('chr1', 300, 400))
+        self.assertFalse(region_index.overlaps('chr1', 50, 100))
+        self.assertFalse(region_index.overlaps('chr2', 100, 200))
+
+    def test_arrays(self):
+        region_index = regions.RegionIndex([('chr1', 100, 200),
+                                            ('chr1', 400, 500)])
+        mask = region_index.overlaps('chr1', np.array([0, 150, 250, 450]),
+                                        np.array([100, 160, 300, 600]))
+        self.assertEqual(mask.tolist(), [False, True, False, True])
+
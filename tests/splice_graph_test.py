@@ -0,0 +1,81 @@
+import unittest
+import networkx as nx
+from utils.splice_graph import SpliceGraph
+
+
+class TestSpliceGraph(unittest.TestCase):
+    def setUp(self):
+        # 1 -> 3 -> 5 and 1 -> 4 -> 5, 2 -> 4, 3 -> 6
+        self.g = SpliceGraph([(1, 3), (3, 5), (1, 4), (4, 5), (2, 4), (3, 6)],
+                                strand='+')
+
+    def test_csr(self):
+        nodes, indptr, indices = self.g.csr()
+        self.assertEqual(nodes, [1, 2, 3, 4, 5, 6])
+        self.assertEqual(list(indptr), [0, 2, 3, 5, 6, 6, 6])
+        self.assertEqual(list(indices), [2, 3, 3, 4, 5, 4])
+        self.assertEqual(self.g.edges(), [(1, 3), (1, 4), (2, 4), (3, 5),
+                                            (3, 6), (4, 5)])
+
+    def test_degrees(self):
+        self.assertEqual(self.g.in_degree(4), 2)
+        self.assertEqual(self.g.out_degree(3), 2)
+        self.assertEqual(self.g.degree(1), 2)
+        self.assertEqual(self.g.sources(), [1, 2])
+        self.assertEqual(self.g.sinks(), [5, 6])
+
+    def test_topological_order(self):
+        nodes = self.g.csr()[0]
+        order = [nodes[i] for i in self.g.topological_order()]
+        for u, v in self.g.edges():
+            self.assertTrue(order.index(u) < order.index(v))
+
+    def test_cycle(self):
+        self.g.add_edge(5, 1)
+        self.assertRaises(ValueError, self.g.topological_order)
+
+    def test_paths(self):
+        self.assertEqual(self.g.paths(), [[1, 3, 5], [1, 3, 6], [1, 4, 5],
+                                            [2, 4, 5]])
+        self.assertEqual(self.g.count_paths(), 4)
+
+    def test_same_as_networkx(self):
+        g, nodes = self.g.to_digraph()
+        paths = [[nodes[i] for i in path[1:-1]] for path in
+                    nx.all_simple_paths(g, 'Start', 'End')]
+        self.assertEqual(sorted(paths), self.g.paths())
+
+    def test_to_digraph(self):
+        self.g.add_node(7)
+        g, nodes = self.g.to_digraph(key=lambda node: -node)
+        self.assertEqual(nodes, [7, 6, 5, 4, 3, 2, 1])
+        self.assertEqual(len(g.edges()), 12)
+        self.assertTrue(g.has_edge(6, 3))  # 1 -> 4
+        self.assertEqual(sorted(g.successors('Start')), [0, 5, 6])
+        self.assertEqual(sorted(g.predecessors('End')), [0, 1, 2])
+
+    def test_isolated_node(self):
+        self.g.add_node(7)
+        self.assertEqual(self.g.paths()[-1], [7])
+        self.assertEqual(self.g.count_paths(), 5)
+
+    def test_remove(self):
+        self.g.remove_node(4)
+        self.assertEqual(self.g.edges(), [(1, 3), (3, 5), (3, 6)])
+        self.assertFalse(self.g.has_node(4))
+        self.assertEqual(self.g.successors(2), [])
+
+        self.g.remove_edges_from([(3, 6), (3, 7)])
+        self.assertEqual(self.g.paths(), [[1, 3, 5], [2], [6]])
+
+    def test_cache(self):
+        self.assertEqual(self.g.count_paths(), 4)
+        self.g.add_edge(6, 7)
+        self.assertEqual(self.g.sinks(), [5, 7])
+        self.assertEqual(self.g.count_paths(), 4)
+        self.g.add_edge(2, 6)
+        self.assertEqual(self.g.count_paths(), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()